@@ -0,0 +1,430 @@
+"""End-to-end benchmark over the bundled Images/ dataset.
+
+Runs every image through the same steps as main1.detect_and_ocr, timing
+each stage separately, and writes a JSON report:
+
+    python benchmark.py --images Images --output bench.json
+    python benchmark.py --replay 3 --output bench.json --compare baseline.json
+
+--replay adds seeded, synthetic variants of each image (brightness,
+blur, noise, downscale) so runs are larger but still reproducible.
+--compare exits with status 1 when a stage got slower or accuracy dropped
+beyond --tolerance.
+
+Accuracy needs a labelled set (--labels). The bundled plate_results.csv
+labels a single image, so with it accuracy is NOT measured: the report
+says so and --compare ignores accuracy until at least --min-labelled
+images have labels. --onnx adds a detector parity and speed check of an
+ONNX export (onnx_detector.py) against the PyTorch weights:
+
+    python benchmark.py --onnx weights.onnx --output bench.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+STAGES = ["load", "yolo", "crop", "quality", "esrgan", "clahe_denoise",
+          "ocr", "postprocess", "db", "total"]
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of a list, q in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class StageTimer:
+    """Collects wall-clock durations (ms) per named stage."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append((time.perf_counter() - start) * 1000.0)
+
+    def summary(self):
+        report = {}
+        for name in STAGES + sorted(set(self.samples) - set(STAGES)):
+            values = self.samples.get(name)
+            if not values:
+                continue
+            report[name] = {
+                "count": len(values),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(percentile(values, 50), 3),
+                "p90_ms": round(percentile(values, 90), 3),
+                "p95_ms": round(percentile(values, 95), 3),
+                "p99_ms": round(percentile(values, 99), 3),
+                "max_ms": round(max(values), 3),
+            }
+        return report
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+    except ImportError:
+        import psutil  # Windows
+        return round(psutil.Process().memory_info().peak_wset / (1024.0 * 1024.0), 1)
+
+
+def augment(image, rng):
+    """One reproducible synthetic variant of an image."""
+    choice = rng.choice(["brightness", "blur", "noise", "downscale"])
+    if choice == "brightness":
+        alpha, beta = rng.uniform(0.6, 1.3), rng.uniform(-40, 40)
+        return cv2.convertScaleAbs(image, alpha=alpha, beta=beta)
+    if choice == "blur":
+        k = rng.choice([3, 5, 7])
+        return cv2.GaussianBlur(image, (k, k), 0)
+    if choice == "noise":
+        noise = np.random.default_rng(rng.randrange(1 << 30)).normal(0, rng.uniform(5, 20), image.shape)
+        return np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    h, w = image.shape[:2]
+    scale = rng.uniform(0.4, 0.8)
+    small = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+
+
+def load_ground_truth(path):
+    """Map image file name -> plate text from a plate_results.csv-style file
+    (date, plate text, image path)."""
+    truth = {}
+    if not path or not os.path.exists(path):
+        return truth
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) >= 3 and row[1].strip():
+                name = row[2].replace("\\", "/").rsplit("/", 1)[-1]
+                truth[name] = row[1].strip()
+    return truth
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def score_accuracy(predictions, truth, min_labelled=1):
+    """Plate-level and character-level accuracy for images with labels, or
+    only the label count when fewer than ``min_labelled`` have one."""
+    labelled = [(name, text) for name, text in predictions if name in truth]
+    if len(labelled) < max(1, min_labelled):
+        return {"labelled_images": len(labelled), "measured": False}
+    exact = 0
+    char_errors = 0
+    char_total = 0
+    for name, text in labelled:
+        expected = truth[name].replace(" ", "")
+        got = (text or "").replace(" ", "")
+        exact += got == expected
+        char_errors += min(edit_distance(got, expected), len(expected))
+        char_total += len(expected)
+    return {
+        "labelled_images": len(labelled),
+        "measured": True,
+        "plate_accuracy": round(exact / len(labelled), 4),
+        "char_accuracy": round(1 - char_errors / max(1, char_total), 4),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_image(recognizer, image_source, timer, use_db):
+    """Time every stage of detect_and_ocr for one image. Returns the text of
+    the first plate found (or None).
+
+    Real-ESRGAN goes through ``recognizer.super_resolution``, the same
+    BatchUpsampler that enhance_plate_image uses, so the esrgan stage
+    measures what main1 runs rather than the bare RealESRGANer."""
+    models = recognizer.models
+    with timer.stage("total"):
+        with timer.stage("load"):
+            image = image_source()
+        if image is None:
+            return None
+        with timer.stage("yolo"):
+            results = models.yolo(image, verbose=False)[0]
+        with timer.stage("crop"):
+            plates = recognizer.crop_plate_boxes(image, results)
+        if not plates:
+            return None
+
+        _, _, plate_img = plates[0]
+        with timer.stage("quality"):
+            contrast, sharpness = recognizer.calculate_image_quality(plate_img)
+            upscale = recognizer.needs_upscale(contrast, sharpness)
+        if upscale:
+            with timer.stage("esrgan"):
+                plate_img = recognizer.super_resolution.enhance(plate_img)
+        with timer.stage("clahe_denoise"):
+            enhanced = recognizer.clahe_and_denoise(plate_img, denoise=upscale)
+        with timer.stage("ocr"):
+            result = models.ocr.ocr(enhanced, cls=True)
+        with timer.stage("postprocess"):
+            lines = result[0] if result and result[0] else []
+            letters, digits = recognizer.parse_plate_text(lines)
+            text = f"{letters} {digits[::-1]}".strip()
+        if use_db:
+            with timer.stage("db"):
+                recognizer.plate_index.match(recognizer.clean_text(letters),
+                                             recognizer.clean_text(digits[::-1]),
+                                             fuzzy=recognizer.FUZZY_MATCH)
+    return text
+
+
+def detections(results):
+    """(xyxy, conf, cls) numpy arrays of one YOLO or OnnxDetector result."""
+    boxes = results.boxes
+
+    def array(value):
+        return np.asarray(value.cpu().numpy() if hasattr(value, "cpu") else value)
+    return (array(boxes.xyxy).reshape(-1, 4).astype(np.float32),
+            array(boxes.conf).reshape(-1).astype(np.float32),
+            array(boxes.cls).reshape(-1).astype(int))
+
+
+def box_iou(box, boxes):
+    w = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    h = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    inter = w * h
+    areas = (box[2] - box[0]) * (box[3] - box[1]) + (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(areas - inter, 1e-6)
+
+
+def detector_parity(reference, candidate, workload, iou_threshold=0.5):
+    """Run both detectors over the workload and compare their boxes.
+
+    Each reference box is matched to the best unused candidate box of the
+    same class with IoU >= ``iou_threshold``. Reports recall and precision
+    of the candidate against the reference, mean IoU and the largest
+    confidence difference of matched boxes, and per-image latency of each.
+    """
+    timer = StageTimer()
+    matched = reference_count = candidate_count = 0
+    ious, conf_diffs = [], []
+    for _, loader in workload:
+        image = loader()
+        if image is None:
+            continue
+        with timer.stage("reference"):
+            expected = detections(reference(image, verbose=False)[0])
+        with timer.stage("candidate"):
+            found = detections(candidate(image, verbose=False)[0])
+        reference_count += len(expected[2])
+        candidate_count += len(found[2])
+        used = np.zeros(len(found[2]), dtype=bool)
+        for box, conf, cls in zip(*expected):
+            if not len(found[2]):
+                break
+            overlap = box_iou(box, found[0])
+            overlap[(found[2] != cls) | used] = 0.0
+            best = int(overlap.argmax())
+            if overlap[best] >= iou_threshold:
+                used[best] = True
+                matched += 1
+                ious.append(float(overlap[best]))
+                conf_diffs.append(abs(float(conf) - float(found[1][best])))
+
+    stages = timer.summary()
+    reference_ms = stages.get("reference", {}).get("p50_ms")
+    candidate_ms = stages.get("candidate", {}).get("p50_ms")
+    return {
+        "boxes": {"reference": reference_count, "candidate": candidate_count, "matched": matched},
+        "recall": round(matched / reference_count, 4) if reference_count else None,
+        "precision": round(matched / candidate_count, 4) if candidate_count else None,
+        "mean_iou": round(sum(ious) / len(ious), 4) if ious else None,
+        "max_conf_diff": round(max(conf_diffs), 4) if conf_diffs else None,
+        "latency": stages,
+        "speedup": round(reference_ms / candidate_ms, 2) if reference_ms and candidate_ms else None,
+    }
+
+
+def build_workload(recognizer, paths, replay, seed):
+    """(name, loader) pairs: the originals, then ``replay`` rounds of
+    synthetic variants. Images load through ``recognizer.load_image`` and
+    variants are fitted after augmenting, so every image is the size
+    detect_and_ocr would see."""
+    workload = [(os.path.basename(p), (lambda p=p: recognizer.load_image(p))) for p in paths]
+    rng = random.Random(seed)
+    for round_index in range(replay):
+        for path in paths:
+            variant_seed = rng.randrange(1 << 30)
+
+            def load(path=path, variant_seed=variant_seed):
+                image = recognizer.load_image(path)
+                if image is None:
+                    return None
+                return recognizer.fit_image(augment(image, random.Random(variant_seed)))
+            workload.append((f"replay{round_index}:{os.path.basename(path)}", load))
+    return workload
+
+
+def compare(current, baseline, tolerance):
+    """List human-readable regressions of ``current`` against ``baseline``."""
+    regressions = []
+    for stage, stats in current.get("stages", {}).items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if old[key] and stats[key] > old[key] * (1 + tolerance):
+                regressions.append(f"{stage} {key}: {old[key]:.1f} -> {stats[key]:.1f}")
+    old_tp = baseline.get("throughput", {}).get("images_per_sec")
+    new_tp = current.get("throughput", {}).get("images_per_sec")
+    if old_tp and new_tp is not None and new_tp < old_tp * (1 - tolerance):
+        regressions.append(f"images_per_sec: {old_tp:.2f} -> {new_tp:.2f}")
+    for key in ("plate_accuracy", "char_accuracy"):
+        old = baseline.get("accuracy", {}).get(key)
+        new = current.get("accuracy", {}).get(key)
+        if old is not None and new is not None and new < old - 0.01:
+            regressions.append(f"{key}: {old:.3f} -> {new:.3f}")
+    for key in ("recall", "precision"):
+        old = baseline.get("detector_parity", {}).get(key)
+        new = current.get("detector_parity", {}).get(key)
+        if old is not None and new is not None and new < old - 0.01:
+            regressions.append(f"detector {key}: {old:.3f} -> {new:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ANPR pipeline over a folder of images")
+    parser.add_argument("--images", default="Images")
+    parser.add_argument("--labels", default="plate_results.csv",
+                        help="ground truth CSV (date, plate text, image path)")
+    parser.add_argument("--min-labelled", type=int, default=20,
+                        help="fewer labelled images than this and accuracy is reported as not measured")
+    parser.add_argument("--replay", type=int, default=0,
+                        help="extra rounds of seeded synthetic variants of every image")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--limit", type=int, default=None, help="only the first N images")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed images run first")
+    parser.add_argument("--db", action="store_true", help="also time the plate lookup")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative slowdown before --compare fails")
+    parser.add_argument("--onnx", help="ONNX export to check for parity and speed against the .pt detector")
+    parser.add_argument("--parity-iou", type=float, default=0.5,
+                        help="IoU at which an ONNX box counts as the same detection")
+    args = parser.parse_args()
+
+    import main1 as recognizer
+
+    paths = sorted(os.path.join(args.images, name) for name in os.listdir(args.images)
+                   if name.lower().endswith(recognizer.IMAGE_EXTENSIONS))[:args.limit]
+    workload = build_workload(recognizer, paths, args.replay, args.seed)
+
+    print("⏱️ Loading models...")
+    recognizer.models.warmup(("yolo", "ocr", "upsampler"), background=False)
+
+    for _, loader in workload[:args.warmup]:
+        run_image(recognizer, loader, StageTimer(), args.db)
+
+    timer = StageTimer()
+    predictions = []
+    start = time.perf_counter()
+    for name, loader in workload:
+        text = run_image(recognizer, loader, timer, args.db)
+        predictions.append((name, text))
+    elapsed = time.perf_counter() - start
+
+    truth = load_ground_truth(args.labels)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": vars(args),
+            "model_startup_s": {k: round(v, 3) for k, v in recognizer.models.timings.items()},
+        },
+        "stages": timer.summary(),
+        "throughput": {
+            "images": len(workload),
+            "seconds": round(elapsed, 3),
+            "images_per_sec": round(len(workload) / elapsed, 3) if elapsed else None,
+            "plates_found": sum(1 for _, text in predictions if text),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "accuracy": score_accuracy(predictions, truth, args.min_labelled),
+        "predictions": [{"image": name, "text": text} for name, text in predictions],
+    }
+
+    if args.onnx:
+        from onnx_detector import OnnxDetector
+        candidate = OnnxDetector(args.onnx, threads=recognizer.CPU_THREADS)
+        report["detector_parity"] = detector_parity(recognizer.models.yolo, candidate, workload,
+                                                    args.parity_iou)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for stage, stats in report["stages"].items():
+        print(f"📊 {stage:>13}: p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  (n={stats['count']})")
+    print(f"📊 {report['throughput']['images_per_sec']} images/sec, peak RSS {report['peak_rss_mb']} MB")
+    accuracy = report["accuracy"]
+    if accuracy["measured"]:
+        print(f"📊 accuracy over {accuracy['labelled_images']} labelled images: "
+              f"plate {accuracy['plate_accuracy']}, char {accuracy['char_accuracy']}")
+    else:
+        print(f"⚠️ Accuracy not measured: {accuracy['labelled_images']} labelled image(s) in {args.labels}, "
+              f"need --min-labelled {args.min_labelled}")
+    parity = report.get("detector_parity")
+    if parity:
+        print(f"📊 ONNX detector: recall {parity['recall']}, precision {parity['precision']}, "
+              f"mean IoU {parity['mean_iou']}, {parity['speedup']}x the .pt p50 latency")
+    print(f"✅ Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
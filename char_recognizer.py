@@ -0,0 +1,110 @@
+import numpy as np
+
+from translations import DIGITS, LETTERS
+
+PADDLE = "paddle"
+CHARS = "chars"
+
+MAX_LETTERS = 3
+MAX_DIGITS = 4
+
+
+def _iou_matrix(boxes):
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    area = (x2 - x1) * (y2 - y1)
+    ix1 = np.maximum(x1[:, None], x1[None, :])
+    iy1 = np.maximum(y1[:, None], y1[None, :])
+    ix2 = np.minimum(x2[:, None], x2[None, :])
+    iy2 = np.minimum(y2[:, None], y2[None, :])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    return inter / np.maximum(area[:, None] + area[None, :] - inter, 1e-6)
+
+
+class CharRecognizer:
+    """Reads plates from the character boxes YOLO already finds.
+
+    The detector is trained on the plate, car and every digit/letter class
+    (data.yaml), so each plate box normally comes with a box per character.
+    ``read`` keeps the characters whose centre falls inside the plate,
+    drops duplicate boxes on the same character, orders them left to right
+    and maps the class names through ``translations``.
+
+    Results use the same conventions as the PaddleOCR path (letters
+    reversed, digits in image order) so they go to the DB unchanged. A read
+    that breaks Egyptian plate grammar (1-3 letters, 1-4 digits) or whose
+    weakest character is under ``min_confidence`` is reported as not
+    confident, and callers fall back to PaddleOCR.
+    """
+
+    def __init__(self, names, min_confidence=0.5, duplicate_iou=0.6):
+        self.names = names
+        self.min_confidence = min_confidence
+        self.duplicate_iou = duplicate_iou
+        self.stats = {"confident": 0, "fallback": 0}
+        size = max(names) + 1 if isinstance(names, dict) else len(names)
+        lookup = names.get if isinstance(names, dict) else (lambda i: names[i])
+        # class id -> (glyph, is_digit); None for non-character classes
+        self._glyphs = [None] * size
+        for class_id in range(size):
+            name = lookup(class_id)
+            if name in DIGITS:
+                self._glyphs[class_id] = (DIGITS[name], True)
+            elif name in LETTERS:
+                self._glyphs[class_id] = (LETTERS[name], False)
+        self._is_char = np.array([g is not None for g in self._glyphs])
+
+    def char_boxes(self, results):
+        """(xyxy, confidence, class) arrays of every character box in one
+        YOLO result, copied off the GPU once per frame."""
+        boxes = results.boxes
+        xyxy = np.asarray(boxes.xyxy.cpu().numpy() if hasattr(boxes.xyxy, "cpu") else boxes.xyxy,
+                          dtype=np.float32).reshape(-1, 4)
+        conf = np.asarray(boxes.conf.cpu().numpy() if hasattr(boxes.conf, "cpu") else boxes.conf,
+                          dtype=np.float32).reshape(-1)
+        cls = np.asarray(boxes.cls.cpu().numpy() if hasattr(boxes.cls, "cpu") else boxes.cls).astype(int).reshape(-1)
+        keep = self._is_char[cls] if len(cls) else np.zeros(0, dtype=bool)
+        return xyxy[keep], conf[keep], cls[keep]
+
+    def read(self, chars, plate_box):
+        """Read one plate from ``char_boxes`` output.
+
+        Returns (letters, digits, letter_scores, digit_scores, confident)
+        or None when no character lies inside the plate.
+        """
+        xyxy, conf, cls = chars
+        if not len(cls):
+            return None
+        x1, y1, x2, y2 = plate_box
+        cx = (xyxy[:, 0] + xyxy[:, 2]) / 2
+        cy = (xyxy[:, 1] + xyxy[:, 3]) / 2
+        inside = (cx >= x1) & (cx <= x2) & (cy >= y1) & (cy <= y2)
+        if not inside.any():
+            return None
+        xyxy, conf, cls = xyxy[inside], conf[inside], cls[inside]
+
+        # Same character found under two classes: keep the stronger box
+        order = np.argsort(-conf)
+        overlap = _iou_matrix(xyxy[order])
+        kept = []
+        for i in range(len(order)):
+            if all(overlap[i, j] < self.duplicate_iou for j in kept):
+                kept.append(i)
+        picked = order[kept]
+        picked = picked[np.argsort(cx[inside][picked])]  # left to right
+
+        letters, digits = [], []
+        for i in picked:
+            glyph, is_digit = self._glyphs[cls[i]]
+            (digits if is_digit else letters).append((glyph, float(conf[i])))
+
+        letter_scores = [s for _, s in letters][::-1]
+        digit_scores = [s for _, s in digits]
+        scores = letter_scores + digit_scores
+        confident = (1 <= len(letters) <= MAX_LETTERS and 1 <= len(digits) <= MAX_DIGITS
+                     and min(scores) >= self.min_confidence)
+        self.stats["confident" if confident else "fallback"] += 1
+        return ("".join(g for g, _ in letters)[::-1], "".join(g for g, _ in digits),
+                letter_scores, digit_scores, confident)
+
+    def format_stats(self):
+        return f"confident={self.stats['confident']}, fallback to OCR={self.stats['fallback']}"
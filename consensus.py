@@ -0,0 +1,96 @@
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+
+def _align(reference, text):
+    """Map positions of ``text`` onto positions of ``reference``.
+
+    Equal runs and same-length substitutions are aligned one to one;
+    characters that were inserted or dropped in ``text`` are left out.
+    """
+    mapping = {}
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, reference, text, autojunk=False).get_opcodes():
+        if tag == "equal" or (tag == "replace" and i2 - i1 == j2 - j1):
+            for offset in range(i2 - i1):
+                mapping[j1 + offset] = i1 + offset
+    return mapping
+
+
+def vote(reads):
+    """Confidence-weighted per-position vote over (text, scores) reads.
+
+    The output length is the most common read length. Every read is aligned
+    to the most confident read of that length and votes for each position
+    with its per-character OCR score. The confidence of a position is the
+    score mass of the winning character divided by the number of reads, so
+    a missing or disagreeing read counts as a zero vote.
+
+    Returns (text, confidence).
+    """
+    reads = [(text, scores) for text, scores in reads if text is not None]
+    if not reads:
+        return "", 0.0
+
+    def mean(scores):
+        return sum(scores) / len(scores) if scores else 0.0
+
+    lengths = Counter(len(text) for text, _ in reads)
+    length, count = max(lengths.items(),
+                        key=lambda kv: (kv[1], sum(mean(s) for t, s in reads if len(t) == kv[0])))
+    length_confidence = count / len(reads)
+    if length == 0:
+        return "", length_confidence
+
+    reference = max((r for r in reads if len(r[0]) == length), key=lambda r: mean(r[1]))[0]
+    votes = [defaultdict(float) for _ in range(length)]
+    for text, scores in reads:
+        for j, i in _align(reference, text).items():
+            votes[i][text[j]] += scores[j]
+
+    chars = []
+    confidence = length_confidence
+    for position in votes:
+        char, weight = max(position.items(), key=lambda kv: kv[1])
+        chars.append(char)
+        confidence = min(confidence, weight / len(reads))
+    return "".join(chars), confidence
+
+
+class PlateConsensus:
+    """Accumulates noisy per-frame reads of one plate and votes on them.
+
+    Letters and digits are voted separately. ``is_confident`` turns true once
+    at least ``min_reads`` frames agree with a confidence of ``threshold`` or
+    more, so the caller can stop OCR for that vehicle early.
+    """
+
+    def __init__(self, min_reads=2, max_reads=5, threshold=0.8):
+        self.min_reads = min_reads
+        self.max_reads = max_reads
+        self.threshold = threshold
+        self.letter_reads = []
+        self.digit_reads = []
+
+    def __len__(self):
+        return len(self.letter_reads)
+
+    def add(self, letters, digits, letter_scores, digit_scores):
+        self.letter_reads.append((letters, list(letter_scores)))
+        self.digit_reads.append((digits, list(digit_scores)))
+
+    def result(self):
+        """Return (letters, digits, confidence), or None with no reads."""
+        if not self.letter_reads:
+            return None
+        letters, letters_conf = vote(self.letter_reads)
+        digits, digits_conf = vote(self.digit_reads)
+        return letters, digits, min(letters_conf, digits_conf)
+
+    def is_confident(self):
+        if len(self) < self.min_reads:
+            return False
+        return self.result()[2] >= self.threshold
+
+    def done(self):
+        """True once more OCR on this plate is unlikely to change the result."""
+        return len(self) >= self.max_reads or self.is_confident()
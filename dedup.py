@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+from plate_index import plate_key
+from plate_text import clean_text
+
+
+class DedupCache:
+    """Absorbs repeat reads of the same plate on the same camera.
+
+    Keys are (camera, plate) with the plate cleaned (spaces, diacritics and
+    the مصر header removed) but otherwise exact, like access matching:
+    plates that differ only in confusable characters are different cars.
+    A key stays live for ``ttl`` seconds after its last read
+    (the window slides while the car keeps being read), and at most
+    ``max_entries`` keys are kept, least recently read evicted first.
+    """
+
+    def __init__(self, ttl=30.0, max_entries=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._entries = OrderedDict()  # key -> last read time, oldest first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(camera, letters, digits):
+        return camera, plate_key(clean_text(letters), clean_text(digits))
+
+    def _expire(self, now):
+        while self._entries:
+            key, last = next(iter(self._entries.items()))
+            if now - last < self.ttl:
+                break
+            del self._entries[key]
+
+    def seen(self, camera, letters, digits):
+        """True if this plate was read on this camera within the window;
+        otherwise remember it and return False."""
+        if not self.ttl:
+            return False
+        key = self.key(camera, letters, digits)
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            repeat = key in self._entries
+            self._entries[key] = now
+            self._entries.move_to_end(key)
+            if repeat:
+                self.hits += 1
+            else:
+                self.misses += 1
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evicted += 1
+            return repeat
+
+    def forget(self, camera, letters, digits):
+        """Drop a plate, e.g. when persisting it failed."""
+        with self._lock:
+            self._entries.pop(self.key(camera, letters, digits), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def format_stats(self):
+        return f"absorbed={self.hits}, passed={self.misses}, evicted={self.evicted}, live={len(self)}"
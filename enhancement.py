@@ -0,0 +1,120 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from preprocess import enhance_plate
+
+
+def thumbnail(image, size=(64, 16)):
+    """Small gray copy of a crop, for telling near-identical crops apart."""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def cheap_enhance(plate_img, min_height=96):
+    """Fast OpenCV-only enhancement: upscale small crops, sharpen, CLAHE."""
+    h, w = plate_img.shape[:2]
+    if 0 < h < min_height:
+        scale = min_height / h
+        plate_img = cv2.resize(plate_img, (int(w * scale), min_height), interpolation=cv2.INTER_CUBIC)
+
+    # Unsharp mask
+    blurred = cv2.GaussianBlur(plate_img, (0, 0), 2.0)
+    sharpened = cv2.addWeighted(plate_img, 1.6, blurred, -0.6, 0)
+
+    return enhance_plate(sharpened)
+
+
+def ocr_confidence(ocr_result):
+    """Mean PaddleOCR line score of an ocr.ocr() result, 0 if nothing was read."""
+    if not ocr_result or not ocr_result[0]:
+        return 0.0
+    scores = [float(line[1][1]) for line in ocr_result[0] if len(line) >= 2 and line[1]]
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+class EnhancementEngine:
+    """Tiered plate enhancement in front of OCR.
+
+    Every crop first goes through ``cheap_enhance`` and OCR. Only when the
+    OCR confidence is below ``min_confidence`` does the crop get the slow
+    super-resolution path (``super_resolve``, e.g. Real-ESRGAN), and only if
+    the current frame's latency budget still has room for it.
+
+    Callers reading several crops of one track can pass the same ``reuse``
+    list to every ``recognize`` call: a crop of the same size whose
+    thumbnail is within ``max_diff`` mean gray levels of one already
+    super-resolved (a stopped car, consecutive frames) reuses that output.
+    Reuse never crosses tracks, since a one-character difference between
+    two plates can be a smaller difference than camera noise.
+    """
+
+    def __init__(self, super_resolve, ocr_fn, min_confidence=0.85, budget_ms=250,
+                 max_diff=2.0):
+        self.super_resolve = super_resolve
+        self.ocr_fn = ocr_fn
+        self.min_confidence = min_confidence
+        self.budget_ms = budget_ms
+        self.max_diff = max_diff
+        self.stats = {"cheap": 0, "super_resolved": 0, "cache_hits": 0, "over_budget": 0}
+        self._sr_ms = 0.0  # moving average cost of one super-resolution call
+        self._deadline = None
+        self._lock = threading.Lock()  # stats and _sr_ms; callers may be threads
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def begin_frame(self, budget_ms=None):
+        """Start the latency budget for a new frame."""
+        budget = self.budget_ms if budget_ms is None else budget_ms
+        self._deadline = None if budget is None else time.perf_counter() + budget / 1000.0
+
+    def remaining_ms(self):
+        if self._deadline is None:
+            return float("inf")
+        return (self._deadline - time.perf_counter()) * 1000.0
+
+    def _super_resolve_cached(self, plate_img, reuse=None):
+        if reuse is not None:
+            thumb = thumbnail(plate_img)
+            for shape, other, enhanced in reuse:
+                if shape == plate_img.shape and np.abs(thumb - other).mean() <= self.max_diff:
+                    self._count("cache_hits")
+                    return enhanced
+        start = time.perf_counter()
+        enhanced = self.super_resolve(plate_img)
+        elapsed = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self._sr_ms = elapsed if not self._sr_ms else 0.8 * self._sr_ms + 0.2 * elapsed
+            self.stats["super_resolved"] += 1
+        if reuse is not None:
+            reuse.append((plate_img.shape, thumb, enhanced))
+        return enhanced
+
+    def recognize(self, plate_img, reuse=None):
+        """Enhance and OCR a crop. Returns (enhanced_img, ocr_result, tier).
+        ``reuse``: the calling track's list of super-resolved crops."""
+        cheap = cheap_enhance(plate_img)
+        result = self.ocr_fn(cheap)
+        self._count("cheap")
+        confidence = ocr_confidence(result)
+        if confidence >= self.min_confidence:
+            return cheap, result, "cheap"
+
+        if self.remaining_ms() < self._sr_ms:
+            self._count("over_budget")
+            return cheap, result, "cheap"
+
+        enhanced = self._super_resolve_cached(plate_img, reuse)
+        sr_result = self.ocr_fn(enhanced)
+        if ocr_confidence(sr_result) >= confidence:
+            return enhanced, sr_result, "super_resolved"
+        return cheap, result, "cheap"
+
+    def format_stats(self):
+        return (f"cheap={self.stats['cheap']}, super_resolved={self.stats['super_resolved']}, "
+                f"cache_hits={self.stats['cache_hits']}, over_budget={self.stats['over_budget']}, "
+                f"sr_avg={self._sr_ms:.0f} ms")
@@ -0,0 +1,111 @@
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime
+
+import cv2
+
+
+class EvidenceStore:
+    """Writes vehicle evidence images on a background thread.
+
+    ``save`` picks the file path, enqueues the image and returns the path
+    straight away, so the caller can put it in the DB without waiting for
+    JPEG encoding or the disk. Files go to date-sharded directories
+    (``root/YYYY/MM/DD/<uuid>.jpg``).
+
+    With ``crop_only`` and a plate crop, the main file is the plate crop and
+    the frame is kept only as a downscaled ``<uuid>_context.jpg``.
+
+    Enqueued images are encoded later, so callers must not draw on a frame
+    after handing it to ``save``.
+    """
+
+    def __init__(self, root="images", quality=90, crop_only=False, context_width=640,
+                 shard_by_date=True, max_queue=64, put_timeout=0.5):
+        self.root = root
+        self.quality = quality
+        self.crop_only = crop_only
+        self.context_width = context_width
+        self.shard_by_date = shard_by_date
+        self.put_timeout = put_timeout
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(max_queue)
+        self._known_dirs = set()
+        self._thread = threading.Thread(target=self._run, name="evidence-writer", daemon=True)
+        self._thread.start()
+
+    def _new_path(self):
+        folder = self.root
+        if self.shard_by_date:
+            folder = os.path.join(folder, datetime.now().strftime("%Y/%m/%d"))
+        return os.path.join(folder, f"{uuid.uuid4()}.jpg").replace(os.sep, "/")
+
+    def save(self, frame, plate_img=None):
+        """Queue a frame (and optionally its plate crop). Returns the path
+        the DB should store, or None if the queue stayed full."""
+        path = self._new_path()
+        try:
+            self._queue.put((path, frame, plate_img), timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            print(f"❌ Evidence queue full, image not saved: {path}")
+            return None
+        return path
+
+    def flush(self, timeout=None):
+        """Block until every queued image is on disk."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _write(self, path, image):
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        folder = os.path.dirname(path)
+        if folder and folder not in self._known_dirs:
+            os.makedirs(folder, exist_ok=True)
+            self._known_dirs.add(folder)
+        # open().write instead of cv2.imwrite so non-ASCII paths work on Windows
+        with open(path, "wb") as f:
+            f.write(encoded.tobytes())
+
+    def _store(self, path, frame, plate_img):
+        if self.crop_only and plate_img is not None:
+            self._write(path, plate_img)
+            h, w = frame.shape[:2]
+            if w > self.context_width:
+                scale = self.context_width / w
+                frame = cv2.resize(frame, (self.context_width, int(h * scale)),
+                                   interpolation=cv2.INTER_AREA)
+            self._write(path[:-len(".jpg")] + "_context.jpg", frame)
+        else:
+            self._write(path, frame)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            path, frame, plate_img = item
+            try:
+                self._store(path, frame, plate_img)
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Failed to save evidence image {path}: {e}")
@@ -0,0 +1,118 @@
+import threading
+import time
+from datetime import datetime
+
+LOGIN = "login"
+LOGOUT = "logout"
+
+SQL_LOGIN = "INSERT INTO vehicle_logs (vehicle_id, check_in, status) VALUES (%s, %s, 'login')"
+# Closes the vehicle's open log. Its log_id isn't known yet when the
+# INSERT is still queued, but there is at most one open log per vehicle.
+SQL_LOGOUT = ("UPDATE vehicle_logs SET check_out = %s, status = 'logout' "
+              "WHERE vehicle_id = %s AND status = 'login'")
+
+
+def to_timestamp(value):
+    """Epoch seconds of a DB datetime (MySQL) or 'YYYY-MM-DD HH:MM:SS' string (SQLite)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S').timestamp()
+
+
+class GateState:
+    """Which vehicles are inside, kept in memory.
+
+    Loaded once from ``vehicles`` and the newest ``vehicle_logs`` row of
+    each vehicle; after that an in/out decision is a dict lookup instead of
+    a vehicle SELECT plus an ``ORDER BY log_id DESC`` query per read.
+
+    - A read less than ``debounce`` seconds after the previous read of the
+      same vehicle is ignored: the car is still at the barrier.
+    - A vehicle that logged in less than ``min_dwell`` seconds ago can't
+      log out yet, so a late read at the entrance doesn't close its visit.
+
+    Decisions are written behind through ``writer`` (a BatchWriter), in
+    the order they were made.
+    """
+
+    def __init__(self, db, writer, debounce=10.0, min_dwell=60.0, clock=time.time):
+        self.db = db
+        self.writer = writer
+        self.debounce = debounce
+        self.min_dwell = min_dwell
+        self.clock = clock
+        self.loaded = False
+        self.stats = {LOGIN: 0, LOGOUT: 0, "debounced": 0, "dwell": 0}
+        self._vehicles = {}   # plate_id -> vehicle_id
+        self._inside = {}     # vehicle_id -> check-in time of its open log
+        self._last_read = {}  # vehicle_id -> time of its last read
+        self._lock = threading.RLock()
+
+    def load(self):
+        """(Re)build the state from the database."""
+        start = time.perf_counter()
+        vehicles = self.db.fetchall("SELECT plate_id, vehicle_id FROM vehicles")
+        latest = self.db.fetchall(
+            "SELECT l.vehicle_id, l.status, l.check_in FROM vehicle_logs l "
+            "JOIN (SELECT vehicle_id, MAX(log_id) AS log_id FROM vehicle_logs GROUP BY vehicle_id) m "
+            "ON l.log_id = m.log_id")
+        with self._lock:
+            self._vehicles = {plate_id: vehicle_id for plate_id, vehicle_id in vehicles}
+            # A login without a check-in time counts as an old one
+            self._inside = {vehicle_id: to_timestamp(check_in) or 0.0
+                            for vehicle_id, status, check_in in latest if status == LOGIN}
+            self._last_read = {}
+            self.loaded = True
+        print(f"✅ Gate state loaded: {len(self._vehicles)} vehicle(s), {len(self._inside)} inside, "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load()
+
+    def vehicle_id(self, plate_id):
+        """The vehicle registered for a plate, or None."""
+        self.ensure_loaded()
+        return self._vehicles.get(plate_id)
+
+    def add_vehicle(self, plate_id, vehicle_id):
+        with self._lock:
+            self._vehicles[plate_id] = vehicle_id
+
+    def is_inside(self, vehicle_id):
+        self.ensure_loaded()
+        return vehicle_id in self._inside
+
+    def read(self, vehicle_id, now=None):
+        """Record a read of the vehicle. Returns LOGIN, LOGOUT, or None when
+        the read is ignored; the log write is queued, not waited for."""
+        self.ensure_loaded()
+        now = self.clock() if now is None else now
+        with self._lock:
+            last, self._last_read[vehicle_id] = self._last_read.get(vehicle_id), now
+            if last is not None and now - last < self.debounce:
+                self.stats["debounced"] += 1
+                return None
+            check_in = self._inside.get(vehicle_id)
+            stamp = datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+            if check_in is None:
+                self._inside[vehicle_id] = now
+                self.writer.write(SQL_LOGIN, (vehicle_id, stamp))
+                decision = LOGIN
+            elif now - check_in < self.min_dwell:
+                self.stats["dwell"] += 1
+                return None
+            else:
+                del self._inside[vehicle_id]
+                self.writer.write(SQL_LOGOUT, (stamp, vehicle_id))
+                decision = LOGOUT
+            self.stats[decision] += 1
+            return decision
+
+    def format_stats(self):
+        return (f"in={self.stats[LOGIN]}, out={self.stats[LOGOUT]}, debounced={self.stats['debounced']}, "
+                f"too soon to leave={self.stats['dwell']}, inside now={len(self._inside)}")
@@ -3,40 +3,16 @@ from paddleocr import PaddleOCR
 import cv2
 import numpy as np
 import re
+# Arabic character translations
+from translations import TRANSLATIONS as translations
+# Precompiled once instead of on every call
+from plate_text import is_arabic_text, is_english_text
+from preprocess import get_clahe
 
 # Initialize models
 yolo_model = YOLO("best.pt")
 ocr = PaddleOCR(use_angle_cls=True, lang='ar', use_gpu=True)
 
-# Arabic character translations
-translations = {
-    # ----------------- Digits -----------------
-    '0': '٠', '1': '١', '2': '٢', '3': '٣', '4': '٤',
-    '5': '٥', '6': '٦', '7': '٧', '8': '٨', '9': '٩',
-
-    'digit_0': '٠', 'digit_1': '١', 'digit_2': '٢', 'digit_3': '٣', 'digit_4': '٤',
-    'digit_5': '٥', 'digit_6': '٦', 'digit_7': '٧', 'digit_8': '٨', 'digit_9': '٩',
-
-    # ----------- English Transliterations -----------
-    '7aah': 'ح', 'Daad': 'ض', 'Een': 'ع', 'Heeh': 'ه',
-    'Kaaf': 'ك', 'Laam': 'ل', 'Meem': 'م', 'Noon': 'ن',
-    'Saad': 'ص', 'Seen': 'س', 'Taa': 'ط', 'Wow': 'و',
-    'Yeeh': 'ي', 'Zeen': 'ز', 'alef': 'أ', 'baa': 'ب',
-    'daal': 'د', 'geem': 'ج',
-
-    # ----------- Short Transliteration Variants -----------
-    'aa': 'ع', 'g': 'ج', 's': 'س', 'ss': 'ص', 'b': 'ب',
-    'd': 'د', 't': 'ط', 'h': 'ه', 'k': 'ق', 'f': 'ف',
-    'n': 'ن', 'l': 'ل', 'm': 'م', 'w': 'و', 'y': 'ي', 'r': 'ر',
-
-    # ------------- From Letter Dataset -------------
-    'letter_ain': 'ع', 'letter_alef': 'أ', 'letter_baa': 'ب', 'letter_dal': 'د',
-    'letter_faa': 'ف', 'letter_haa': 'هـ', 'letter_jeem': 'ج', 'letter_kaf': 'ك',
-    'letter_lam': 'ل', 'letter_meem': 'م', 'letter_noon': 'ن', 'letter_qaf': 'ق',
-    'letter_raa': 'ر', 'letter_saad': 'ص', 'letter_seen': 'س', 'letter_taa2': 'ط',
-    'letter_waaw': 'و', 'letter_yaa': 'ي',
-}
-
 
 def preprocess_image(image):
     """Preprocess the image for better OCR results"""
@@ -46,22 +22,11 @@ def preprocess_image(image):
     # Apply denoising
     denoised = cv2.fastNlMeansDenoising(gray)
     
-    # Enhance contrast
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    enhanced = clahe.apply(denoised)
+    # Enhance contrast (one CLAHE object per thread, not per call)
+    enhanced = get_clahe(2.0, (8, 8)).apply(denoised)
     
     return enhanced
 
-def is_arabic_text(text):
-    """Check if text contains Arabic characters"""
-    arabic_pattern = re.compile(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]+')
-    return bool(arabic_pattern.search(text))
-
-def is_english_text(text):
-    """Check if text contains English characters"""
-    english_pattern = re.compile(r'[a-zA-Z]+')
-    return bool(english_pattern.search(text))
-
 def is_upper_part_text(text):
     """Check if text is likely to be from the upper part of the plate"""
     # Remove spaces and check for مصر variations
@@ -81,8 +46,8 @@ def is_upper_part_text(text):
 
 def process_ocr_result(result):
     """Process OCR results to extract letters and digits"""
-    letters = ""
-    digits = ""
+    letters = []
+    digits = []
     
     if not result:
         return None
@@ -105,14 +70,14 @@ def process_ocr_result(result):
         for char in text:
             translated = translations.get(char, char)
             if translated.isnumeric():
-                digits += translated
+                digits.append(translated)
             elif translated.strip() and is_arabic_text(translated):
-                letters += translated
+                letters.append(translated)
     
     if not (letters or digits):
         return None
         
-    return letters[::-1] + " " + digits[::-1]
+    return "".join(letters)[::-1] + " " + "".join(digits)[::-1]
 
 def detect_and_ocr(image_path):
     """Main function to detect and recognize license plates"""
@@ -1,264 +1,269 @@
-from ultralytics import YOLO
-from paddleocr import PaddleOCR
 import cv2
 import numpy as np
-from basicsr.archs.rrdbnet_arch import RRDBNet
-from realesrgan import RealESRGANer
-import torch
 from PIL import Image
 import os
-import mysql.connector
 from datetime import datetime
 import uuid
-import re
-import unicodedata
-
-print("Loading models...")
-
-# Load YOLO model
-try:
-    yolo_model = YOLO("weights.pt")
-    print("✅ YOLO model loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading YOLO model: {e}")
-    exit()
-
-# Load PaddleOCR model
-try:
-    ocr = PaddleOCR(use_angle_cls=True, lang='ar', use_gpu=True)
-    print("✅ PaddleOCR model loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading PaddleOCR model: {e}")
-    exit()
-
-# Load Real-ESRGAN model
-try:
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"✅ Device set to: {device}")
-    
-    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32)
-    model_path = 'Real-ESRGAN/weights/RealESRGAN_x4plus.pth'
-    
-    if not os.path.exists(model_path):
-        print(f"❌ Model file not found at: {model_path}")
-        exit()
-        
-    upsampler = RealESRGANer(
-        scale=4,
-        model_path=model_path,
-        model=model,
-        tile=200,
-        tile_pad=10,
-        pre_pad=0,
-        device=device
-    )
-    print("✅ Real-ESRGAN model loaded successfully")
-    
-    # Test the model with a small image
-    test_img = np.zeros((100, 100, 3), dtype=np.uint8)
-    enhanced, _ = upsampler.enhance(test_img, outscale=4)
-    print("✅ Real-ESRGAN model tested successfully")
-    
-except Exception as e:
-    print(f"❌ Error loading Real-ESRGAN model: {e}")
-    exit()
-
-print("\n✅ All models loaded successfully\n")
+import argparse
+import json
+from models import ModelRegistry, OCR_SETTINGS, ESRGAN_SETTINGS
+from onnx_detector import TORCH, ONNX
+from enhancement import EnhancementEngine
+from persistence import Database, BatchWriter
+from plate_index import PlateIndex
+from evidence_store import EvidenceStore
+from char_recognizer import CharRecognizer, PADDLE, CHARS
+from dedup import DedupCache
+import result_cache
+from result_cache import ResultCache
+from gate_state import GateState, LOGIN, LOGOUT
+from preprocess import plate_quality, enhance_plate
+from sr_batch import BatchUpsampler
+from plate_text import (PlateParser, clean_text, is_english, remove_diacritics,
+                        split_and_filter_letters, to_arabic_digits)
+import metrics
+from metrics import span
+
+# ANPR_DEVICE=cpu forces CPU inference (used by the worker pool on GPU-less
+# servers); ANPR_CPU_THREADS caps PaddleOCR's CPU threads
+USE_GPU = os.environ.get("ANPR_DEVICE", "auto").lower() != "cpu"
+CPU_THREADS = int(os.environ.get("ANPR_CPU_THREADS", "10"))
+# ANPR_DETECTOR=onnx runs the detector's ONNX export (onnx_detector.py) on
+# ONNX Runtime; ANPR_ONNX_WEIGHTS points at it (default weights.onnx)
+DETECTOR = os.environ.get("ANPR_DETECTOR", TORCH)
+# Detector settings for batch recognition (the ultralytics predict defaults)
+DETECT_CONF = 0.25
+DETECT_IMGSZ = 640
+# Images are shrunk to fit in (height, width) before detection
+FIT_SIZE = (1200, 1600)
+# Crops with less contrast or sharpness than this go through Real-ESRGAN
+UPSCALE_CONTRAST = 50
+UPSCALE_SHARPNESS = 100
+
+# Models load on first use; Real-ESRGAN only when a plate actually needs it
+models = ModelRegistry(yolo_weights="weights.pt", use_gpu=USE_GPU, cpu_threads=CPU_THREADS,
+                       detector=DETECTOR, onnx_weights=os.environ.get("ANPR_ONNX_WEIGHTS"))
+
+# Real-ESRGAN on several crops per forward pass, sized to the free memory
+super_resolution = BatchUpsampler(models)
 
 # Arabic translations for characters (if any)
 translations = {}
-
-def connect_to_db():
-    """Connect to the database."""
-    try:
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='anpr'  # Updated database name
-        )
-        if conn.is_connected():
-            print("✅ Successfully connected to the database.")
-            return conn
-        else:
-            print("❌ Failed to connect to the database.")
-            return None
-    except mysql.connector.Error as err:
-        print(f"❌ Database connection error: {err}")
-        return None
-
-def save_plate_and_vehicle(letters, digits, vehicle_image):
-    conn = None
+text_parser = PlateParser(translations)
+
+# "chars" reads plates from YOLO's character boxes and only OCRs plates
+# without a confident read; "paddle" OCRs every plate
+RECOGNIZER = os.environ.get("ANPR_RECOGNIZER", PADDLE)
+_char_reader = None
+
+# Pooled connections instead of a new connection per call; the pool is
+# only opened on the first query, so importing main1 (as the worker pool
+# does) connects to nothing.
+# ANPR_DB_URL=sqlite:///anpr.db works as a local stand-in for MySQL
+db = Database.from_url(os.environ.get("ANPR_DB_URL", "mysql://root:@localhost/anpr"))
+# vehicle_logs writes go through a background writer in multi-row batches
+_db_writer = None
+
+plate_index = PlateIndex(db, table="plates", id_column="plate_id")
+# Access needs an exact plate match unless fuzzy matching (one edit, logged)
+# is turned on with ANPR_FUZZY_MATCH=1 or --fuzzy-match
+FUZZY_MATCH = os.environ.get("ANPR_FUZZY_MATCH") == "1"
+# Evidence images are JPEG-encoded and written on a background thread,
+# started on the first save
+_evidence = None
+# A second read of the same car within the window would log it straight
+# back out; it is absorbed here instead
+dedup = DedupCache(ttl=30.0)
+# Who is inside is kept in memory and loaded on the first read; in/out
+# decisions no longer query vehicle_logs
+_gate = None
+GATE_DEBOUNCE = 10.0
+GATE_MIN_DWELL = 60.0
+
+def db_writer():
+    global _db_writer
+    if _db_writer is None:
+        _db_writer = BatchWriter(db, max_batch=50, max_delay=1.0)
+    return _db_writer
+
+def evidence_store():
+    global _evidence
+    if _evidence is None:
+        _evidence = EvidenceStore(root="images")
+    return _evidence
+
+def gate_state():
+    global _gate
+    if _gate is None:
+        _gate = GateState(db, db_writer(), debounce=GATE_DEBOUNCE, min_dwell=GATE_MIN_DWELL)
+    return _gate
+
+def char_reader():
+    global _char_reader
+    if _char_reader is None:
+        _char_reader = CharRecognizer(models.yolo.names)
+    return _char_reader
+
+def db_now():
+    # Timestamps are passed as parameters (not NOW()) so queued writes keep
+    # the time of the read and the SQL also runs on SQLite
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def save_plate_and_vehicle(letters, digits, vehicle_image, plate_img=None, camera="default"):
+    """Check access and log the vehicle in or out. Returns False if the
+    database work failed (the read can then be retried), True otherwise."""
+    if dedup.seen(camera, letters, digits):
+        metrics.DEDUP_ABSORBED.inc()
+        print(f"⏭️ Repeat read of '{letters} {digits}' on {camera}, skipped")
+        return True
     try:
-        conn = connect_to_db()
-        if not conn:
-            return
-
-        db_operator = conn.cursor()
-
-        # Clean the input text
-        letters = clean_text(letters)
-        digits = clean_text(digits)
-        print(f"DEBUG: Cleaned letters='{letters}', digits='{digits}'")
-
-        # 1. Check if the plate exists
-        sql_check_plate = "SELECT plate_id FROM plates WHERE letters = %s AND numbers = %s"
-        db_operator.execute(sql_check_plate, (letters, digits))
-        plate = db_operator.fetchone()
-
-        if not plate:
-            print("❌ Access Denied.")
-            return
-
-        plate_id = plate[0]
-
-        # 2. Check if vehicle exists for this plate
-        sql_check_vehicle = "SELECT vehicle_id FROM vehicles WHERE plate_id = %s"
-        db_operator.execute(sql_check_vehicle, (plate_id,))
-        vehicle = db_operator.fetchone()
+        with span("db"):
+            _save_plate_and_vehicle(letters, digits, vehicle_image, plate_img)
+    except Exception as err:
+        print(f"❌ Database error: {err}")
+        # Not persisted: let the next read of this plate try again
+        dedup.forget(camera, letters, digits)
+        return False
+    return True
+
+def _save_plate_and_vehicle(letters, digits, vehicle_image, plate_img):
+    # Clean the input text
+    letters = clean_text(letters)
+    digits = clean_text(digits)
+    print(f"DEBUG: Cleaned letters='{letters}', digits='{digits}'")
+
+    # 1. Check if the plate exists (in-memory index; exact unless
+    # FUZZY_MATCH allows one misread character)
+    plate_id = plate_index.match(letters, digits, fuzzy=FUZZY_MATCH)
+
+    if plate_id is None:
+        metrics.ACCESS_DECISIONS.labels(decision="deny").inc()
+        print("❌ Access Denied.")
+        return
+    metrics.ACCESS_DECISIONS.labels(decision="grant").inc()
+
+    # 2. Check if vehicle exists for this plate (in memory; the DB is
+    # only queried the first time a plate is seen)
+    gate = gate_state()
+    vehicle_id = gate.vehicle_id(plate_id)
+
+    if vehicle_id is None:
+        with db.transaction() as db_operator:
+            sql_check_vehicle = "SELECT vehicle_id FROM vehicles WHERE plate_id = %s"
+            db_operator.execute(sql_check_vehicle, (plate_id,))
+            vehicle = db_operator.fetchone()
+
+            if not vehicle:
+                # Insert new vehicle row (one-time setup); the image is
+                # written in the background
+                image_path = evidence_store().save(vehicle_image, plate_img)
+
+                sql_insert_vehicle = "INSERT INTO vehicles (plate_id, vehicle_image, created_at) VALUES (%s, %s, %s)"
+                db_operator.execute(sql_insert_vehicle, (plate_id, image_path, db_now()))
+                vehicle_id = db_operator.lastrowid
+                print("🚗 New vehicle created and logged.")
+            else:
+                vehicle_id = vehicle[0]
+        gate.add_vehicle(plate_id, vehicle_id)
+
+    # 3. In or out, decided in memory; the log row is written behind
+    decision = gate.read(vehicle_id)
+    if decision == LOGIN:
+        print("🟢 Vehicle logged IN")
+    elif decision == LOGOUT:
+        print("🔴 Vehicle logged OUT")
+    else:
+        print("⏭️ Read ignored (still at the gate, or logged in too recently)")
 
-        if not vehicle:
-            # Insert new vehicle row (one-time setup)
-            image_path = f"images/{uuid.uuid4()}.jpg"
-            os.makedirs(os.path.dirname(image_path), exist_ok=True)
-            cv2.imwrite(image_path, vehicle_image)
+def calculate_image_quality(image):
+    """Calculate image quality: (contrast, sharpness)."""
+    return plate_quality(image)
 
-            sql_insert_vehicle = "INSERT INTO vehicles (plate_id, vehicle_image, created_at) VALUES (%s, %s, NOW())"
-            db_operator.execute(sql_insert_vehicle, (plate_id, image_path))
-            conn.commit()
-            vehicle_id = db_operator.lastrowid
-            print("🚗 New vehicle created and logged.")
-        else:
-            vehicle_id = vehicle[0]
-
-        # 3. Check last log entry for this vehicle
-        sql_last_log = """
-            SELECT log_id, status FROM vehicle_logs 
-            WHERE vehicle_id = %s 
-            ORDER BY log_id DESC 
-            LIMIT 1
-        """
-        db_operator.execute(sql_last_log, (vehicle_id,))
-        last_log = db_operator.fetchone()
-
-        if not last_log or last_log[1] == 'logout':
-            # Insert login record
-            sql_insert_log = "INSERT INTO vehicle_logs (vehicle_id, check_in, status) VALUES (%s, NOW(), 'login')"
-            db_operator.execute(sql_insert_log, (vehicle_id,))
-            print("🟢 Vehicle logged IN")
-        elif last_log[1] == 'login':
-            # Update last log to mark as logout
-            sql_update_log = """
-                UPDATE vehicle_logs 
-                SET check_out = NOW(), status = 'logout' 
-                WHERE log_id = %s
-            """
-            db_operator.execute(sql_update_log, (last_log[0],))
-            print("🔴 Vehicle logged OUT")
-
-        conn.commit()
-
-    except mysql.connector.Error as err:
-        print(f"❌ Database error: {err}")
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            db_operator.close()
-            conn.close()
+def needs_upscale(contrast, sharpness):
+    return contrast < UPSCALE_CONTRAST or sharpness < UPSCALE_SHARPNESS
 
+def clahe_and_denoise(enhanced, denoise):
+    """CLAHE on the L channel of a BGR image, optional denoising. Returns BGR."""
+    return enhance_plate(enhanced, denoise=denoise)
 
-def calculate_image_quality(image):
-    """Calculate image quality."""
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    contrast = np.std(gray)
-    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-    sharpness = np.var(laplacian)
-    return contrast, sharpness
-
-def enhance_plate_image(plate_img):
+def enhance_plate_image(plate_img, upscale=None):
+    """Real-ESRGAN (when upscale, by default when the crop is low quality)
+    followed by CLAHE and denoising."""
     try:
         contrast, sharpness = calculate_image_quality(plate_img)
-        plate_rgb = cv2.cvtColor(plate_img, cv2.COLOR_BGR2RGB)
-        
-        if contrast < 50 or sharpness < 100:
-            enhanced, _ = upsampler.enhance(plate_rgb, outscale=4)
+        if upscale is None:
+            upscale = needs_upscale(contrast, sharpness)
+        if upscale:
+            # Real-ESRGAN takes and returns BGR like the rest of OpenCV
+            with span("esrgan"):
+                enhanced = super_resolution.enhance(plate_img)
             print("✅ Image enhanced using Real-ESRGAN")
         else:
-            enhanced = plate_rgb
+            enhanced = plate_img
             print("✅ Image is clear, no enhancement needed")
         
-        lab = cv2.cvtColor(enhanced, cv2.COLOR_RGB2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-        cl = clahe.apply(l)
-        enhanced_lab = cv2.merge((cl,a,b))
-        enhanced = cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2RGB)
-        enhanced_img = cv2.cvtColor(enhanced, cv2.COLOR_RGB2BGR)
-        
-        if contrast < 50 or sharpness < 100:
-            enhanced_img = cv2.fastNlMeansDenoisingColored(enhanced_img, None, 10, 10, 7, 21)
-        
-        return enhanced_img
+        return clahe_and_denoise(enhanced, denoise=upscale)
     except Exception as e:
         print(f"❌ Error enhancing image: {e}")
         return plate_img
 
-def is_english(text):
-    """Check if the text is in English."""
-    return all(ord('A') <= ord(c) <= ord('Z') or ord('a') <= ord(c) <= ord('z') for c in text)
-
-def remove_diacritics(text):
-    return ''.join(c for c in unicodedata.normalize('NFD', text)
-                   if unicodedata.category(c) != 'Mn')
-
-def clean_text(text):
-    text = text.replace(" ", "")
-    # امسح كل أشكال كلمة مصر حتى لو فيها مسافات أو تشكيل
-    text = remove_diacritics(text)
-    text = re.sub(r"م\s*ص\s*ر", "", text)
-    text = re.sub(r"egypt", "", text, flags=re.IGNORECASE)
-    text = text.strip()
-    return text
-
-def split_and_filter_letters(letters):
-    groups = [letters[i:i+3] for i in range(0, len(letters), 3)]
-    filtered = []
-    for group in groups:
-        # لو المجموعة فيها أي حرف من كلمة مصر تجاهلها
-        if any(c in group for c in 'مصر'):
-            continue
-        filtered.append(group)
-    return ''.join(filtered)
-
-def to_arabic_digits(s):
-    western = '0123456789'
-    arabic = '٠١٢٣٤٥٦٧٨٩'
-    trans = str.maketrans(western, arabic)
-    return s.translate(trans)
+def enhance_plate_images(crops):
+    """enhance_plate_image for many crops: every low-quality crop of the
+    batch goes through Real-ESRGAN together."""
+    upscale = [needs_upscale(*calculate_image_quality(crop)) for crop in crops]
+    enhanced = list(crops)
+    blurry = [i for i, flag in enumerate(upscale) if flag]
+    if blurry:
+        try:
+            with span("esrgan"):
+                outputs = super_resolution.enhance_batch([crops[i] for i in blurry])
+            for i, output in zip(blurry, outputs):
+                enhanced[i] = output
+        except Exception as e:
+            print(f"❌ Error enhancing images: {e}")
+            upscale = [False] * len(crops)
+    return [clahe_and_denoise(image, denoise=flag) for image, flag in zip(enhanced, upscale)]
+
+def parse_plate_text(lines):
+    """Turn PaddleOCR lines ([box, (text, score)]) into (letters, digits)."""
+    return text_parser.parse(lines)
+
+def load_image(image_path):
+    """Read an image and shrink it to fit FIT_SIZE. Returns None on failure."""
+    with span("load"):
+        image = cv2.imread(image_path)
+    if image is None:
+        return None
+    metrics.FRAMES.inc()
+    return fit_image(image)
+
+def fit_image(image):
+    """Shrink an image to at most FIT_SIZE (height, width), keeping its aspect ratio."""
+    height, width = image.shape[:2]
+    max_height, max_width = FIT_SIZE
+    if height > max_height or width > max_width:
+        scale = min(max_height/height, max_width/width)
+        new_height = int(height * scale)
+        new_width = int(width * scale)
+        image = cv2.resize(image, (new_width, new_height))
+    return image
 
 def detect_and_ocr(image_path):
     try:
-        image = cv2.imread(image_path)
+        image = load_image(image_path)
         if image is None:
             print("❌ Error: Unable to read image")
             return
-            
-        height, width = image.shape[:2]
-        if height > 1200 or width > 1600:
-            scale = min(1200/height, 1600/width)
-            new_height = int(height * scale)
-            new_width = int(width * scale)
-            image = cv2.resize(image, (new_width, new_height))
-            print(f"✅ Image resized to {new_width}x{new_height}")
-            
-        results = yolo_model(image)[0]
+
+        with span("detect"):
+            results = models.yolo(image)[0]
 
         for box in results.boxes:
             class_id = int(box.cls[0])
-            class_name = yolo_model.names[class_id]
+            class_name = models.yolo.names[class_id]
 
             if class_name == "License Plate":
+                metrics.PLATES_DETECTED.inc()
                 x1, y1, x2, y2 = map(int, box.xyxy[0])
                 margin = 10
                 h, w = image.shape[:2]
@@ -272,53 +277,31 @@ def detect_and_ocr(image_path):
                 cv2.imshow("Original Plate", plate_img)
                 cv2.waitKey(1)
 
-                enhanced_plate = enhance_plate_image(plate_img)
+                with span("enhance"):
+                    enhanced_plate = enhance_plate_image(plate_img)
                 
                 cv2.imshow("Enhanced Plate", enhanced_plate)
                 cv2.waitKey(1)
 
-                result = ocr.ocr(enhanced_plate, cls=True)
+                with span("ocr"):
+                    result = models.ocr.ocr(enhanced_plate, cls=True)
 
                 if result and len(result) > 0 and result[0]:
-                    letters = ""
-                    digits = ""
-
-                    # First pass: collect all characters
-                    for line in result[0]:
-                        if len(line) >= 2 and line[1]:
-                            text = clean_text(line[1][0])
-                            if not text:
-                                continue
-                            
-
-                            for char in text:
-                                if is_english(char):
-                                    continue
-                                translated = translations.get(char, char)
-                                if translated.isnumeric():
-                                    digits += translated
-                                elif translated.strip():
-                                    letters += translated
-
-                    # Process letters and digits separately
-                    letters_clean = ''.join([c for c in letters if not c.isdigit()])
-                    digits_clean = ''.join([c for c in digits if c.isdigit()])
-
-                    # Only reverse letters, keep digits as is
-                    letters_final = split_and_filter_letters(letters_clean)[::-1]
-
+                    metrics.OCR_READS.labels(result="hit").inc()
+                    letters_final, digits_clean = parse_plate_text(result[0])
                     digits_final = digits_clean[::-1]
 
                     print(f"DEBUG: Original digits='{digits_clean}'")
                     print(f"DEBUG: Reversed digits='{digits_final}'")
                     print(f"DEBUG: Final letters='{letters_final}'")
 
-                    save_plate_and_vehicle(letters_final, digits_final, image)
+                    save_plate_and_vehicle(letters_final, digits_final, image, plate_img)
 
                     cv2.imshow("Final Result", image)
                     cv2.waitKey(0)
                     cv2.destroyAllWindows()
                 else:
+                    metrics.OCR_READS.labels(result="miss").inc()
                     print("❌ No text found")
                 break
         else:
@@ -327,5 +310,340 @@ def detect_and_ocr(image_path):
     except Exception as e:
         print(f"❌ Error: {str(e)}")
 
-# Test
-detect_and_ocr("Images\\img3-.jpg")
+def crop_plate_boxes(image, results, margin=10):
+    """Return [(box, confidence, crop)] for every license plate YOLO found."""
+    plates = []
+    h, w = image.shape[:2]
+    for box in results.boxes:
+        class_id = int(box.cls[0])
+        if models.yolo.names[class_id] != "License Plate":
+            continue
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        x1 = max(0, x1 - margin)
+        y1 = max(0, y1 - margin)
+        x2 = min(w, x2 + margin)
+        y2 = min(h, y2 + margin)
+        plates.append(((x1, y1, x2, y2), float(box.conf[0]), image[y1:y2, x1:x2]))
+    return plates
+
+def crop_text_line(image, points):
+    """Perspective-crop one text line found by the PaddleOCR detector."""
+    points = np.array(points, dtype=np.float32)
+    width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    width, height = max(width, 1), max(height, 1)
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    matrix = cv2.getPerspectiveTransform(points, target)
+    line = cv2.warpPerspective(image, matrix, (width, height),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    if height / width >= 1.5:
+        line = np.rot90(line)
+    return line
+
+def ocr_plates_batch(plate_imgs):
+    """OCR many plate crops, batching text recognition across all of them.
+
+    Text lines are located per crop, then every line from every crop goes
+    through the recognizer in one call so PaddleOCR can batch them
+    (rec_batch_num). Lines under ocr.drop_score are dropped, as ocr.ocr
+    does. Returns one list of [box, (text, score)] lines per crop, the same
+    shape as ocr.ocr(img)[0].
+    """
+    line_boxes = []
+    line_imgs = []
+    owners = []
+    for i, plate_img in enumerate(plate_imgs):
+        detected = models.ocr.ocr(plate_img, rec=False)
+        boxes = detected[0] if detected and detected[0] else []
+        # Top-to-bottom, then left-to-right, like PaddleOCR's sorted_boxes
+        for box in sorted(boxes, key=lambda b: (b[0][1], b[0][0])):
+            line_boxes.append(box)
+            line_imgs.append(crop_text_line(plate_img, box))
+            owners.append(i)
+
+    lines = [[] for _ in plate_imgs]
+    if not line_imgs:
+        return lines
+    # ocr.ocr(list, det=False) still recognizes one image per call, so go
+    # straight to the classifier/recognizer, which batch internally
+    ocr = models.ocr
+    if ocr.use_angle_cls:
+        line_imgs, _, _ = ocr.text_classifier(line_imgs)
+    recognized, _ = ocr.text_recognizer(line_imgs)
+    for owner, box, (text, score) in zip(owners, line_boxes, recognized):
+        if score >= ocr.drop_score:
+            lines[owner].append([box, (text, score)])
+    return lines
+
+def recognize_images(images, enhance=True):
+    """Detect and read every plate in a batch of already-loaded images.
+
+    Returns one list per image of dicts with the plate box (in the image's
+    own coordinates), detector confidence, OCR lines and parsed text.
+    """
+    return [[plate_from_raw(raw) for raw in found] for found in recognize_raw(images, enhance)]
+
+def recognize_raw(images, enhance=True):
+    """The model side of recognize_images: per plate its box, detector
+    confidence, and either the CharRecognizer read ("char_read") or the
+    raw OCR lines ("ocr_lines", [text, score]) with a fingerprint of the
+    crop they were read from ("crop"). No text parsing, so this is what
+    ResultCache stores.
+    """
+    valid = [i for i, image in enumerate(images) if image is not None]
+    with span("detect"):
+        detections = (models.yolo([images[i] for i in valid], verbose=False, conf=DETECT_CONF,
+                                  imgsz=DETECT_IMGSZ) if valid else [])
+
+    plates = [[] for _ in images]
+    crops = []
+    found = 0
+    with span("enhance"):
+        for i, results in zip(valid, detections):
+            chars = char_reader().char_boxes(results) if RECOGNIZER == CHARS else None
+            for box, confidence, crop in crop_plate_boxes(images[i], results):
+                found += 1
+                plates[i].append({"box": list(box), "confidence": round(confidence, 4)})
+                read = char_reader().read(chars, box) if chars is not None else None
+                if read and read[4]:
+                    letters, digits, letter_scores, digit_scores, confident = read
+                    plates[i][-1]["char_read"] = [letters, digits, [float(s) for s in letter_scores],
+                                                  [float(s) for s in digit_scores], bool(confident)]
+                    continue
+                crops.append((i, len(plates[i]) - 1, crop))
+        if enhance and crops:
+            enhanced = enhance_plate_images([crop for _, _, crop in crops])
+            crops = [(i, j, crop) for (i, j, _), crop in zip(crops, enhanced)]
+    metrics.PLATES_DETECTED.inc(found)
+
+    with span("ocr"):
+        ocr_lines = ocr_plates_batch([crop for _, _, crop in crops])
+    for (i, j, crop), lines in zip(crops, ocr_lines):
+        metrics.OCR_READS.labels(result="hit" if lines else "miss").inc()
+        plates[i][j]["ocr_lines"] = [[text, round(float(score), 4)] for _, (text, score) in lines]
+        plates[i][j]["crop"] = result_cache.fingerprint(crop)
+    return plates
+
+def plate_from_raw(raw):
+    """A recognize_raw plate turned into the recognize_images record."""
+    record = {"box": raw["box"], "confidence": raw["confidence"]}
+    if "char_read" in raw:
+        record.update(char_record(raw["char_read"]))
+    else:
+        record.update(plate_record([[None, (text, score)] for text, score in raw["ocr_lines"]]))
+    return record
+
+def char_record(read):
+    """plate_record equivalent for a CharRecognizer read."""
+    letters, digits, letter_scores, digit_scores, _ = read
+    return {
+        "letters": letters,
+        "digits": digits[::-1],
+        "text": f"{letters} {digits[::-1]}".strip(),
+        "ocr_lines": [],
+        "recognizer": CHARS,
+        "char_confidence": round(min(letter_scores + digit_scores), 4),
+    }
+
+def plate_record(lines):
+    """Parsed text plus the raw OCR lines of one plate, JSON-friendly."""
+    letters, digits = parse_plate_text(lines)
+    return {
+        "letters": letters,
+        "digits": digits[::-1],
+        "text": f"{letters} {digits[::-1]}".strip(),
+        "ocr_lines": [[text, round(float(score), 4)] for _, (text, score) in lines],
+    }
+
+# Cheap OpenCV enhancement first; Real-ESRGAN only when OCR isn't confident
+enhancer = EnhancementEngine(super_resolve=lambda plate_img: enhance_plate_image(plate_img, upscale=True),
+                             ocr_fn=lambda plate_img: models.ocr.ocr(plate_img, cls=True),
+                             budget_ms=None)
+metrics.ENHANCEMENTS.set_function(lambda: dict(enhancer.stats))
+
+def read_plate(plate_img, enhance=True):
+    """Enhance and OCR a single plate crop. Returns a plate_record dict."""
+    with span("enhance_ocr"):
+        if enhance:
+            _, result, tier = enhancer.recognize(plate_img)
+        else:
+            result, tier = models.ocr.ocr(plate_img, cls=True), None
+    metrics.OCR_READS.labels(result="hit" if result and result[0] else "miss").inc()
+    record = plate_record(result[0] if result and result[0] else [])
+    record["enhancement"] = tier
+    return record
+
+def cache_version(enhance):
+    """ResultCache version for the current models and settings: everything
+    that changes what recognize_raw returns for the same image."""
+    weights = models.onnx_weights if models.detector == ONNX else models.yolo_weights
+    settings = {
+        "detector": [models.detector, DETECT_CONF, DETECT_IMGSZ],
+        "fit": FIT_SIZE,
+        "upscale": [UPSCALE_CONTRAST, UPSCALE_SHARPNESS],
+        "esrgan": [ESRGAN_SETTINGS, models.tile],
+        "ocr": OCR_SETTINGS,
+        "recognizer": RECOGNIZER,
+        "enhance": enhance,
+    }
+    return result_cache.version(result_cache.file_signature(weights),
+                                result_cache.file_signature(models.esrgan_weights),
+                                result_cache.package_version("paddleocr"),
+                                json.dumps(settings, sort_keys=True))
+
+def detect_and_ocr_batch(paths, batch_size=8, enhance=True, cache=None):
+    """Batched, display-free version of detect_and_ocr for bulk reprocessing.
+
+    Images are streamed from disk ``batch_size`` at a time, sent to YOLO as
+    one batch, and all plate crops of the batch are OCR'd together. Yields
+    one dict per path, in input order:
+    {"path", "width", "height", "plates": [...], "error"}.
+    Nothing is shown on screen or written to the database.
+
+    With a ResultCache, images already processed by the same models and
+    settings skip the models and are only parsed again; their records
+    have "cached": true.
+    """
+    version = cache_version(enhance) if cache is not None else None
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= batch_size:
+            yield from _process_batch(batch, enhance, cache, version)
+            batch = []
+    if batch:
+        yield from _process_batch(batch, enhance, cache, version)
+
+def _read_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return result_cache.digest(f.read())
+    except OSError:
+        return None
+
+def _process_batch(paths, enhance, cache=None, version=None):
+    digests = [_read_digest(path) for path in paths] if cache is not None else [None] * len(paths)
+    cached = cache.get_many([d for d in digests if d], version) if cache is not None else {}
+    todo = [i for i, d in enumerate(digests) if d not in cached]
+
+    images = {i: load_image(paths[i]) for i in todo}
+    raw = {}
+    error = None
+    try:
+        if todo:
+            raw = dict(zip(todo, recognize_raw([images[i] for i in todo], enhance)))
+    except Exception as e:
+        print(f"❌ Batch error: {e}")
+        error = str(e)
+    if cache is not None:
+        cache.put_many({digests[i]: {"width": images[i].shape[1], "height": images[i].shape[0],
+                                     "plates": raw[i]}
+                        for i in raw if digests[i] and images[i] is not None}, version)
+
+    for i, path in enumerate(paths):
+        if i not in images:
+            entry = cached[digests[i]]
+            width, height, found, failed = entry["width"], entry["height"], entry["plates"], None
+        elif images[i] is None:
+            width, height, found, failed = None, None, [], "Unable to read image"
+        else:
+            height, width = images[i].shape[:2]
+            found, failed = raw.get(i, []), error
+        record = {
+            "path": path,
+            "width": width,
+            "height": height,
+            "plates": [plate_from_raw(plate) for plate in found],
+            "error": failed,
+        }
+        if cache is not None:
+            record["cached"] = i not in images
+        yield record
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+def list_images(paths):
+    """Expand directories into the image files they contain, sorted."""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect and read license plates in images")
+    parser.add_argument("paths", nargs="*", help="image files or directories (e.g. Images)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", help="write one JSON result per line to this file")
+    parser.add_argument("--no-enhance", action="store_true", help="skip enhance_plate_image")
+    parser.add_argument("--cache", default=None, metavar="PATH",
+                        help="reuse model results of unchanged images from this SQLite file")
+    parser.add_argument("--cache-size-mb", type=float, default=512,
+                        help="drop least recently used cache entries beyond this size")
+    parser.add_argument("--warmup", action="store_true",
+                        help="load and warm up YOLO and PaddleOCR in the background right away")
+    parser.add_argument("--dedup-ttl", type=float, default=30.0,
+                        help="seconds before the same plate is logged in/out again (0 = off)")
+    parser.add_argument("--fuzzy-match", action="store_true", default=FUZZY_MATCH,
+                        help="grant access to a registered plate one misread character away (logged)")
+    parser.add_argument("--debounce", type=float, default=GATE_DEBOUNCE,
+                        help="ignore reads of a vehicle this many seconds after its previous read")
+    parser.add_argument("--min-dwell", type=float, default=GATE_MIN_DWELL,
+                        help="seconds a vehicle must be inside before it can log out")
+    parser.add_argument("--recognizer", choices=[PADDLE, CHARS], default=RECOGNIZER,
+                        help="chars: read YOLO character boxes, PaddleOCR only for unsure plates")
+    parser.add_argument("--detector", choices=[TORCH, ONNX], default=DETECTOR,
+                        help="onnx: run the exported detector on ONNX Runtime (CPU)")
+    parser.add_argument("--onnx-weights", default=models.onnx_weights)
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the sampling profiler and write collapsed stacks to --profile-out")
+    parser.add_argument("--profile-out", default="profile.collapsed")
+    args = parser.parse_args()
+
+    RECOGNIZER = args.recognizer
+    models.detector = args.detector
+    models.onnx_weights = args.onnx_weights
+    dedup.ttl = args.dedup_ttl
+    FUZZY_MATCH = args.fuzzy_match
+    GATE_DEBOUNCE = args.debounce
+    GATE_MIN_DWELL = args.min_dwell
+    profiler = metrics.start(args.metrics_port, args.profile)
+
+    if args.warmup:
+        models.warmup()
+
+    if not args.paths:
+        # Test
+        detect_and_ocr("Images\\img3-.jpg")
+    else:
+        out = open(args.output, "w", encoding="utf-8") if args.output else None
+        cache = ResultCache(args.cache, int(args.cache_size_mb * 1024 * 1024)) if args.cache else None
+        try:
+            for record in detect_and_ocr_batch(list_images(args.paths), args.batch_size,
+                                               not args.no_enhance, cache):
+                line = json.dumps(record, ensure_ascii=False)
+                if out:
+                    out.write(line + "\n")
+                else:
+                    print(line)
+        finally:
+            if out:
+                out.close()
+            if cache is not None:
+                print(f"📊 Result cache: {cache.format_stats()}")
+                cache.close()
+    if _evidence is not None:
+        _evidence.close()
+    if _gate is not None:
+        print(f"📊 Gate: {_gate.format_stats()}")
+    if _db_writer is not None:
+        _db_writer.close()
+    print(f"⏱️ Model startup: {models.format_timings()}")
+    if profiler is not None:
+        profiler.stop()
+        profiler.dump(args.profile_out)
+        print(f"📊 Profile: {profiler.samples} samples written to {args.profile_out}")
@@ -0,0 +1,184 @@
+import collections
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client import start_http_server as _start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Seconds; tuned for per-stage latencies from sub-millisecond DB lookups up
+# to multi-second Real-ESRGAN calls on CPU
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class ScrapeFunction:
+    """A metric with one label whose values are read from ``function()``
+    at scrape time, so nothing is updated on the hot path.
+
+    ``function`` returns a dict of label value -> number; the last
+    ``set_function`` call wins.
+    """
+
+    def __init__(self, name, help_text, label, kind="gauge", registry=REGISTRY):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.family = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+        self._function = None
+        registry.register(self)
+
+    def set_function(self, function):
+        self._function = function
+
+    def describe(self):
+        return [self.family(self.name, self.help, labels=[self.label])]
+
+    def collect(self):
+        family = self.family(self.name, self.help, labels=[self.label])
+        try:
+            values = self._function() if self._function is not None else {}
+        except Exception:
+            values = {}
+        for key, value in sorted((str(k), v) for k, v in values.items()):
+            family.add_metric([key], value)
+        yield family
+
+
+STAGE_SECONDS = Histogram("anpr_stage_seconds", "Time spent in each processing stage",
+                          ["stage"], buckets=DEFAULT_BUCKETS)
+
+
+@contextmanager
+def span(stage):
+    """Time a block into anpr_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def timed(stage):
+    """Decorator form of ``span``."""
+    def decorate(func):
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorate
+
+
+class SamplingProfiler:
+    """Low-overhead statistical profiler for a running process.
+
+    A daemon thread grabs every other thread's stack every ``interval``
+    seconds and counts the collapsed stacks, so the output can go straight
+    into flamegraph.pl / speedscope. Nothing is traced between samples.
+    """
+
+    def __init__(self, interval=0.01, max_depth=40):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            collected = []
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                collected.append(";".join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(collected)
+                self.samples += 1
+
+    def collapsed(self):
+        """``thread;outer;...;inner count`` lines, most frequent first."""
+        with self._lock:
+            items = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def top(self, limit=20):
+        """Innermost frames that were on CPU (or blocked) most often."""
+        with self._lock:
+            leaves = collections.Counter()
+            for stack, count in self._stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+            samples = self.samples
+        lines = [f"{samples} samples every {self.interval * 1000:.0f} ms"]
+        for frame, count in leaves.most_common(limit):
+            lines.append(f"{count:8d}  {frame}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+
+
+# Shared by realtime.py and main1.py
+FRAMES = Counter("anpr_frames_total", "Frames (or images) read")
+PLATES_DETECTED = Counter("anpr_plates_detected_total", "License plate boxes found by YOLO")
+OCR_READS = Counter("anpr_ocr_reads_total", "Plate crops OCR'd, by whether any text came out", ["result"])
+ACCESS_DECISIONS = Counter("anpr_access_decisions_total", "Plates checked against the plates table",
+                           ["decision"])
+DEDUP_ABSORBED = Counter("anpr_dedup_absorbed_total",
+                         "Repeat plate reads dropped by the dedup window before persistence")
+DB_ROWS_DROPPED = Counter("anpr_db_rows_dropped_total",
+                          "Queued DB rows lost after the batch writer's retries")
+ENHANCEMENTS = ScrapeFunction("anpr_enhancement", "EnhancementEngine calls by tier", "tier",
+                              kind="counter")
+QUEUE_DEPTH = ScrapeFunction("anpr_queue_depth", "Items waiting in each queue", "queue")
+DETECT_IMGSZ = ScrapeFunction("anpr_detect_imgsz", "Detector input size in use, per camera", "camera")
+STAGE_FPS = ScrapeFunction("anpr_stage_fps", "Items per second over the last few seconds", "stage")
+# service.py
+SERVICE_REQUESTS = Counter("anpr_service_requests_total", "Recognition requests by outcome", ["result"])
+SERVICE_BATCH = Histogram("anpr_service_batch_size", "Images per micro-batch",
+                          buckets=(1, 2, 4, 8, 16, 32))
+
+
+def start(port=None, profile=False, profile_interval=0.01, host="127.0.0.1"):
+    """Serve ``/metrics`` on ``port`` (if given) and start the sampling
+    profiler (if ``profile``). Returns the profiler or None."""
+    profiler = SamplingProfiler(profile_interval).start() if profile else None
+    if port:
+        _start_http_server(port, addr=host)
+        print(f"📊 Metrics on http://{host}:{port}/metrics")
+    return profiler
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+
+from onnx_detector import TORCH, ONNX
+
+ESRGAN_WEIGHTS = 'Real-ESRGAN/weights/RealESRGAN_x4plus.pth'
+# What PaddleOCR and RealESRGANer are built with; result caches key on these
+OCR_SETTINGS = {"use_angle_cls": True, "lang": "ar"}
+ESRGAN_SETTINGS = {"scale": 4, "tile_pad": 10, "pre_pad": 10}
+
+
+def _load_yolo(registry):
+    if registry.detector == ONNX:
+        from onnx_detector import OnnxDetector
+        return OnnxDetector(registry.onnx_weights, threads=registry.cpu_threads)
+    from ultralytics import YOLO
+    return YOLO(registry.yolo_weights)
+
+
+def _load_ocr(registry):
+    from paddleocr import PaddleOCR
+    return PaddleOCR(**OCR_SETTINGS, use_gpu=registry.use_gpu, cpu_threads=registry.cpu_threads)
+
+
+def _load_upsampler(registry):
+    import torch
+    from basicsr.archs.rrdbnet_arch import RRDBNet
+    from realesrgan import RealESRGANer
+
+    if not os.path.exists(registry.esrgan_weights):
+        raise FileNotFoundError(f"Model file not found at: {registry.esrgan_weights}")
+    device = torch.device('cuda' if registry.use_gpu and torch.cuda.is_available() else 'cpu')
+    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32)
+    return RealESRGANer(
+        model_path=registry.esrgan_weights,
+        model=model,
+        tile=registry.tile,
+        device=device,
+        **ESRGAN_SETTINGS
+    )
+
+
+def _warm_yolo(model):
+    import numpy as np
+    model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+
+
+def _warm_ocr(model):
+    import numpy as np
+    model.ocr(np.full((48, 160, 3), 255, dtype=np.uint8), cls=True)
+
+
+def _warm_upsampler(model):
+    import numpy as np
+    model.enhance(np.zeros((100, 100, 3), dtype=np.uint8), outscale=4)
+
+
+LOADERS = {
+    "yolo": ("YOLO", _load_yolo, _warm_yolo),
+    "ocr": ("PaddleOCR", _load_ocr, _warm_ocr),
+    "upsampler": ("Real-ESRGAN", _load_upsampler, _warm_upsampler),
+}
+
+
+class ModelRegistry:
+    """Loads each model the first time it is used instead of at import time.
+
+    ``registry.yolo``, ``registry.ocr`` and ``registry.upsampler`` block
+    until that one model is ready; the heavy libraries are only imported by
+    the loader that needs them. Load and warm-up times are kept in
+    ``timings`` so slow cold starts show up per component.
+
+    With ``detector="onnx"`` the detector is the ONNX export of the weights
+    (``onnx_weights``, by default the weights path with an .onnx suffix)
+    run on ONNX Runtime instead of the PyTorch model.
+    """
+
+    def __init__(self, yolo_weights="best.pt", esrgan_weights=ESRGAN_WEIGHTS,
+                 use_gpu=True, cpu_threads=10, tile=200, detector=TORCH, onnx_weights=None):
+        if detector not in (TORCH, ONNX):
+            raise ValueError(f"Unknown detector backend: {detector}")
+        self.yolo_weights = yolo_weights
+        self.detector = detector
+        self.onnx_weights = onnx_weights or os.path.splitext(yolo_weights)[0] + ".onnx"
+        self.esrgan_weights = esrgan_weights
+        self.use_gpu = use_gpu
+        self.cpu_threads = cpu_threads
+        self.tile = tile
+        self.timings = {}
+        self._models = {}
+        self._locks = {name: threading.Lock() for name in LOADERS}
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                label, loader, _ = LOADERS[name]
+                start = time.perf_counter()
+                try:
+                    model = loader(self)
+                except Exception as e:
+                    print(f"❌ Error loading {label} model: {e}")
+                    raise
+                self.timings[f"{name}_load"] = time.perf_counter() - start
+                print(f"✅ {label} model loaded in {self.timings[f'{name}_load']:.2f}s")
+                self._models[name] = model
+        return model
+
+    @property
+    def yolo(self):
+        return self.get("yolo")
+
+    @property
+    def ocr(self):
+        return self.get("ocr")
+
+    @property
+    def upsampler(self):
+        return self.get("upsampler")
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warmup(self, names=("yolo", "ocr"), background=True):
+        """Load the given models and run one dummy inference through each.
+
+        Real-ESRGAN is left out by default since most plates never need it.
+        With ``background`` the work runs on a daemon thread, which is
+        returned so callers can join it if they want.
+        """
+        def run():
+            for name in names:
+                try:
+                    model = self.get(name)
+                    start = time.perf_counter()
+                    LOADERS[name][2](model)
+                    self.timings[f"{name}_warmup"] = time.perf_counter() - start
+                except Exception as e:
+                    print(f"❌ Warm-up of {name} failed: {e}")
+            print(f"✅ Warm-up done: {self.format_timings()}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def format_timings(self):
+        return ", ".join(f"{key} {value:.2f}s" for key, value in self.timings.items())
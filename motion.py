@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+DIFF = "diff"
+MOG2 = "mog2"
+
+
+def parse_roi(text):
+    """"x,y;x,y;..." -> [(x, y), ...]. Values <= 1 are fractions of the frame."""
+    if not text:
+        return None
+    points = [tuple(float(v) for v in pair.split(",")) for pair in text.split(";") if pair.strip()]
+    if len(points) < 3:
+        raise ValueError(f"ROI needs at least 3 points: {text}")
+    return points
+
+
+class MotionGate:
+    """Cheap pre-filter that decides whether a frame is worth running YOLO on.
+
+    Frames are shrunk to ``width`` pixels wide, blurred and compared with the
+    previous one (``diff``) or fed to a background subtractor (``mog2``).
+    Only pixels inside the lane ``roi`` polygon count. Once motion is seen
+    the detector keeps running for ``hold_frames`` more frames, so a
+    vehicle stopping at the barrier is still read.
+
+    While the lane stays idle the gate also stops looking at most frames:
+    the check runs every 2nd, 4th, ... up to every ``max_skip``-th frame,
+    and callers can ``grab()`` the skipped frames without decoding them.
+    """
+
+    def __init__(self, roi=None, width=160, threshold=25, min_area=0.01, hold_frames=15,
+                 max_skip=8, idle_frames=30, method=DIFF):
+        if method not in (DIFF, MOG2):
+            raise ValueError(f"Unknown motion method: {method}")
+        self.roi = roi
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area
+        self.hold_frames = hold_frames
+        self.max_skip = max(1, max_skip)
+        self.idle_frames = idle_frames
+        self.method = method
+        self.stats = {"checked": 0, "skipped": 0, "motion": 0, "detect": 0}
+        self._previous = None
+        self._mask = None
+        self._mask_pixels = 0
+        self._size = None
+        self._subtractor = None
+        self._hold = 0
+        self._idle = 0
+        self._skip = 1
+        self._countdown = 0
+
+    def _small(self, frame):
+        h, w = frame.shape[:2]
+        if self._size is None or self._size[2:] != (w, h):
+            height = max(1, int(h * self.width / w))
+            self._size = (self.width, height, w, h)
+            self._mask = self._roi_mask(w, h, self.width, height)
+            self._mask_pixels = max(1, int(np.count_nonzero(self._mask)) if self._mask is not None
+                                    else self.width * height)
+            self._previous = None
+        gray = cv2.cvtColor(cv2.resize(frame, self._size[:2], interpolation=cv2.INTER_AREA),
+                            cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _roi_mask(self, w, h, small_w, small_h):
+        if not self.roi:
+            return None
+        fractions = all(0 <= x <= 1 and 0 <= y <= 1 for x, y in self.roi)
+        sx, sy = (small_w, small_h) if fractions else (small_w / w, small_h / h)
+        polygon = np.array([[int(x * sx), int(y * sy)] for x, y in self.roi], dtype=np.int32)
+        mask = np.zeros((small_h, small_w), dtype=np.uint8)
+        cv2.fillPoly(mask, [polygon], 255)
+        return mask
+
+    def wants_frame(self):
+        """False when the idle frame-skip says this frame needn't even be
+        decoded. Call once per captured frame, before ``update``."""
+        if self._countdown > 0:
+            self._countdown -= 1
+            self.stats["skipped"] += 1
+            return False
+        return True
+
+    def motion_ratio(self, frame):
+        """Fraction of ROI pixels that changed."""
+        small = self._small(frame)
+        if self.method == MOG2:
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(history=300, detectShadows=False)
+            changed = self._subtractor.apply(small)
+        else:
+            previous, self._previous = self._previous, small
+            if previous is None:
+                return 1.0  # first frame: assume something is there
+            changed = cv2.threshold(cv2.absdiff(small, previous), self.threshold, 255,
+                                    cv2.THRESH_BINARY)[1]
+        if self._mask is not None:
+            changed = cv2.bitwise_and(changed, self._mask)
+        return cv2.countNonZero(changed) / self._mask_pixels
+
+    def update(self, frame):
+        """True if the detector should run on this frame."""
+        self.stats["checked"] += 1
+        if self.motion_ratio(frame) >= self.min_area:
+            self.stats["motion"] += 1
+            self._hold = self.hold_frames
+            self._idle = 0
+            self._skip = 1
+        elif self._hold > 0:
+            self._hold -= 1
+        else:
+            self._idle += 1
+            if self._idle >= self.idle_frames:
+                # Idle for a while: check half as often, up to max_skip
+                self._skip = min(self.max_skip, self._skip * 2)
+                self._idle = 0
+            self._countdown = self._skip - 1
+            return False
+        self.stats["detect"] += 1
+        return True
+
+    def format_stats(self):
+        total = self.stats["checked"] + self.stats["skipped"]
+        ratio = self.stats["detect"] / total if total else 0.0
+        return (f"checked={self.stats['checked']}, skipped={self.stats['skipped']}, "
+                f"motion={self.stats['motion']}, detector ran on {ratio:.0%} of frames")
@@ -0,0 +1,422 @@
+"""Many cameras, one set of models.
+
+Every stream is decoded on its own reader thread, which keeps only the
+newest frame. A single detector thread takes frames from the streams in
+round-robin order, runs YOLO on them as one batch and updates each
+stream's own tracker. Finished tracks go to the OCR worker(s), and every
+result is tagged with the stream it came from. Models are loaded once per
+process (realtime.models), so adding a camera costs a reader thread and a
+tracker, not another copy of YOLO/PaddleOCR/Real-ESRGAN.
+
+    python multicam.py --stream lane1=0 --stream lane2=rtsp://cam2/live
+    python multicam.py --config cameras.json
+
+cameras.json: [{"id": "lane1", "source": 0, "roi": [[0.1, 0.4], [0.9, 0.4], [0.9, 1], [0.1, 1]]},
+               {"id": "lane2", "source": "rtsp://..."}]
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+import metrics
+import realtime
+from motion import MotionGate, parse_roi
+from resolution import ResolutionController
+from char_recognizer import PADDLE, CHARS
+from pipeline import BoundedQueue, StageStats, BLOCK, STOP
+
+
+def parse_source(source):
+    """Camera index for digit strings, otherwise a path/URL."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+def is_live(source):
+    return isinstance(source, int) or "://" in str(source)
+
+
+class StreamReader(threading.Thread):
+    """Decodes one stream and holds on to its newest frame only.
+
+    Live sources (camera index, RTSP/HTTP) are reconnected after a failed
+    read; video files are played at their native frame rate and end the
+    stream when they run out.
+
+    With a motion ``gate`` the reader also decides, on its own thread,
+    whether a frame needs the detector; frames the idle skip passes over are
+    grabbed without decoding.
+    """
+
+    def __init__(self, stream_id, source, on_frame, reconnect_delay=2.0, gate=None):
+        super().__init__(name=f"reader-{stream_id}", daemon=True)
+        self.stream_id = stream_id
+        self.source = source
+        self.on_frame = on_frame
+        self.reconnect_delay = reconnect_delay
+        self.gate = gate
+        self.stats = StageStats()
+        self.dropped = 0
+        self.finished = False
+        self._frame = None
+        self._motion = True
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def take(self):
+        """Return (frame, motion) if a new frame arrived since the last take,
+        else None. ``motion`` is False when the gate saw an idle lane."""
+        with self._lock:
+            frame, self._frame = self._frame, None
+            return None if frame is None else (frame, self._motion)
+
+    def has_frame(self):
+        return self._frame is not None
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def run(self):
+        live = is_live(self.source)
+        cap = None
+        try:
+            while not self._stop_event.is_set():
+                if cap is None:
+                    cap = self._open()
+                    if cap is None:
+                        print(f"❌ [{self.stream_id}] can't open {self.source}")
+                        if not live:
+                            break
+                        self._stop_event.wait(self.reconnect_delay)
+                        continue
+                    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+                    interval = 0.0 if live else 1.0 / fps
+
+                start = time.perf_counter()
+                if self.gate is not None and not self.gate.wants_frame():
+                    ret, frame = cap.grab(), None
+                else:
+                    ret, frame = cap.read()
+                if not ret:
+                    cap.release()
+                    cap = None
+                    if not live:
+                        break
+                    print(f"❌ [{self.stream_id}] read failed, reconnecting...")
+                    self._stop_event.wait(self.reconnect_delay)
+                    continue
+
+                metrics.FRAMES.inc()
+                if frame is not None:
+                    motion = self.gate is None or self.gate.update(frame)
+                    with self._lock:
+                        if self._frame is not None:
+                            self.dropped += 1
+                        self._frame = frame
+                        self._motion = motion
+                    self.stats.record(time.perf_counter() - start)
+                    self.on_frame()
+                if interval:
+                    self._stop_event.wait(max(0.0, interval - (time.perf_counter() - start)))
+        finally:
+            if cap is not None:
+                cap.release()
+            self.finished = True
+            self.on_frame()
+
+
+class MultiCameraServer:
+    """Runs the shared detector and OCR workers over all stream readers.
+
+    OCR workers take realtime.ocr_lock around enhancement and OCR, since
+    they share one PaddleOCR instance and EnhancementEngine; extra workers
+    only overlap persisting and ``on_result``.
+    """
+
+    def __init__(self, streams, batch_size=8, max_missed=10, ocr_crops=5,
+                 ocr_workers=1, ocr_queue_size=64, persist=True, on_result=None, gates=None,
+                 resolutions=None):
+        if not streams:
+            raise ValueError("No streams configured")
+        ids = [stream_id for stream_id, _ in streams]
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"Duplicate stream ids: {ids}")
+        self.batch_size = batch_size
+        self.persist = persist
+        self.on_result = on_result or self._print_result
+        self._ready = threading.Condition()
+        gates = gates or {}
+        self.readers = [StreamReader(stream_id, parse_source(source), self._notify,
+                                     gate=gates.get(stream_id))
+                        for stream_id, source in streams]
+        self.trackers = {r.stream_id: realtime.new_tracker(max_missed, ocr_crops) for r in self.readers}
+        # Per-stream detector input size (ResolutionController), if adaptive
+        self.resolutions = resolutions or {}
+        self.detect_stats = StageStats()
+        self.ocr_stats = StageStats()
+        self.ocr_queue = BoundedQueue(ocr_queue_size, BLOCK)
+        self._next = 0  # round-robin start position
+        self._detector = threading.Thread(target=self._detect_loop, name="detector", daemon=True)
+        self._ocr_workers = [threading.Thread(target=self._ocr_loop, name=f"ocr-{i}", daemon=True)
+                             for i in range(max(1, ocr_workers))]
+
+    def _notify(self):
+        with self._ready:
+            self._ready.notify()
+
+    def _next_batch(self, timeout=0.5):
+        """Up to ``batch_size`` (reader, frame, motion) with at most one frame
+        per stream. The starting stream rotates, so with more streams than
+        batch slots every stream still gets its turn."""
+        with self._ready:
+            if not any(r.has_frame() for r in self.readers):
+                self._ready.wait(timeout)
+        batch = []
+        count = len(self.readers)
+        for offset in range(count):
+            reader = self.readers[(self._next + offset) % count]
+            taken = reader.take()
+            if taken is not None:
+                batch.append((reader, *taken))
+                if len(batch) >= self.batch_size:
+                    self._next = (self._next + offset + 1) % count
+                    break
+        else:
+            self._next = (self._next + 1) % count
+        return batch
+
+    def _detect_loop(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                if not batch:
+                    if all(r.finished for r in self.readers):
+                        break
+                    continue
+                start = time.perf_counter()
+                # Idle frames skip YOLO but still advance their tracker
+                moving = [(reader, frame) for reader, frame, motion in batch if motion]
+                frames = [frame for _, frame in moving]
+                sizes = [self.resolutions.get(reader.stream_id) for reader, _ in moving]
+                try:
+                    boxes = iter(realtime.detect_plates_batch(frames, sizes) if frames else [])
+                except Exception as e:
+                    print(f"❌ Detector error: {e}")
+                    continue
+                for reader, frame, motion in batch:
+                    found, reads = next(boxes) if motion else ([], None)
+                    for track in self.trackers[reader.stream_id].update(found, frame, reads):
+                        self.ocr_queue.put((reader.stream_id, track))
+                self.detect_stats.record(time.perf_counter() - start)
+        finally:
+            for stream_id, tracker in self.trackers.items():
+                for track in tracker.flush():
+                    self.ocr_queue.put((stream_id, track))
+            for _ in self._ocr_workers:
+                self.ocr_queue.put(STOP)
+
+    def _ocr_loop(self):
+        while True:
+            item = self.ocr_queue.get(timeout=0.5)
+            if item is STOP:
+                break
+            if item is None:
+                continue
+            stream_id, track = item
+            start = time.perf_counter()
+            try:
+                # One PaddleOCR instance and enhancer for all workers
+                with realtime.ocr_lock:
+                    realtime.enhancer.begin_frame()
+                    plate = realtime.recognize_track(track)
+                if plate:
+                    letters, digits, frame, crop = plate
+                    if self.persist:
+                        realtime.persist_plate(letters, digits, frame, crop, camera=stream_id)
+                    self.on_result({
+                        "stream": stream_id,
+                        "track_id": track.track_id,
+                        "letters": letters,
+                        "digits": digits,
+                        "text": track.result,
+                        "frames": track.hits,
+                        "time": datetime.now().isoformat(timespec="seconds"),
+                    })
+            except Exception as e:
+                print(f"❌ [{stream_id}] OCR error: {e}")
+            self.ocr_stats.record(time.perf_counter() - start)
+
+    def _print_result(self, result):
+        print(f"🔍 [{result['stream']}] {result['text']} (track #{result['track_id']})")
+
+    def start(self):
+        for reader in self.readers:
+            reader.start()
+        self._detector.start()
+        for worker in self._ocr_workers:
+            worker.start()
+        metrics.STAGE_FPS.set_function(self._fps)
+        metrics.QUEUE_DEPTH.set_function(lambda: {"ocr": self.ocr_queue.qsize(),
+                                                  "evidence": realtime.evidence.pending()})
+        return self
+
+    def _fps(self):
+        found = {f"read:{r.stream_id}": r.stats.fps() for r in self.readers}
+        found["detect"] = self.detect_stats.fps()
+        found["ocr"] = self.ocr_stats.fps()
+        return found
+
+    def stop(self, drain_timeout=None):
+        """Stop reading and wait until the detector and every OCR worker
+        have finished; tracks still open are flushed and OCR'd.
+
+        With ``drain_timeout`` (seconds), tracks still queued for OCR at
+        the deadline are dropped instead; the workers finish the track they
+        are on. Either way nothing is running when this returns, so the DB
+        and evidence writers can be closed right after.
+        """
+        for reader in self.readers:
+            reader.stop()
+        self._notify()
+        deadline = None if drain_timeout is None else time.monotonic() + drain_timeout
+        self._detector.join()
+        if deadline is not None:
+            for worker in self._ocr_workers:
+                worker.join(max(0.0, deadline - time.monotonic()))
+            if any(w.is_alive() for w in self._ocr_workers):
+                dropped = self.ocr_queue.clear()
+                # The detector's STOPs went with the cleared tracks
+                for _ in self._ocr_workers:
+                    self.ocr_queue.put(STOP)
+                if dropped:
+                    print(f"⚠️ Dropped {dropped} track(s) still queued for OCR at shutdown")
+        self.join()
+
+    def join(self, timeout=None):
+        self._detector.join(timeout)
+        for worker in self._ocr_workers:
+            worker.join(timeout)
+
+    def is_alive(self):
+        return self._detector.is_alive() or any(w.is_alive() for w in self._ocr_workers)
+
+    def format_stats(self):
+        streams = ", ".join(f"{r.stream_id} {r.stats.fps():.1f} fps (dropped {r.dropped})"
+                            for r in self.readers)
+        return (f"{streams} | detect {self.detect_stats.fps():.1f} batches/s, "
+                f"{self.detect_stats.avg_latency_ms():.0f} ms | ocr q={self.ocr_queue.qsize()}")
+
+
+def load_streams(config_path=None, stream_args=()):
+    """([(stream_id, source)], {stream_id: roi}) from a JSON config and/or
+    ``id=source`` args. Config entries may carry a lane ``roi`` polygon."""
+    streams = []
+    rois = {}
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            for i, entry in enumerate(json.load(f)):
+                stream_id = str(entry.get("id", f"cam{i}"))
+                streams.append((stream_id, entry["source"]))
+                if entry.get("roi"):
+                    rois[stream_id] = [tuple(point) for point in entry["roi"]]
+    for arg in stream_args:
+        stream_id, sep, source = arg.partition("=")
+        if not sep:
+            stream_id, source = f"cam{len(streams)}", arg
+        streams.append((stream_id, source))
+    return streams, rois
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-camera license plate recognition")
+    parser.add_argument("--config", help="JSON list of {\"id\", \"source\"} streams")
+    parser.add_argument("--stream", action="append", default=[],
+                        help="id=source (camera index, RTSP URL or video file); repeatable")
+    parser.add_argument("--batch-size", type=int, default=8, help="max frames per YOLO batch")
+    parser.add_argument("--ocr-workers", type=int, default=1,
+                        help="OCR threads; they share one PaddleOCR instance and enhancer, so model "
+                             "calls are serialized and more than 1 only overlaps DB writes and callbacks")
+    parser.add_argument("--max-missed", type=int, default=10)
+    parser.add_argument("--ocr-crops", type=int, default=5)
+    parser.add_argument("--recognizer", choices=[PADDLE, CHARS], default=realtime.RECOGNIZER,
+                        help="chars: read YOLO character boxes, PaddleOCR only as fallback")
+    parser.add_argument("--dedup-ttl", type=float, default=30.0,
+                        help="seconds a plate must go unread on a stream before it is logged again (0 = off)")
+    parser.add_argument("--no-db", action="store_true", help="only print results")
+    parser.add_argument("--output", help="append one JSON result per line to this file")
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    parser.add_argument("--drain-timeout", type=float, default=None,
+                        help="seconds to finish queued tracks at shutdown before dropping them "
+                             "(default: finish all)")
+    parser.add_argument("--metrics-port", type=int, default=None)
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="per stream, run YOLO only when something moves in the lane ROI")
+    parser.add_argument("--roi", help="default lane polygon (x,y;x,y;...) for streams without one")
+    parser.add_argument("--max-skip", type=int, default=8)
+    parser.add_argument("--adaptive-imgsz", action="store_true",
+                        help="per stream, run YOLO at the smallest input size that keeps plates readable")
+    parser.add_argument("--min-plate-height", type=int, default=24,
+                        help="plate height (pixels at the detector input) to keep")
+    args = parser.parse_args()
+
+    realtime.RECOGNIZER = args.recognizer
+    realtime.dedup.ttl = args.dedup_ttl
+    streams, rois = load_streams(args.config, args.stream)
+    gates = {}
+    if args.motion_gate:
+        default_roi = parse_roi(args.roi)
+        gates = {stream_id: MotionGate(roi=rois.get(stream_id, default_roi), max_skip=args.max_skip)
+                 for stream_id, _ in streams}
+    resolutions = {}
+    if args.adaptive_imgsz:
+        resolutions = {stream_id: ResolutionController(min_plate_height=args.min_plate_height)
+                       for stream_id, _ in streams}
+        metrics.DETECT_IMGSZ.set_function(lambda: {s: r.current for s, r in resolutions.items()})
+    out = open(args.output, "a", encoding="utf-8") if args.output else None
+    write_lock = threading.Lock()
+
+    def on_result(result):
+        print(f"🔍 [{result['stream']}] {result['text']} (track #{result['track_id']})")
+        if out:
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+
+    metrics.start(args.metrics_port)
+    if not args.no_db:
+        realtime.plate_index.start_auto_refresh()
+    realtime.models.warmup(("yolo",) if args.recognizer == CHARS else ("yolo", "ocr"),
+                           background=False)
+
+    server = MultiCameraServer(streams, args.batch_size, args.max_missed, args.ocr_crops,
+                               args.ocr_workers, persist=not args.no_db, on_result=on_result,
+                               gates=gates, resolutions=resolutions).start()
+    print(f"✅ Running {len(streams)} stream(s): {', '.join(s for s, _ in streams)}")
+    try:
+        while server.is_alive():
+            time.sleep(args.stats_interval)
+            print(f"📊 {server.format_stats()}")
+    except KeyboardInterrupt:
+        print("✅ تم إيقاف التشغيل")
+    finally:
+        # Returns once every OCR worker is done, so the writers close after the last write
+        server.stop(args.drain_timeout)
+        for stream_id, resolution in resolutions.items():
+            print(f"📊 [{stream_id}] detector resolution: {resolution.format_stats()}")
+        if out:
+            out.close()
+        realtime.evidence.close()
+        if realtime._db_writer is not None:
+            realtime._db_writer.close()
@@ -0,0 +1,222 @@
+"""Plate detector on ONNX Runtime, for CPU-only gate boxes.
+
+``export`` turns the ultralytics weights into an ONNX model (optionally
+INT8-quantized); ``OnnxDetector`` runs it with ONNX Runtime and does the
+letterboxing, box decoding and NMS itself in numpy. It is called and
+returns results like ``YOLO(...)`` does (``results[0].boxes`` with
+``xyxy``/``conf``/``cls``, iterable per box, plus ``names``), so
+ModelRegistry can hand it out as ``models.yolo`` unchanged.
+
+    python onnx_detector.py best.pt --imgsz 640
+    python onnx_detector.py best.pt --int8 --calibration Images
+    ANPR_DETECTOR=onnx python realtime.py
+"""
+import argparse
+import ast
+import os
+
+import cv2
+import numpy as np
+
+TORCH = "torch"
+ONNX = "onnx"
+
+
+def export(weights, imgsz=640, int8=False, calibration=None, opset=12):
+    """Export ``weights`` to ONNX next to it; returns the model path.
+
+    With ``int8`` the model is also quantized: statically, calibrated on
+    the images in the ``calibration`` folder, or dynamically (weights only)
+    without one. Returns the quantized model's path in that case.
+    """
+    from ultralytics import YOLO
+
+    path = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True,
+                                opset=opset)
+    print(f"✅ Exported {weights} -> {path}")
+    if int8:
+        path = quantize(path, calibration, imgsz)
+    return path
+
+
+def quantize(path, calibration=None, imgsz=640, limit=100):
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    output = os.path.splitext(path)[0] + "_int8.onnx"
+    if not calibration:
+        quantize_dynamic(path, output, weight_type=QuantType.QUInt8)
+        print(f"✅ Dynamic INT8 model -> {output}")
+        return output
+
+    import onnx
+
+    input_name = onnx.load(path).graph.input[0].name
+    names = sorted(n for n in os.listdir(calibration)
+                   if n.lower().endswith((".jpg", ".jpeg", ".png", ".bmp")))[:limit]
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._images = iter(names)
+
+        def get_next(self):
+            for name in self._images:
+                image = cv2.imread(os.path.join(calibration, name))
+                if image is not None:
+                    return {input_name: letterbox(image, imgsz)[0][None]}
+            return None
+
+    quantize_static(path, output, Reader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    per_channel=True)
+    print(f"✅ Static INT8 model ({len(names)} calibration images) -> {output}")
+    return output
+
+
+def letterbox(image, size=640, color=114):
+    """Resize keeping aspect ratio and pad to ``size`` x ``size``.
+
+    Returns the CHW float32 RGB input in [0, 1], the scale and the
+    (left, top) padding, which ``OnnxDetector`` undoes on the boxes.
+    """
+    h, w = image.shape[:2]
+    gain = min(size / h, size / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    left, top = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), color, dtype=np.uint8)
+    canvas[top:top + new_h, left:left + new_w] = cv2.resize(image, (new_w, new_h),
+                                                            interpolation=cv2.INTER_LINEAR)
+    tensor = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+    return np.ascontiguousarray(tensor, dtype=np.float32) / 255.0, gain, (left, top)
+
+
+def nms(boxes, scores, iou_threshold):
+    """Indices of the boxes kept by greedy NMS, best first. Each step
+    suppresses every remaining overlap with one vectorized IoU."""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=int)
+
+
+class Boxes:
+    """Detections of one image, shaped like ultralytics ``Results.boxes``."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __iter__(self):
+        for i in range(len(self.cls)):
+            yield Boxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+
+class Results:
+    def __init__(self, boxes, names, orig_shape):
+        self.boxes = boxes
+        self.names = names
+        self.orig_shape = orig_shape
+
+
+class OnnxDetector:
+    """A YOLO ONNX export run through ONNX Runtime.
+
+    ``threads`` sets ONNX Runtime's intra-op pool (inter-op stays at 1: the
+    graph is one sequential chain). Class names come from the metadata the
+    ultralytics exporter writes into the model unless ``names`` is given.
+    ``conf`` and ``iou`` default to the ultralytics predict defaults, and
+    NMS is per class like theirs, so boxes match the .pt model's.
+    """
+
+    def __init__(self, path, names=None, imgsz=640, conf=0.25, iou=0.7, max_det=300,
+                 threads=None, providers=None):
+        import onnxruntime as ort
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model file not found at: {path}")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        available = ort.get_available_providers()
+        providers = [p for p in (providers or ["CPUExecutionProvider"]) if p in available]
+        self.session = ort.InferenceSession(path, options,
+                                            providers=providers or ["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        shape = self.session.get_inputs()[0].shape
+        # Dynamic exports report the batch/size axes as names, not numbers
+        self.batched = not isinstance(shape[0], int)
+        self.fixed_size = isinstance(shape[2], int)
+        self.imgsz = shape[2] if self.fixed_size else imgsz
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = names or (ast.literal_eval(metadata["names"]) if "names" in metadata else {})
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+
+    def __call__(self, source, verbose=False, imgsz=None, conf=None, **kwargs):
+        """Detect on one image or a list; ``imgsz`` overrides the input
+        size when the model was exported with dynamic axes, ``conf`` the
+        confidence threshold."""
+        images = source if isinstance(source, (list, tuple)) else [source]
+        if not images:
+            return []
+        size = self.imgsz if self.fixed_size or not imgsz else imgsz
+        prepared = [letterbox(image, size) for image in images]
+        inputs = np.stack([tensor for tensor, _, _ in prepared])
+        if self.batched:
+            outputs = self.session.run(None, {self.input_name: inputs})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: inputs[i:i + 1]})[0]
+                                      for i in range(len(images))])
+        return [self._postprocess(output, gain, pad, image.shape[:2], size, conf)
+                for output, (_, gain, pad), image in zip(outputs, prepared, images)]
+
+    def _postprocess(self, output, gain, pad, shape, size, conf=None):
+        # (4 + classes, anchors) -> per anchor: cx, cy, w, h, class scores
+        threshold = self.conf if conf is None else conf
+        predictions = output.T
+        scores = predictions[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(cls)), cls]
+        keep = conf > threshold
+        predictions, cls, conf = predictions[keep], cls[keep], conf[keep]
+
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        # Per-class NMS in one pass: shift every class to its own region
+        offset = cls[:, None].astype(np.float32) * (size * 4)
+        kept = nms(xyxy + offset, conf, self.iou)[:self.max_det]
+        xyxy, conf, cls = xyxy[kept], conf[kept], cls[kept]
+
+        xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad[0]) / gain).clip(0, shape[1])
+        xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad[1]) / gain).clip(0, shape[0])
+        return Results(Boxes(xyxy.astype(np.float32), conf.astype(np.float32),
+                             cls.astype(np.float32)), self.names, shape)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the plate detector to ONNX")
+    parser.add_argument("weights", nargs="?", default="best.pt")
+    parser.add_argument("--imgsz", type=int, default=640, help="train.py trains at 640")
+    parser.add_argument("--int8", action="store_true", help="also write an INT8-quantized model")
+    parser.add_argument("--calibration", help="image folder for static INT8 calibration")
+    parser.add_argument("--opset", type=int, default=12)
+    args = parser.parse_args()
+    export(args.weights, args.imgsz, args.int8, args.calibration, args.opset)
@@ -0,0 +1,248 @@
+import threading
+import time
+from collections import deque
+
+# Sentinel passed down the pipeline to tell every stage to finish
+STOP = object()
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+
+
+class BoundedQueue:
+    """Thread-safe bounded queue with a configurable overflow policy.
+
+    With ``drop_oldest`` a full queue discards its oldest item so the
+    producer never waits (good for camera frames, where only the newest
+    frame matters). With ``block`` the producer waits for free space
+    (good for DB events, which must not be lost).
+    """
+
+    def __init__(self, maxsize=4, drop_policy=DROP_OLDEST):
+        if drop_policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.maxsize = max(1, int(maxsize))
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def put(self, item, timeout=None):
+        with self._lock:
+            # STOP is always accepted so shutdown can't be lost to a full queue
+            if item is not STOP:
+                if self.drop_policy == DROP_OLDEST:
+                    while len(self._items) >= self.maxsize:
+                        self._items.popleft()
+                        self.dropped += 1
+                else:
+                    deadline = None if timeout is None else time.monotonic() + timeout
+                    while len(self._items) >= self.maxsize:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            self.dropped += 1
+                            return False
+                        self._not_full.wait(remaining)
+            self._items.append(item)
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Return the next item, or None if nothing arrived within timeout."""
+        with self._lock:
+            if not self._items:
+                self._not_empty.wait(timeout)
+                if not self._items:
+                    return None
+            item = self._items.popleft()
+            self._not_full.notify()
+            return item
+
+    def qsize(self):
+        with self._lock:
+            return len(self._items)
+
+    def clear(self):
+        """Drop everything queued (counted in ``dropped``); returns how many."""
+        with self._lock:
+            count = sum(1 for item in self._items if item is not STOP)
+            self._items.clear()
+            self.dropped += count
+            self._not_full.notify_all()
+            return count
+
+
+class StageStats:
+    """Throughput and latency counters for one pipeline stage."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.started_at = time.monotonic()
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def record(self, duration):
+        now = time.monotonic()
+        with self._lock:
+            self.processed += 1
+            self.busy_time += duration
+            self._recent.append(now)
+            while self._recent and now - self._recent[0] > self.window:
+                self._recent.popleft()
+
+    def fps(self):
+        """Items per second over the last ``window`` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > self.window:
+                self._recent.popleft()
+            return len(self._recent) / self.window
+
+    def avg_latency_ms(self):
+        with self._lock:
+            return 1000.0 * self.busy_time / self.processed if self.processed else 0.0
+
+
+class Stage(threading.Thread):
+    """One pipeline stage running ``func`` on its own thread.
+
+    A source stage has no inbox and calls ``func()`` repeatedly; returning
+    None ends the stream. Other stages call ``func(item)`` for every item in
+    their inbox; returning None drops the item, anything else is forwarded
+    to the outbox. ``on_stop()`` runs once at the end of the stream and its
+    result, if any, is forwarded before the stop signal.
+    """
+
+    def __init__(self, name, func, inbox=None, outbox=None, poll_interval=0.1,
+                 on_stop=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.on_stop = on_stop
+        self.inbox = inbox
+        self.outbox = outbox
+        self.poll_interval = poll_interval
+        self.stats = StageStats()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _emit(self, result):
+        if result is not None and self.outbox is not None:
+            self.outbox.put(result)
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                if self.inbox is None:
+                    start = time.perf_counter()
+                    result = self.func()
+                    if result is None:
+                        break
+                else:
+                    item = self.inbox.get(timeout=self.poll_interval)
+                    if item is None:
+                        continue
+                    if item is STOP:
+                        break
+                    start = time.perf_counter()
+                    try:
+                        result = self.func(item)
+                    except Exception as e:
+                        self.stats.errors += 1
+                        print(f"❌ [{self.name}] stage error: {e}")
+                        continue
+                self.stats.record(time.perf_counter() - start)
+                self._emit(result)
+        finally:
+            if self.on_stop is not None:
+                self._emit(self.on_stop())
+            if self.outbox is not None:
+                self.outbox.put(STOP)
+
+
+class Pipeline:
+    """A linear chain of stages connected by bounded queues."""
+
+    def __init__(self):
+        self.stages = []
+        self.queues = []
+
+    def add_source(self, name, func):
+        self.stages.append(Stage(name, func))
+        return self
+
+    def add_stage(self, name, func, maxsize=4, drop_policy=DROP_OLDEST, on_stop=None):
+        if not self.stages:
+            raise ValueError("Pipeline needs a source stage first")
+        queue = BoundedQueue(maxsize, drop_policy)
+        self.stages[-1].outbox = queue
+        self.queues.append(queue)
+        self.stages.append(Stage(name, func, inbox=queue, on_stop=on_stop))
+        return self
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def stop(self, drain_timeout=None):
+        """Stop the source and wait until every stage has finished.
+
+        Downstream stages drain what is queued first. With ``drain_timeout``
+        (seconds), whatever a stage still has queued at the deadline is
+        dropped instead; it still finishes its current item, runs
+        ``on_stop`` and passes the stop signal on. Either way nothing is
+        running when this returns, so writers fed by the last stage can be
+        closed right after.
+        """
+        if not self.stages:
+            return
+        self.stages[0].stop()
+        deadline = None if drain_timeout is None else time.monotonic() + drain_timeout
+        for i, stage in enumerate(self.stages):
+            if deadline is not None and i > 0:
+                stage.join(max(0.0, deadline - time.monotonic()))
+                if stage.is_alive():
+                    inbox = self.queues[i - 1]
+                    dropped = inbox.clear()
+                    # Upstream has finished, so its STOP was among the cleared items
+                    inbox.put(STOP)
+                    if dropped:
+                        print(f"⚠️ [{stage.name}] dropped {dropped} queued item(s) at shutdown")
+            stage.join()
+
+    def join(self, timeout=None):
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def is_alive(self):
+        return any(stage.is_alive() for stage in self.stages)
+
+    def stats(self):
+        """Per-stage throughput and inbox depth, in pipeline order."""
+        report = []
+        for i, stage in enumerate(self.stages):
+            inbox = self.queues[i - 1] if i > 0 else None
+            report.append({
+                "stage": stage.name,
+                "processed": stage.stats.processed,
+                "errors": stage.stats.errors,
+                "fps": round(stage.stats.fps(), 2),
+                "avg_ms": round(stage.stats.avg_latency_ms(), 2),
+                "queue_depth": inbox.qsize() if inbox else 0,
+                "dropped": inbox.dropped if inbox else 0,
+            })
+        return report
+
+    def format_stats(self):
+        return " | ".join(
+            f"{s['stage']}: {s['fps']:.1f} fps, {s['avg_ms']:.0f} ms, "
+            f"q={s['queue_depth']}, dropped={s['dropped']}"
+            for s in self.stats()
+        )
@@ -0,0 +1,256 @@
+import threading
+import time
+
+# Characters OCR tends to mix up on Egyptian plates. A substitution inside a
+# group is the preferred fuzzy match, but it is still the one allowed edit.
+CONFUSABLE_GROUPS = [
+    "بنيتثى",
+    "جحخ",
+    "دذ",
+    "رز",
+    "سش",
+    "صض",
+    "طظ",
+    "عغ",
+    "فق",
+    "هة",
+    "أاإآ",
+    "وؤ",
+    "٢٣",
+    "٧٨",
+    "٤٦",
+]
+
+# Western digits as their Arabic-Indic form: the same plate, not an edit
+_DIGITS = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
+
+_CANONICAL = {}
+for _group in CONFUSABLE_GROUPS:
+    for _char in _group:
+        _CANONICAL[ord(_char)] = _group[0]
+
+SEPARATOR = "|"
+
+
+def normalize(text):
+    return text.translate(_DIGITS)
+
+
+def canonical(text):
+    """``text`` with every confusable character folded to its group's first."""
+    return normalize(text).translate(_CANONICAL)
+
+
+def confusable_swap(a, b):
+    """True if a and b differ in exactly one character, and those two
+    characters are in the same confusable group."""
+    if len(a) != len(b):
+        return False
+    diffs = [(x, y) for x, y in zip(a, b) if x != y]
+    return len(diffs) == 1 and canonical(diffs[0][0]) == canonical(diffs[0][1])
+
+
+def plate_key(letters, numbers):
+    return f"{letters}{SEPARATOR}{numbers}"
+
+
+def within_one_edit(a, b):
+    """True if Levenshtein(a, b) <= 1, in O(len) time."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+def _deletions(key):
+    """Every string made by deleting one character (never the separator)."""
+    return {key[:i] + key[i + 1:] for i in range(len(key)) if key[i] != SEPARATOR}
+
+
+def _index(exact, plates, normalized, deletes, plate_id, key):
+    """Put one plate into the four lookup dicts."""
+    norm = normalize(key)
+    exact[key] = plate_id
+    plates[plate_id] = key
+    normalized.setdefault(norm, set()).add(plate_id)
+    for deleted in _deletions(norm):
+        deletes.setdefault(deleted, set()).add(plate_id)
+
+
+class PlateIndex:
+    """In-process index of the ``plates`` table.
+
+    Exact lookups are a dict hit, and are what access decisions use by
+    default. Opt-in fuzzy lookups tolerate one insertion, deletion or
+    substitution in total (a confusable-character swap counts as that
+    edit), using a precomputed single-deletion index (symmetric delete).
+    Every fuzzy hit is logged.
+
+    The index loads on first use and picks up new rows incrementally
+    (``WHERE id > last seen id``); every ``full_reload_every`` refreshes it
+    reloads everything so deleted or edited plates drop out too. A reload
+    builds new dicts and swaps them in, so lookups running meanwhile keep
+    seeing the old index instead of a half-filled one.
+    """
+
+    def __init__(self, db, table="plates", id_column="id",
+                 letters_column="letters", numbers_column="numbers",
+                 full_reload_every=20):
+        self.db = db
+        self.table = table
+        self.id_column = id_column
+        self.letters_column = letters_column
+        self.numbers_column = numbers_column
+        self.full_reload_every = full_reload_every
+        self.loaded = False
+        self.last_id = 0
+        self._refreshes = 0
+        self._exact = {}        # raw key -> plate_id
+        self._plates = {}       # plate_id -> raw key
+        self._normalized = {}   # normalized key -> {plate_id}
+        self._deletes = {}      # one-deletion normalized key -> {plate_id}
+        self._lock = threading.RLock()
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def __len__(self):
+        return len(self._plates)
+
+    def _select(self, incremental):
+        sql = (f"SELECT {self.id_column}, {self.letters_column}, {self.numbers_column} "
+               f"FROM {self.table}")
+        if incremental:
+            return self.db.fetchall(f"{sql} WHERE {self.id_column} > %s", (self.last_id,))
+        return self.db.fetchall(sql)
+
+    def load(self):
+        """(Re)load every plate from the database."""
+        start = time.perf_counter()
+        rows = self._select(incremental=False)
+        maps = ({}, {}, {}, {})
+        last_id = 0
+        for plate_id, letters, numbers in rows:
+            _index(*maps, plate_id, plate_key(letters or "", numbers or ""))
+            if isinstance(plate_id, int):
+                last_id = max(last_id, plate_id)
+        with self._lock:
+            # Plates add()ed since the SELECT (e.g. just registered) stay in
+            for plate_id, key in self._plates.items():
+                if isinstance(plate_id, int) and plate_id > last_id:
+                    _index(*maps, plate_id, key)
+            self._exact, self._plates, self._normalized, self._deletes = maps
+            self.last_id = max([last_id, *(i for i in maps[1] if isinstance(i, int))])
+            self.loaded = True
+        print(f"✅ Plate index loaded: {len(rows)} plate(s) in "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def refresh(self):
+        """Pull plates added since the last load; periodically reload all."""
+        self._refreshes += 1
+        if not self.loaded or self._refreshes % self.full_reload_every == 0:
+            self.load()
+            return
+        for plate_id, letters, numbers in self._select(incremental=True):
+            self.add(plate_id, letters or "", numbers or "")
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load()
+
+    def add(self, plate_id, letters, numbers):
+        """Index one plate (also used right after inserting a new plate)."""
+        key = plate_key(letters, numbers)
+        with self._lock:
+            if plate_id in self._plates:
+                self.remove(plate_id)
+            _index(self._exact, self._plates, self._normalized, self._deletes, plate_id, key)
+            if isinstance(plate_id, int):
+                self.last_id = max(self.last_id, plate_id)
+
+    def remove(self, plate_id):
+        with self._lock:
+            key = self._plates.pop(plate_id, None)
+            if key is None:
+                return
+            if self._exact.get(key) == plate_id:
+                del self._exact[key]
+            norm = normalize(key)
+            for bucket_key, bucket in [(norm, self._normalized)] + [
+                    (d, self._deletes) for d in _deletions(norm)]:
+                ids = bucket.get(bucket_key)
+                if ids:
+                    ids.discard(plate_id)
+                    if not ids:
+                        del bucket[bucket_key]
+
+    def lookup(self, letters, numbers):
+        """Exact match. Returns the plate id or None. Lock-free: ``load``
+        only ever replaces ``_exact`` whole."""
+        self.ensure_loaded()
+        return self._exact.get(plate_key(letters, numbers))
+
+    def match(self, letters, numbers, fuzzy=False):
+        """Exact match; with ``fuzzy`` also the closest registered plate
+        within one edit in total (Western/Arabic-Indic digits aside).
+
+        Returns the plate id, or None if nothing is close enough or two
+        plates are equally close.
+        """
+        plate_id = self.lookup(letters, numbers)
+        if plate_id is not None or not fuzzy:
+            return plate_id
+
+        with self._lock:
+            key = normalize(plate_key(letters, numbers))
+            candidates = set(self._normalized.get(key, ()))
+            candidates |= self._deletes.get(key, set())
+            for deleted in _deletions(key):
+                candidates |= self._normalized.get(deleted, set())
+                candidates |= self._deletes.get(deleted, set())
+
+            best, best_rank, tied = None, None, False
+            for candidate in candidates:
+                registered = self._plates.get(candidate)
+                if registered is None or not within_one_edit(normalize(registered), key):
+                    continue
+                # Same plate in other digits, then a confusable swap, then any edit
+                registered = normalize(registered)
+                rank = 0 if registered == key else 1 if confusable_swap(registered, key) else 2
+                if best_rank is None or rank < best_rank:
+                    best, best_rank, tied = candidate, rank, False
+                elif rank == best_rank:
+                    tied = True
+            if best is None or tied:
+                return None
+            print(f"🔍 Fuzzy plate match: read '{plate_key(letters, numbers)}' -> "
+                  f"registered '{self._plates[best]}' (id {best})")
+            return best
+
+    def start_auto_refresh(self, interval=30.0):
+        """Refresh on a daemon thread every ``interval`` seconds."""
+        if self._refresher is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"❌ Plate index refresh failed: {e}")
+
+        self._refresher = threading.Thread(target=run, name="plate-index-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,246 @@
+"""Shared plate-text normalization for PaddleOCR output.
+
+Turns OCR lines ([box, (text, score)]) into the letters and digits of an
+Egyptian plate: the "مصر" / "EGYPT" header is dropped, Latin letters are
+ignored, and characters are split into letters and digits through
+``translations``. Every pattern and translate table is built once, and
+classifying characters is a couple of ``str.translate`` calls per plate
+instead of a Python loop per character.
+
+    python plate_text.py          # micro-benchmark, per-plate cost
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+MAX_LETTERS = 3
+MAX_DIGITS = 4
+EGYPT_LETTERS = "مصر"
+
+ARABIC_RE = re.compile(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]+')
+ENGLISH_RE = re.compile(r'[a-zA-Z]+')
+_EGYPT_AR_RE = re.compile(r"م\s*ص\s*ر")
+_EGYPT_EN_RE = re.compile(r"egypt", re.IGNORECASE)
+
+_SEPARATOR = "\x1f"
+
+ARABIC_DIGITS = str.maketrans('0123456789', '٠١٢٣٤٥٦٧٨٩')
+
+PlateText = namedtuple("PlateText", "letters digits valid")
+ScoredPlateText = namedtuple("ScoredPlateText", "letters digits letter_scores digit_scores")
+
+
+class _LazyTable(dict):
+    """str.translate table that works out each character's mapping the
+    first time it is seen and remembers it."""
+
+    def __init__(self, compute):
+        super().__init__()
+        self._compute = compute
+
+    def __missing__(self, code):
+        value = self[code] = self._compute(chr(code))
+        return value
+
+
+def _strip_marks(char):
+    decomposed = unicodedata.normalize('NFD', char)
+    stripped = ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn')
+    return None if not stripped else (ord(stripped) if len(stripped) == 1 else stripped)
+
+
+_DIACRITICS = _LazyTable(_strip_marks)
+
+
+def is_english(text):
+    """True if every character is an ASCII letter."""
+    return all(ord('A') <= ord(c) <= ord('Z') or ord('a') <= ord(c) <= ord('z') for c in text)
+
+
+def is_arabic_text(text):
+    return bool(ARABIC_RE.search(text))
+
+
+def is_english_text(text):
+    return bool(ENGLISH_RE.search(text))
+
+
+def remove_diacritics(text):
+    """Drop combining marks (NFD, category Mn), e.g. أ -> ا."""
+    return text if text.isascii() else text.translate(_DIACRITICS)
+
+
+def clean_text(text, strip_diacritics=True):
+    """Remove spaces, diacritics and every form of مصر / EGYPT."""
+    text = text.replace(" ", "")
+    # امسح كل أشكال كلمة مصر حتى لو فيها مسافات أو تشكيل
+    if strip_diacritics:
+        text = remove_diacritics(text)
+    text = _EGYPT_AR_RE.sub("", text)
+    text = _EGYPT_EN_RE.sub("", text)
+    return text.strip()
+
+
+def split_and_filter_letters(letters):
+    """Drop every 3-letter group that contains a letter of مصر."""
+    return ''.join(letters[i:i + 3] for i in range(0, len(letters), 3)
+                   if not any(c in EGYPT_LETTERS for c in letters[i:i + 3]))
+
+
+def to_arabic_digits(text):
+    return text.translate(ARABIC_DIGITS)
+
+
+def is_valid_plate(letters, digits):
+    """Egyptian plate grammar: 1-3 letters and 1-4 digits."""
+    return 1 <= len(letters) <= MAX_LETTERS and 1 <= len(digits) <= MAX_DIGITS
+
+
+class PlateParser:
+    """Letter/digit split of OCR lines for one ``translations`` table.
+
+    Per character it does what the scripts' loops did: skip Latin letters,
+    translate, keep numeric translations as digits and any other non-blank
+    one as letters. The decision is cached per character in two translate
+    tables, so a line is classified with two C-level passes.
+    """
+
+    def __init__(self, translations=None, strip_diacritics=True):
+        self.translations = translations or {}
+        self.strip_diacritics = strip_diacritics
+        self._digits = _LazyTable(self._digit_part)
+        self._letters = _LazyTable(self._letter_part)
+        # parse_batch's plate separator passes through both tables
+        self._digits[ord(_SEPARATOR)] = ord(_SEPARATOR)
+        self._letters[ord(_SEPARATOR)] = ord(_SEPARATOR)
+
+    def _translate(self, char):
+        if is_english(char):
+            return ""
+        return self.translations.get(char, char)
+
+    def _digit_part(self, char):
+        translated = self._translate(char)
+        if not translated.isnumeric():
+            return None
+        return ''.join(c for c in translated if c.isdigit()) or None
+
+    def _letter_part(self, char):
+        translated = self._translate(char)
+        if translated.isnumeric() or not translated.strip():
+            return None
+        return ''.join(c for c in translated if not c.isdigit()) or None
+
+    def _texts(self, lines):
+        for line in lines:
+            if len(line) >= 2 and line[1]:
+                # The tables pass the batch separator through; OCR text must not carry it
+                text = clean_text(line[1][0], self.strip_diacritics).replace(_SEPARATOR, "")
+                if text:
+                    yield text, line[1][1]
+
+    def parse(self, lines):
+        """(letters, digits) with letters reversed and digits in OCR order."""
+        text = ''.join(t for t, _ in self._texts(lines))
+        letters = split_and_filter_letters(text.translate(self._letters))
+        return letters[::-1], text.translate(self._digits)
+
+    def parse_batch(self, batch):
+        """``parse`` for many plates at once, as PlateText tuples.
+
+        All plates are classified in one translate pass per table; a
+        separator the tables leave alone keeps them apart.
+        """
+        texts = _SEPARATOR.join(''.join(t for t, _ in self._texts(lines)) for lines in batch)
+        all_letters = texts.translate(self._letters).split(_SEPARATOR)
+        all_digits = texts.translate(self._digits).split(_SEPARATOR)
+        results = []
+        for letters, digits in zip(all_letters, all_digits):
+            letters = split_and_filter_letters(letters)[::-1]
+            results.append(PlateText(letters, digits, is_valid_plate(letters, digits)))
+        return results
+
+    def parse_scored(self, lines):
+        """Like ``parse``, plus the OCR score of the line every kept
+        character came from. Returns ScoredPlateText or None when empty."""
+        letters, digits = [], []
+        letter_scores, digit_scores = [], []
+        for text, score in self._texts(lines):
+            score = float(score)
+            found = text.translate(self._letters)
+            letters.append(found)
+            letter_scores.extend([score] * len(found))
+            found = text.translate(self._digits)
+            digits.append(found)
+            digit_scores.extend([score] * len(found))
+
+        letters = ''.join(letters)
+        kept, kept_scores = [], []
+        for i in range(0, len(letters), 3):
+            if not any(c in EGYPT_LETTERS for c in letters[i:i + 3]):
+                kept.append(letters[i:i + 3])
+                kept_scores.extend(letter_scores[i:i + 3])
+        letters = ''.join(kept)[::-1]
+        digits = ''.join(digits)
+        if not (letters or digits):
+            return None
+        return ScoredPlateText(letters, digits, kept_scores[::-1], digit_scores)
+
+
+def _reference_parse(lines, translations):
+    """The per-character loop the scripts used before, for the benchmark."""
+    letters = ""
+    digits = ""
+    for line in lines:
+        if len(line) >= 2 and line[1]:
+            text = line[1][0].replace(" ", "")
+            text = ''.join(c for c in unicodedata.normalize('NFD', text)
+                           if unicodedata.category(c) != 'Mn')
+            text = re.sub(r"م\s*ص\s*ر", "", text)
+            text = re.sub(r"egypt", "", text, flags=re.IGNORECASE).strip()
+            for char in text:
+                if is_english(char):
+                    continue
+                translated = translations.get(char, char)
+                if translated.isnumeric():
+                    digits += translated
+                elif translated.strip():
+                    letters += translated
+    letters = ''.join(c for c in letters if not c.isdigit())
+    digits = ''.join(c for c in digits if c.isdigit())
+    groups = [letters[i:i + 3] for i in range(0, len(letters), 3)]
+    letters = ''.join(g for g in groups if not any(c in EGYPT_LETTERS for c in g))
+    return letters[::-1], digits
+
+
+def benchmark(plates=2000, repeat=5):
+    import random
+    import timeit
+
+    rng = random.Random(7)
+    letters = "أبجدرسصطعفقلمنهوى"
+    samples = []
+    for _ in range(plates):
+        plate = [[None, ("مصر EGYPT", 0.97)],
+                 [None, (" ".join(rng.choice(letters) for _ in range(rng.randint(2, 3))) + " "
+                         + "".join(rng.choice("٠١٢٣٤٥٦٧٨٩") for _ in range(rng.randint(3, 4))),
+                         rng.uniform(0.6, 1.0))]]
+        samples.append(plate)
+
+    parser = PlateParser()
+    assert [parser.parse(p) for p in samples] == [_reference_parse(p, {}) for p in samples]
+    assert [tuple(r[:2]) for r in parser.parse_batch(samples)] == [parser.parse(p) for p in samples]
+
+    timings = {
+        "reference loop": lambda: [_reference_parse(p, {}) for p in samples],
+        "PlateParser.parse": lambda: [parser.parse(p) for p in samples],
+        "PlateParser.parse_batch": lambda: parser.parse_batch(samples),
+        "PlateParser.parse_scored": lambda: [parser.parse_scored(p) for p in samples],
+    }
+    for name, func in timings.items():
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f"📊 {name:>26}: {best / plates * 1e6:7.2f} µs/plate")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -3,219 +3,554 @@ import numpy as np
 import os
 import uuid
 from datetime import datetime
-from ultralytics import YOLO
-from paddleocr import PaddleOCR
-from basicsr.archs.rrdbnet_arch import RRDBNet
-from realesrgan import RealESRGANer
 from PIL import Image
-import torch
-import mysql.connector
-import re
-
-# تحميل النماذج
-print("جاري تحميل النماذج...")
-
-try:
-    yolo_model = YOLO("best.pt")
-    print("✅ YOLO Model Loaded")
-except Exception as e:
-    print(f"❌ YOLO Load Error: {e}")
-    exit()
-
-try:
-    ocr = PaddleOCR(use_angle_cls=True, lang='ar', use_gpu=True)
-    print("✅ PaddleOCR Loaded")
-except Exception as e:
-    print(f"❌ OCR Load Error: {e}")
-    exit()
-
-try:
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32)
-    model_path = 'Real-ESRGAN/weights/RealESRGAN_x4plus.pth'
-    upsampler = RealESRGANer(scale=4, model_path=model_path, model=model,
-                             tile=200, tile_pad=10, pre_pad=0, device=device)
-    print("✅ Real-ESRGAN Loaded")
-except Exception as e:
-    print(f"❌ ESRGAN Load Error: {e}")
-    exit()
+import argparse
+import threading
+import time
+from pipeline import Pipeline, StageStats, DROP_OLDEST, BLOCK
+from tracker import PlateTracker
+from consensus import PlateConsensus
+from models import ModelRegistry
+from onnx_detector import TORCH, ONNX
+from enhancement import EnhancementEngine
+from persistence import Database, BatchWriter
+from plate_index import PlateIndex
+from evidence_store import EvidenceStore
+from motion import MotionGate, parse_roi, DIFF, MOG2
+from char_recognizer import CharRecognizer, PADDLE, CHARS
+from plate_text import PlateParser
+from dedup import DedupCache
+from resolution import ResolutionController
+from preprocess import plate_quality, enhance_plate
+from sr_batch import BatchUpsampler
+import metrics
+from metrics import span
+
+# النماذج بتتحمل أول ما تتستخدم، و Real-ESRGAN بس لما لوحة تحتاجه
+# ANPR_DETECTOR=onnx: the detector's ONNX export on ONNX Runtime (best.onnx)
+models = ModelRegistry(yolo_weights="best.pt", detector=os.environ.get("ANPR_DETECTOR", TORCH),
+                       onnx_weights=os.environ.get("ANPR_ONNX_WEIGHTS"))
+# Tile size of Real-ESRGAN follows the crop size and the free memory
+super_resolution = BatchUpsampler(models)
+
+# "paddle": PaddleOCR on every track. "chars": read the character boxes YOLO
+# already finds, PaddleOCR only for tracks with no confident read
+RECOGNIZER = os.environ.get("ANPR_RECOGNIZER", PADDLE)
+_char_reader = None
 
 # ترجمة الحروف
 translations = {
     # أضف الترجمة لو عندك مثلاً 'ا': 'A'
 }
+# realtime keeps diacritics (أ stays أ), as the plates it saved always had
+text_parser = PlateParser(translations, strip_diacritics=False)
 
-def connect_to_db():
-    try:
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='anpr_system'
-        )
-        return conn
-    except mysql.connector.Error as err:
-        print(f"❌ DB Error: {err}")
-        return None
+# قاعدة البيانات: connection pool بدل connection جديد لكل استعلام
+# ANPR_DB_URL=sqlite:///anpr.db works as a local stand-in for MySQL
+db = Database.from_url(os.environ.get("ANPR_DB_URL", "mysql://root:@localhost/anpr_system"))
+# vehicles rows are written in the background, grouped into multi-row inserts
+_db_writer = None
 
-def split_and_filter_letters(letters):
-    groups = [letters[i:i+3] for i in range(0, len(letters), 3)]
-    filtered = []
-    for group in groups:
-        # لو المجموعة فيها أي حرف من كلمة مصر تجاهلها
-        if any(c in group for c in 'مصر'):
-            continue
-        filtered.append(group)
-    return ''.join(filtered)
-
-def clean_text(text):
-    text = text.replace(" ", "")
-    # امسح كل أشكال كلمة مصر حتى لو فيها مسافات أو تشكيل
-    text = re.sub(r"م\s*ص\s*ر", "", text)
-    text = re.sub(r"egypt", "", text, flags=re.IGNORECASE)
-    text = text.strip()
-    return text
+plate_index = PlateIndex(db, table="plates", id_column="id")
+# Evidence images are JPEG-encoded and written on a background thread
+evidence = EvidenceStore(root="images")
+# The same plate read again on the same camera within the window is
+# dropped before any DB work or image write
+dedup = DedupCache(ttl=30.0)
+
+def db_writer():
+    global _db_writer
+    if _db_writer is None:
+        _db_writer = BatchWriter(db, max_batch=50, max_delay=1.0)
+    return _db_writer
 
 def plate_exists(letters, numbers):
-    conn = connect_to_db()
-    if not conn:
-        return False
-    db_handler = conn.cursor()
-    query = "SELECT id FROM plates WHERE letters = %s AND numbers = %s"
-    db_handler.execute(query, (letters, numbers))  # Removed the [::-1] here
-    result = db_handler.fetchone()
-    plate_id = result[0] if result else None
-    db_handler.close()
-    conn.close()
-    return plate_id
-
-def log_vehicle_entry(plate_id, image):
-    conn = connect_to_db()
-    if not conn:
-        return
-    db_handler = conn.cursor()
-    image_path = f"images/{uuid.uuid4()}.jpg"
-    cv2.imwrite(image_path, image)
+    # In-memory index instead of a SELECT per read. Exact only: an unknown
+    # plate is registered as new, never merged into a near-miss plate
+    return plate_index.lookup(letters, numbers)  # Removed the [::-1] here
+
+def log_vehicle_entry(plate_id, image, plate_img=None):
+    # الصورة بتتحفظ في الخلفية؛ هنا بنحجز المسار بس
+    image_path = evidence.save(image, plate_img)
     detected_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     sql = "INSERT INTO vehicles (plate_id, image_path, detected_at) VALUES (%s, %s, %s)"
-    db_handler.execute(sql, (plate_id, image_path, detected_at))
-    conn.commit()
-    db_handler.close()
-    conn.close()
+    db_writer().write(sql, (plate_id, image_path, detected_at))
     print(f"✅ Vehicle entry logged for plate ID: {plate_id}")
 
-def save_new_plate(letters, numbers, image):
-    conn = connect_to_db()
-    if not conn:
-        return
-    db_handler = conn.cursor()
+def save_new_plate(letters, numbers, image, plate_img=None):
     sql = "INSERT INTO plates (letters, numbers) VALUES (%s, %s)"
-    db_handler.execute(sql, (letters, numbers))  # Removed the [::-1] here
-    plate_id = db_handler.lastrowid
-    conn.commit()
-    db_handler.close()
-    conn.close()
+    plate_id = db.execute(sql, (letters, numbers))  # Removed the [::-1] here
+    plate_index.add(plate_id, letters, numbers)
     print(f"✅ New plate saved with ID: {plate_id}")
-    log_vehicle_entry(plate_id, image)
+    log_vehicle_entry(plate_id, image, plate_img)
 
 def calculate_image_quality(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    contrast = np.std(gray)
-    sharpness = np.var(cv2.Laplacian(gray, cv2.CV_64F))
-    return contrast, sharpness
+    return plate_quality(image)
 
-def enhance_plate_image(plate_img):
+def enhance_plate_image(plate_img, upscale=None):
+    """Real-ESRGAN (when upscale, by default when the crop is low quality)
+    followed by CLAHE and denoising."""
     contrast, sharpness = calculate_image_quality(plate_img)
-    plate_rgb = cv2.cvtColor(plate_img, cv2.COLOR_BGR2RGB)
-    if contrast < 50 or sharpness < 100:
-        enhanced, _ = upsampler.enhance(plate_rgb, outscale=4)
-    else:
-        enhanced = plate_rgb
-    lab = cv2.cvtColor(enhanced, cv2.COLOR_RGB2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-    cl = clahe.apply(l)
-    enhanced_lab = cv2.merge((cl,a,b))
-    enhanced = cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2RGB)
-    enhanced_img = cv2.cvtColor(enhanced, cv2.COLOR_RGB2BGR)
-    if contrast < 50 or sharpness < 100:
-        enhanced_img = cv2.fastNlMeansDenoisingColored(enhanced_img, None, 10, 10, 7, 21)
-    return enhanced_img
-
-def is_english(text):
-    return all(ord('A') <= ord(c) <= ord('Z') or ord('a') <= ord(c) <= ord('z') for c in text)
-
-# ✅ بدء الكاميرا الخارجية
-cap = cv2.VideoCapture(1)  # كاميرا خارجية (غير مدمجة)
-
-print("✅ بدأ التشغيل من الكاميرا الخارجية...")
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("❌ فشل في قراءة الفريم من الكاميرا")
-        break
+    if upscale is None:
+        upscale = contrast < 50 or sharpness < 100
+    if upscale:
+        # Real-ESRGAN takes and returns BGR like the rest of OpenCV
+        with span("esrgan"):
+            plate_img = super_resolution.enhance(plate_img)
+    return enhance_plate(plate_img, denoise=upscale)
+
+# Cheap OpenCV enhancement first; Real-ESRGAN only when OCR isn't confident
+enhancer = EnhancementEngine(
+    super_resolve=lambda plate_img: enhance_plate_image(plate_img, upscale=True),
+    ocr_fn=lambda plate_img: models.ocr.ocr(plate_img, cls=True))
+# Read from enhancer.stats at scrape time
+metrics.ENHANCEMENTS.set_function(lambda: dict(enhancer.stats))
+# PaddleOCR and the enhancer (frame budget, stats) aren't thread-safe:
+# threads that OCR tracks side by side hold this around begin_frame/read_track
+ocr_lock = threading.Lock()
+
+def read_plate(plate_img, reuse=None):
+    """Enhance a plate crop and OCR it (``reuse``: see EnhancementEngine).
+
+    Returns (letters, digits, letter_scores, digit_scores) or None. The
+    scores are the PaddleOCR confidence of the line each character came from.
+    """
+    with span("enhance_ocr"):
+        _, ocr_result, _ = enhancer.recognize(plate_img, reuse)
+    if not (ocr_result and ocr_result[0]):
+        metrics.OCR_READS.labels(result="miss").inc()
+        return None
+
+    plate = text_parser.parse_scored(ocr_result[0])
+    if plate is None:
+        metrics.OCR_READS.labels(result="miss").inc()
+        return None
+    metrics.OCR_READS.labels(result="hit").inc()
+    return tuple(plate)
 
-    results = yolo_model(frame)[0]
+def plate_boxes(results):
+    """License plate boxes from one YOLO result."""
+    boxes = []
     for box in results.boxes:
         class_id = int(box.cls[0])
-        class_name = yolo_model.names[class_id]
+        class_name = models.yolo.names[class_id]
         if class_name == "License Plate":
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            plate_img = frame[y1:y2, x1:x2]
-            enhanced = enhance_plate_image(plate_img)
-            ocr_result = ocr.ocr(enhanced, cls=True)
-
-            if ocr_result and ocr_result[0]:
-                letters = ""
-                digits = ""
-
-                # First pass: collect all characters
-                for line in ocr_result[0]:
-                    if len(line) >= 2 and line[1]:
-                        text = clean_text(line[1][0])
-                        if not text:
-                            continue
-                        
-                        for char in text:
-                            if is_english(char):
-                                continue
-                            translated = translations.get(char, char)
-                            if translated.isnumeric():
-                                digits += translated
-                            elif translated.strip():
-                                letters += translated
-
-                # Process letters and digits separately
-                letters_clean = ''.join([c for c in letters if not c.isdigit()])
-                digits_clean = ''.join([c for c in digits if c.isdigit()])
-                
-                # Only reverse letters, keep digits as is
-                letters_final = split_and_filter_letters(letters_clean)[::-1]
-                digits_final = digits_clean[::-1]  # Reverse digits for display
-
-                if letters_final or digits_final:
-                    final_text = letters_final + " " + digits_final
-                    print(f"🔍 Detected Plate: {final_text}")
-
-                    plate_id = plate_exists(letters_final, digits_clean)  # Use non-reversed digits for DB
-                    if plate_id:
-                        print("📌 اللوحة موجودة بالفعل، تسجيل دخول فقط")
-                        log_vehicle_entry(plate_id, frame)
-                    else:
-                        print("📌 لوحة جديدة، يتم الحفظ...")
-                        save_new_plate(letters_final, digits_clean, frame)  # Use non-reversed digits for DB
-
-                    # عرض النتيجة على الفريم
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(frame, final_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX,
-                                1.2, (0, 255, 0), 3, cv2.LINE_AA)
+            boxes.append(tuple(map(int, box.xyxy[0])))
+    metrics.PLATES_DETECTED.inc(len(boxes))
+    return boxes
+
+def char_reader():
+    global _char_reader
+    if _char_reader is None:
+        _char_reader = CharRecognizer(models.yolo.names)
+    return _char_reader
+
+def char_reads(results, boxes):
+    """Confident character-box read (or None) per plate box; None as a
+    whole when the PaddleOCR recognizer is selected."""
+    if RECOGNIZER != CHARS:
+        return None
+    reader = char_reader()
+    chars = reader.char_boxes(results)
+    reads = []
+    for box in boxes:
+        read = reader.read(chars, box)
+        reads.append(read[:4] if read and read[4] else None)
+    return reads
+
+def detect_plates(frame):
+    """Run YOLO on a frame and return every license plate box."""
+    with span("detect"):
+        results = models.yolo(frame)[0]
+    return plate_boxes(results)
+
+def detect_options(frame, resolution=None):
+    """Extra YOLO arguments: the input size a ResolutionController picked."""
+    return {} if resolution is None else {"imgsz": resolution.imgsz(frame.shape)}
+
+def detect_frame(frame, gate=None, resolution=None):
+    """(plate boxes, character reads) for a frame; nothing when the motion
+    gate says the lane is idle. With a ResolutionController YOLO runs at the
+    size it picks; boxes are in full-frame coordinates either way."""
+    if gate is not None and not gate.update(frame):
+        return [], None
+    with span("detect"):
+        results = models.yolo(frame, **detect_options(frame, resolution))[0]
+    boxes = plate_boxes(results)
+    if resolution is not None:
+        resolution.observe(boxes, frame.shape)
+    return boxes, char_reads(results, boxes)
+
+def read_frame(cap, gate=None):
+    """Next frame worth looking at, or None when the stream fails. Frames
+    the idle frame-skip passes over are only grabbed, not decoded."""
+    while gate is not None and not gate.wants_frame():
+        if not cap.grab():
+            return None
+        metrics.FRAMES.inc()
+    with span("capture"):
+        ret, frame = cap.read()
+    if not ret:
+        return None
+    metrics.FRAMES.inc()
+    return frame
+
+def detect_plates_batch(frames, resolutions=None):
+    """One YOLO call for several frames; (plate boxes, character reads)
+    per frame. ``resolutions`` optionally holds a ResolutionController (or
+    None) per frame; frames wanting the same input size share a call."""
+    resolutions = resolutions or [None] * len(frames)
+    options = [detect_options(f, r) for f, r in zip(frames, resolutions)]
+    found = [None] * len(frames)
+    for size in dict.fromkeys(o.get("imgsz") for o in options):
+        group = [i for i, o in enumerate(options) if o.get("imgsz") == size]
+        with span("detect"):
+            results = models.yolo([frames[i] for i in group], verbose=False, **options[group[0]])
+        for i, r in zip(group, results):
+            boxes = plate_boxes(r)
+            if resolutions[i] is not None:
+                resolutions[i].observe(boxes, frames[i].shape)
+            found[i] = (boxes, char_reads(r, boxes))
+    return found
+
+def vote_char_reads(track, min_reads=2, threshold=0.8):
+    """Consensus of the track's character-box reads, or None when they
+    don't agree well enough."""
+    if not track.reads:
+        return None
+    consensus = PlateConsensus(min_reads=min(min_reads, len(track.reads)),
+                               max_reads=len(track.reads), threshold=threshold)
+    for read in track.reads:
+        consensus.add(*read)
+    result = consensus.result()
+    if not consensus.is_confident() or not (result[0] or result[1]):
+        return None
+    return result
+
+def read_track(track, min_reads=2, threshold=0.8):
+    """OCR the sharpest crops of a finished track, best first, and vote on
+    the reads. Stops as soon as the consensus is confident enough.
+
+    With the character recognizer, the track's character-box reads are
+    voted on first and PaddleOCR only runs if they aren't confident."""
+    result = vote_char_reads(track, min_reads, threshold)
+    if result is not None:
+        return result
+    consensus = PlateConsensus(min_reads=min_reads, max_reads=len(track.crops),
+                               threshold=threshold)
+    reuse = []  # super-resolved crops of this track
+    for _, crop, _ in track.crops:
+        plate = read_plate(crop, reuse)
+        if plate:
+            consensus.add(*plate)
+            if consensus.done():
+                break
+    result = consensus.result()
+    if not result or not (result[0] or result[1]):
+        return None
+    return result
+
+def persist_plate(letters, digits, frame, plate_img=None, camera="default"):
+    """Log the plate (registering it if new). Returns False if the database
+    work failed (the read can then be retried), True otherwise."""
+    if dedup.seen(camera, letters, digits):
+        metrics.DEDUP_ABSORBED.inc()
+        print(f"⏭️ Repeat read of {plate_display_text(letters, digits)} on {camera}, skipped")
+        return True
+    try:
+        with span("db"):
+            plate_id = plate_exists(letters, digits)  # Use non-reversed digits for DB
+            if plate_id:
+                metrics.ACCESS_DECISIONS.labels(decision="grant").inc()
+                print("📌 اللوحة موجودة بالفعل، تسجيل دخول فقط")
+                log_vehicle_entry(plate_id, frame, plate_img)
+            else:
+                # Unknown plate: counted as a deny, then registered
+                metrics.ACCESS_DECISIONS.labels(decision="deny").inc()
+                print("📌 لوحة جديدة، يتم الحفظ...")
+                save_new_plate(letters, digits, frame, plate_img)  # Use non-reversed digits for DB
+    except Exception as err:
+        print(f"❌ DB Error: {err}")
+        # Not persisted: let the next read of this plate try again
+        dedup.forget(camera, letters, digits)
+        return False
+    return True
+
+def plate_display_text(letters, digits):
+    return letters + " " + digits[::-1]  # Reverse digits for display
+
+def draw_plate(frame, box, text):
+    # عرض النتيجة على الفريم
+    x1, y1, x2, y2 = box
+    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    cv2.putText(frame, text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                1.2, (0, 255, 0), 3, cv2.LINE_AA)
+
+def new_tracker(max_missed=10, ocr_crops=5):
+    return PlateTracker(quality_fn=calculate_image_quality,
+                        max_missed=max_missed, max_crops=ocr_crops)
+
+def recognize_track(track):
+    """OCR a finished track once. Returns (letters, digits, frame, crop) or None."""
+    plate = read_track(track)
+    if not plate:
+        print(f"❌ Track #{track.track_id}: no text found")
+        return None
+    letters, digits, confidence = plate
+    track.result = plate_display_text(letters, digits)
+    print(f"🔍 Detected Plate: {track.result} (track #{track.track_id}, "
+          f"{track.hits} frames, confidence {confidence:.2f})")
+    # The best crop and the frame it came from are kept as evidence
+    _, crop, frame = track.crops[0]
+    return letters, digits, frame, crop
+
+def watch_writer_queues(extra=None):
+    """Export the evidence/DB writer backlogs (plus ``extra()``) as queue gauges."""
+    def depths():
+        found = {"evidence": evidence.pending(),
+                 "db_writer": _db_writer.pending() if _db_writer is not None else 0}
+        if extra is not None:
+            found.update(extra())
+        return found
+    metrics.QUEUE_DEPTH.set_function(depths)
+
+def draw_tracks(frame, tracks):
+    for track_id, box in tracks:
+        draw_plate(frame, box, f"#{track_id}")
+
+def run_camera(source=1, max_missed=10, ocr_crops=5, gate=None, resolution=None):
+    """Serial loop: capture and detect every frame (or, with a motion gate,
+    only frames with motion in the lane), OCR and log each plate track once
+    when the vehicle leaves the frame."""
+    cap = cv2.VideoCapture(source)  # كاميرا خارجية (غير مدمجة)
+    tracker = new_tracker(max_missed, ocr_crops)
+    loop_stats = StageStats()
+    metrics.STAGE_FPS.set_function(lambda: {"loop": loop_stats.fps()})
+    watch_writer_queues()
+
+    print("✅ بدأ التشغيل من الكاميرا الخارجية...")
+
+    while True:
+        start = time.perf_counter()
+        frame = read_frame(cap, gate)
+        if frame is None:
+            print("❌ فشل في قراءة الفريم من الكاميرا")
+            break
+        enhancer.begin_frame()
+
+        boxes, reads = detect_frame(frame, gate, resolution)
+        for track in tracker.update(boxes, frame, reads):
+            plate = recognize_track(track)
+            if plate:
+                persist_plate(*plate)
+        loop_stats.record(time.perf_counter() - start)
+
+        preview = frame.copy()
+        draw_tracks(preview, [(t.track_id, t.box) for t in tracker.active_tracks()])
+        cv2.imshow("Real-Time License Plate Detection", preview)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            print("✅ تم إيقاف التشغيل")
             break
 
-    cv2.imshow("Real-Time License Plate Detection", frame)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
+    for track in tracker.flush():
+        plate = recognize_track(track)
+        if plate:
+            persist_plate(*plate)
+
+    print(f"📊 Enhancement: {enhancer.format_stats()}")
+    if gate is not None:
+        print(f"📊 Motion gate: {gate.format_stats()}")
+    cap.release()
+    cv2.destroyAllWindows()
+
+def run_pipeline(source=1, queue_size=4, drop_policy=DROP_OLDEST,
+                 stats_interval=5.0, display=True, max_missed=10, ocr_crops=5, gate=None,
+                 resolution=None, drain_timeout=None):
+    """Pipeline mode: capture, detection+tracking, enhancement+OCR and DB
+    writes each run on their own thread, so sustained FPS is set by the
+    slowest stage instead of the sum of all of them."""
+    cap = cv2.VideoCapture(source)
+    tracker = new_tracker(max_missed, ocr_crops)
+    latest = {"frame": None, "tracks": []}
+    lock = threading.Lock()
+
+    def capture():
+        frame = read_frame(cap, gate)
+        if frame is None:
+            print("❌ فشل في قراءة الفريم من الكاميرا")
+        return frame
+
+    def detect(frame):
+        boxes, reads = detect_frame(frame, gate, resolution)
+        ended = tracker.update(boxes, frame, reads)
+        with lock:
+            latest["frame"] = frame
+            latest["tracks"] = [(t.track_id, t.box) for t in tracker.active_tracks()]
+        return ended or None
+
+    def recognize(tracks):
+        enhancer.begin_frame()
+        plates = [p for p in map(recognize_track, tracks) if p]
+        return plates or None
+
+    def persist(plates):
+        for plate in plates:
+            persist_plate(*plate)
+        return None
+
+    # Finished tracks and DB events must not be lost, so those queues block
+    pipeline = (Pipeline()
+                .add_source("capture", capture)
+                .add_stage("detect", detect, queue_size, drop_policy,
+                           on_stop=lambda: tracker.flush() or None)
+                .add_stage("ocr", recognize, queue_size * 8, BLOCK)
+                .add_stage("db", persist, queue_size * 8, BLOCK)
+                .start())
+    metrics.STAGE_FPS.set_function(lambda: {s["stage"]: s["fps"] for s in pipeline.stats()})
+    watch_writer_queues(lambda: {s["stage"]: s["queue_depth"] for s in pipeline.stats()[1:]})
+
+    print("✅ بدأ التشغيل من الكاميرا الخارجية (pipeline mode)...")
+    last_report = time.monotonic()
+    try:
+        while pipeline.is_alive():
+            if display:
+                with lock:
+                    frame, tracks = latest["frame"], latest["tracks"]
+                if frame is not None:
+                    preview = frame.copy()
+                    draw_tracks(preview, tracks)
+                    cv2.imshow("Real-Time License Plate Detection", preview)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    print("✅ تم إيقاف التشغيل")
+                    break
+            else:
+                time.sleep(0.05)
+            if time.monotonic() - last_report >= stats_interval:
+                print(f"📊 {pipeline.format_stats()}")
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
         print("✅ تم إيقاف التشغيل")
-        break
+    finally:
+        # Returns only once the db stage is done, so the DB writer can close after
+        pipeline.stop(drain_timeout)
+        print(f"📊 {pipeline.format_stats()}")
+        print(f"📊 Enhancement: {enhancer.format_stats()}")
+        if gate is not None:
+            print(f"📊 Motion gate: {gate.format_stats()}")
+        cap.release()
+        cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Real-time license plate recognition")
+    parser.add_argument("--source", default="1",
+                        help="camera index or video path/URL (default: external camera 1)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="run capture, detection, OCR and DB writes as separate threads")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="max items buffered between pipeline stages")
+    parser.add_argument("--drop-policy", choices=[DROP_OLDEST, BLOCK], default=DROP_OLDEST,
+                        help="what a full frame queue does: drop the oldest item or block")
+    parser.add_argument("--stats-interval", type=float, default=5.0,
+                        help="seconds between per-stage throughput reports")
+    parser.add_argument("--drain-timeout", type=float, default=None,
+                        help="seconds to finish queued tracks at shutdown before dropping them "
+                             "(default: finish all)")
+    parser.add_argument("--no-display", action="store_true", help="don't open a preview window")
+    parser.add_argument("--max-missed", type=int, default=10,
+                        help="frames a plate may go unseen before its track ends")
+    parser.add_argument("--ocr-crops", type=int, default=5,
+                        help="max best-quality crops OCR'd per track (stops early once confident)")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="don't load and warm up YOLO/PaddleOCR in the background at start")
+    parser.add_argument("--warmup-esrgan", action="store_true",
+                        help="also warm up Real-ESRGAN instead of loading it on first use")
+    parser.add_argument("--sr-confidence", type=float, default=0.85,
+                        help="run Real-ESRGAN only when OCR confidence on the cheap path is below this")
+    parser.add_argument("--frame-budget-ms", type=float, default=250,
+                        help="skip Real-ESRGAN once a frame has used this much time")
+    parser.add_argument("--plate-refresh", type=float, default=30.0,
+                        help="seconds between incremental reloads of the plates table")
+    parser.add_argument("--evidence-quality", type=int, default=90, help="JPEG quality of saved images")
+    parser.add_argument("--evidence-crop-only", action="store_true",
+                        help="save the plate crop plus a downscaled context frame instead of the full frame")
+    parser.add_argument("--dedup-ttl", type=float, default=30.0,
+                        help="seconds a plate must go unread on a camera before it is logged again (0 = off)")
+    parser.add_argument("--recognizer", choices=[PADDLE, CHARS], default=RECOGNIZER,
+                        help="paddle: PaddleOCR; chars: YOLO character boxes with PaddleOCR as fallback")
+    parser.add_argument("--detector", choices=[TORCH, ONNX], default=models.detector,
+                        help="onnx: run the exported detector on ONNX Runtime (CPU)")
+    parser.add_argument("--onnx-weights", default=models.onnx_weights)
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="run YOLO only when something moves in the lane; skip frames while idle")
+    parser.add_argument("--roi", help="lane polygon as x,y;x,y;... in pixels or 0-1 fractions")
+    parser.add_argument("--motion-method", choices=[DIFF, MOG2], default=DIFF)
+    parser.add_argument("--motion-area", type=float, default=0.01,
+                        help="fraction of the ROI that must change to count as motion")
+    parser.add_argument("--max-skip", type=int, default=8,
+                        help="while idle, check for motion only every Nth frame at most")
+    parser.add_argument("--adaptive-imgsz", action="store_true",
+                        help="run YOLO at the smallest input size that keeps plates --min-plate-height tall")
+    parser.add_argument("--min-plate-height", type=int, default=24,
+                        help="plate height (pixels at the detector input) to keep; ~48 for --recognizer chars")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the sampling profiler; hot frames are printed at exit")
+    parser.add_argument("--profile-out", default="profile.collapsed",
+                        help="where --profile writes collapsed stacks at exit (flamegraph input)")
+    args = parser.parse_args()
+
+    profiler = metrics.start(args.metrics_port, args.profile)
 
-cap.release()
-cv2.destroyAllWindows()
+    RECOGNIZER = args.recognizer
+    models.detector = args.detector
+    models.onnx_weights = args.onnx_weights
+    dedup.ttl = args.dedup_ttl
+    evidence.quality = args.evidence_quality
+    evidence.crop_only = args.evidence_crop_only
+    enhancer.min_confidence = args.sr_confidence
+    enhancer.budget_ms = args.frame_budget_ms
+    # Registered plates are kept in memory and refreshed in the background
+    plate_index.start_auto_refresh(args.plate_refresh)
+    if not args.no_warmup:
+        # Models load while the camera opens instead of on the first frame.
+        # With the character recognizer PaddleOCR only loads on its first fallback.
+        names = ("yolo",) if RECOGNIZER == CHARS else ("yolo", "ocr")
+        models.warmup(names + ("upsampler",) if args.warmup_esrgan else names)
+
+    gate = None
+    if args.motion_gate:
+        gate = MotionGate(roi=parse_roi(args.roi), min_area=args.motion_area,
+                          max_skip=args.max_skip, method=args.motion_method)
+
+    resolution = None
+    if args.adaptive_imgsz:
+        resolution = ResolutionController(min_plate_height=args.min_plate_height)
+        metrics.DETECT_IMGSZ.set_function(lambda: {"default": resolution.current})
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    if args.pipeline:
+        run_pipeline(source, args.queue_size, args.drop_policy, args.stats_interval,
+                     not args.no_display, args.max_missed, args.ocr_crops, gate, resolution,
+                     args.drain_timeout)
+    else:
+        run_camera(source, args.max_missed, args.ocr_crops, gate, resolution)
+    if resolution is not None:
+        print(f"📊 Detector resolution: {resolution.format_stats()}")
+    evidence.close()
+    print(f"📊 Evidence: {evidence.written} image(s) written, {evidence.dropped} dropped, "
+          f"{evidence.failed} failed")
+    if _db_writer is not None:
+        _db_writer.close()
+        print(f"📊 DB writer: {_db_writer.written} row(s) written, {_db_writer.failed} failed")
+    print(f"📊 Dedup: {dedup.format_stats()}")
+    if super_resolution.stats["crops"]:
+        print(f"📊 Real-ESRGAN: {super_resolution.format_stats()}")
+    if _char_reader is not None:
+        print(f"📊 Character recognizer: {_char_reader.format_stats()}")
+    print(f"⏱️ Model startup: {models.format_timings()}")
+    if profiler is not None:
+        profiler.stop()
+        profiler.dump(args.profile_out)
+        print(profiler.top(10), end="")
+        print(f"📊 Profile: {profiler.samples} samples written to {args.profile_out}")
@@ -0,0 +1,414 @@
+"""Reprocess recorded footage (video files or RTSP playback) offline.
+
+Frames are decoded on a background thread into a prefetch buffer while
+the main thread runs YOLO on batches of them, and finished plate tracks
+are OCR'd on worker threads. A recording is processed as fast as the
+models allow instead of at its frame rate. ``--stride`` only looks at
+every Nth frame (the rest are grabbed, not converted), ``--start`` /
+``--end`` limit the run to a time range, and every plate is written to CSV
+(the plate_results.csv columns plus source, video time, track and
+confidence) or, for a .jsonl output, one JSON object per line.
+
+    python replay.py incident.mp4 --start 12:30 --end 14:00 --out incident.csv
+    python replay.py rtsp://nvr/playback/ch1 --stride 2 --out ch1.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import cv2
+
+import metrics
+import realtime
+from metrics import span
+from motion import MotionGate, parse_roi
+from resolution import ResolutionController
+from multicam import parse_source, is_live
+from pipeline import BoundedQueue, StageStats, DROP_OLDEST, BLOCK, STOP
+
+# The plate_results.csv columns first, so existing readers keep working
+CSV_COLUMNS = [
+    ("date", "التاريخ"),
+    ("plate", "رقم اللوحة"),
+    ("image", "مسار الصورة"),
+    ("source", "المصدر"),
+    ("start", "بداية الظهور"),
+    ("end", "نهاية الظهور"),
+    ("track_id", "رقم التتبع"),
+    ("frames", "عدد الفريمات"),
+    ("confidence", "الثقة"),
+]
+
+
+def parse_time(text):
+    """"90", "1:30" or "00:01:30.5" -> seconds; None stays None."""
+    if text is None or text == "":
+        return None
+    seconds = 0.0
+    for part in str(text).split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_time(seconds):
+    """Seconds -> "HH:MM:SS.mmm"."""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    return f"{hours:02d}:{minutes:02d}:{millis / 1000:06.3f}"
+
+
+class VideoSource:
+    """A video file or stream as a generator of decoded frames.
+
+    Iterating yields (frame_number, seconds, frame, motion) for every
+    ``stride``-th frame between ``start`` and ``end`` seconds. Decoding runs
+    on its own thread, up to ``prefetch`` frames ahead of the consumer.
+    Files are read completely (the decoder waits when the buffer is full);
+    live streams can't wait, so their oldest buffered frames are dropped.
+
+    Files seek straight to ``start`` and time frames by their position;
+    for live streams time counts from when the stream opened. With a motion
+    ``gate`` the decoder thread also flags idle frames, and frames its idle
+    skip passes over are only grabbed.
+
+    Decoding uses whatever backend OpenCV picks (FFmpeg on CPU by default);
+    ``hw_decode`` asks for hardware acceleration where the build supports
+    it and silently falls back to software otherwise.
+    """
+
+    def __init__(self, source, stride=1, start=None, end=None, prefetch=64, gate=None,
+                 hw_decode=False):
+        self.source = parse_source(source)
+        self.live = is_live(self.source)
+        self.stride = max(1, int(stride))
+        self.start = start or 0.0
+        self.end = end
+        self.prefetch = prefetch
+        self.gate = gate
+        self.hw_decode = hw_decode
+        self.fps = 0.0
+        self.opened_at = None
+        self.decoded = 0
+        self.grabbed = 0
+        self.dropped = 0
+        self.error = None
+        self._queue = None
+        self._stop_event = threading.Event()
+
+    def _open(self):
+        if self.hw_decode and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+            cap = cv2.VideoCapture(self.source, cv2.CAP_ANY,
+                                   [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        else:
+            cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            raise IOError(f"Can't open {self.source}")
+        return cap
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            if self._queue.put(item, timeout=0.5):
+                return
+
+    def _decode(self):
+        cap = None
+        try:
+            cap = self._open()
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            timed = not self.live and self.fps > 0
+            if self.start and timed:
+                cap.set(cv2.CAP_PROP_POS_MSEC, self.start * 1000)
+            number = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) if timed else 0
+            self.opened_at = datetime.now()
+            opened = time.monotonic()
+            first = None
+            while not self._stop_event.is_set():
+                seconds = number / self.fps if timed else time.monotonic() - opened
+                if self.end is not None and seconds > self.end:
+                    break
+                wanted = seconds >= self.start
+                if wanted:
+                    first = number if first is None else first
+                    wanted = (number - first) % self.stride == 0
+                if wanted and (self.gate is None or self.gate.wants_frame()):
+                    with span("capture"):
+                        ret, frame = cap.read()
+                else:
+                    ret, frame = cap.grab(), None
+                if not ret:
+                    break
+                metrics.FRAMES.inc()
+                if frame is None:
+                    self.grabbed += 1
+                else:
+                    self.decoded += 1
+                    motion = self.gate is None or self.gate.update(frame)
+                    self._put((number, seconds, frame, motion))
+                number += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            if cap is not None:
+                cap.release()
+            if self._queue.drop_policy == DROP_OLDEST:
+                self.dropped = self._queue.dropped
+            self._queue.put(STOP)
+
+    def __iter__(self):
+        self._queue = BoundedQueue(self.prefetch, DROP_OLDEST if self.live else BLOCK)
+        self._stop_event.clear()
+        decoder = threading.Thread(target=self._decode, name="decoder", daemon=True)
+        decoder.start()
+        try:
+            while True:
+                item = self._queue.get(timeout=0.5)
+                if item is STOP:
+                    break
+                if item is not None:
+                    yield item
+        finally:
+            self._stop_event.set()
+            decoder.join(timeout=5.0)
+        if self.error is not None:
+            raise self.error
+
+    def batches(self, size):
+        """The same frames, in lists of up to ``size``."""
+        batch = []
+        for item in self:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def stop(self):
+        self._stop_event.set()
+
+    def format_stats(self):
+        text = f"decoded={self.decoded}, grabbed only={self.grabbed}"
+        if self.live:
+            text += f", dropped={self.dropped}"
+        return text
+
+
+class ResultWriter:
+    """Appends replay results to a CSV (plate_results.csv layout plus
+    extra columns) or, for a .jsonl path, as JSON lines. Thread-safe."""
+
+    def __init__(self, path):
+        self.path = path
+        self.jsonl = path.lower().endswith(".jsonl")
+        self.written = 0
+        self._lock = threading.Lock()
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8" if self.jsonl or not new else "utf-8-sig",
+                          newline="")
+        self._csv = None
+        if not self.jsonl:
+            self._csv = csv.writer(self._file)
+            if new:
+                self._csv.writerow([title for _, title in CSV_COLUMNS])
+
+    def write(self, result):
+        with self._lock:
+            if self.jsonl:
+                self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            else:
+                self._csv.writerow([result.get(key, "") for key, _ in CSV_COLUMNS])
+            self._file.flush()
+            self.written += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def replay(video, writer=None, batch_size=8, max_missed=10, ocr_crops=5, ocr_workers=1,
+           persist=False, crops_dir=None, recorded_at=None, name=None, resolution=None):
+    """Run detection, tracking and OCR over a VideoSource.
+
+    Plates are passed to ``writer`` (and printed); with ``persist`` they also
+    go through realtime.persist_plate like a live camera would, under
+    ``name`` as the camera. The result date is ``recorded_at`` plus the
+    video time, the stream's open time for live sources, or now. A
+    ResolutionController ``resolution`` picks YOLO's input size.
+
+    OCR workers share realtime's PaddleOCR and enhancer, so only one of
+    them reads a track at a time (realtime.ocr_lock); extra workers only
+    overlap persisting and writing results.
+    """
+    name = name or os.path.basename(str(video.source)) or str(video.source)
+    tracker = realtime.new_tracker(max_missed, ocr_crops)
+    ocr_queue = BoundedQueue(64, BLOCK)
+    detect_stats = StageStats()
+    ocr_stats = StageStats()
+    if crops_dir:
+        os.makedirs(crops_dir, exist_ok=True)
+
+    def result_date(seconds):
+        base = recorded_at or (video.opened_at if video.live else None)
+        return (base + timedelta(seconds=seconds)) if base else datetime.now()
+
+    def save_crop(track, crop):
+        if not crops_dir:
+            return ""
+        path = os.path.join(crops_dir, f"{os.path.splitext(name)[0]}_{track.track_id}_"
+                                       f"{int(track.started_at * 1000)}.jpg")
+        cv2.imwrite(path, crop)
+        return path
+
+    def ocr_loop():
+        while True:
+            track = ocr_queue.get(timeout=0.5)
+            if track is STOP:
+                break
+            if track is None:
+                continue
+            start = time.perf_counter()
+            try:
+                with realtime.ocr_lock:
+                    realtime.enhancer.begin_frame()
+                    plate = realtime.read_track(track)
+                if plate:
+                    letters, digits, confidence = plate
+                    _, crop, frame = track.crops[0]
+                    track.result = realtime.plate_display_text(letters, digits)
+                    if persist:
+                        realtime.persist_plate(letters, digits, frame, crop, camera=name)
+                    result = {
+                        "date": result_date(track.started_at).strftime('%Y-%m-%d %H:%M:%S'),
+                        "plate": track.result,
+                        "image": save_crop(track, crop),
+                        "source": name,
+                        "start": format_time(track.started_at),
+                        "end": format_time(track.last_seen),
+                        "track_id": track.track_id,
+                        "frames": track.hits,
+                        "confidence": round(confidence, 3),
+                        "letters": letters,
+                        "digits": digits,
+                    }
+                    print(f"🔍 [{result['start']}] {track.result} (track #{track.track_id}, "
+                          f"confidence {confidence:.2f})")
+                    if writer is not None:
+                        writer.write(result)
+            except Exception as e:
+                print(f"❌ Track #{track.track_id}: OCR error: {e}")
+            ocr_stats.record(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=ocr_loop, name=f"ocr-{i}", daemon=True)
+               for i in range(max(1, ocr_workers))]
+    for worker in workers:
+        worker.start()
+    metrics.STAGE_FPS.set_function(lambda: {"detect": detect_stats.fps(), "ocr": ocr_stats.fps()})
+    realtime.watch_writer_queues(lambda: {"ocr": ocr_queue.qsize()})
+
+    started = time.perf_counter()
+    first = last = None
+    try:
+        for batch in video.batches(batch_size):
+            start = time.perf_counter()
+            # Idle frames skip YOLO but still advance the tracker
+            frames = [frame for _, _, frame, motion in batch if motion]
+            sizes = [resolution] * len(frames)
+            found = iter(realtime.detect_plates_batch(frames, sizes) if frames else [])
+            for _, seconds, frame, motion in batch:
+                boxes, reads = next(found) if motion else ([], None)
+                for track in tracker.update(boxes, frame, reads, timestamp=seconds):
+                    ocr_queue.put(track)
+            first = batch[0][1] if first is None else first
+            last = batch[-1][1]
+            detect_stats.record(time.perf_counter() - start)
+    except KeyboardInterrupt:
+        print("✅ تم إيقاف التشغيل")
+    finally:
+        video.stop()
+        for track in tracker.flush():
+            ocr_queue.put(track)
+        for _ in workers:
+            ocr_queue.put(STOP)
+        for worker in workers:
+            worker.join()
+
+    elapsed = time.perf_counter() - started
+    covered = (last - first) if first is not None else 0.0
+    speed = covered / elapsed if elapsed > 0 else 0.0
+    print(f"📊 Replay: {format_time(covered)} of video in {elapsed:.1f}s ({speed:.1f}x real time), "
+          f"{video.format_stats()}")
+    return speed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reprocess recorded footage (video file or RTSP)")
+    parser.add_argument("source", help="video file path or stream URL")
+    parser.add_argument("--out", default="replay_results.csv",
+                        help="results file: .csv (plate_results.csv columns + extras) or .jsonl")
+    parser.add_argument("--start", help="start time, e.g. 90, 1:30 or 00:01:30.5")
+    parser.add_argument("--end", help="end time, same formats as --start")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="run detection on every Nth frame only")
+    parser.add_argument("--batch-size", type=int, default=8, help="frames per YOLO call")
+    parser.add_argument("--prefetch", type=int, default=64,
+                        help="frames decoded ahead of the detector")
+    parser.add_argument("--ocr-workers", type=int, default=1,
+                        help="OCR threads; model calls are serialized, so more than 1 only "
+                             "overlaps DB writes and result output")
+    parser.add_argument("--max-missed", type=int, default=10,
+                        help="analysed frames a plate may go unseen before its track ends")
+    parser.add_argument("--ocr-crops", type=int, default=5,
+                        help="max best-quality crops OCR'd per track (stops early once confident)")
+    parser.add_argument("--crops-dir", help="save the best crop of every plate here")
+    parser.add_argument("--recorded-at",
+                        help="wall-clock time the recording starts (YYYY-MM-DD HH:MM:SS) for the date column")
+    parser.add_argument("--persist", action="store_true",
+                        help="also log plates to the DB like a live camera (off: results file only)")
+    parser.add_argument("--hw-decode", action="store_true",
+                        help="ask OpenCV for hardware-accelerated decoding when available")
+    parser.add_argument("--recognizer", choices=[realtime.PADDLE, realtime.CHARS],
+                        default=realtime.RECOGNIZER)
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="run YOLO only when something moves in the lane")
+    parser.add_argument("--roi", help="lane polygon as x,y;x,y;... in pixels or 0-1 fractions")
+    parser.add_argument("--adaptive-imgsz", action="store_true",
+                        help="run YOLO at the smallest input size that keeps plates readable")
+    parser.add_argument("--min-plate-height", type=int, default=24,
+                        help="plate height (pixels at the detector input) to keep")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    args = parser.parse_args()
+
+    metrics.start(args.metrics_port)
+    realtime.RECOGNIZER = args.recognizer
+    names = ("yolo",) if args.recognizer == realtime.CHARS else ("yolo", "ocr")
+    realtime.models.warmup(names)
+    if args.persist:
+        realtime.plate_index.start_auto_refresh(30.0)
+
+    gate = MotionGate(roi=parse_roi(args.roi)) if args.motion_gate else None
+    recorded_at = datetime.strptime(args.recorded_at, '%Y-%m-%d %H:%M:%S') if args.recorded_at else None
+    video = VideoSource(args.source, args.stride, parse_time(args.start), parse_time(args.end),
+                        args.prefetch, gate, args.hw_decode)
+    resolution = ResolutionController(min_plate_height=args.min_plate_height) if args.adaptive_imgsz else None
+    writer = ResultWriter(args.out)
+    try:
+        replay(video, writer, args.batch_size, args.max_missed, args.ocr_crops, args.ocr_workers,
+               args.persist, args.crops_dir, recorded_at, resolution=resolution)
+    finally:
+        writer.close()
+        print(f"📊 {writer.written} plate(s) written to {args.out}")
+        if gate is not None:
+            print(f"📊 Motion gate: {gate.format_stats()}")
+        if resolution is not None:
+            print(f"📊 Detector resolution: {resolution.format_stats()}")
+        if args.persist:
+            realtime.evidence.close()
+            if realtime._db_writer is not None:
+                realtime._db_writer.close()
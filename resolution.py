@@ -0,0 +1,74 @@
+import math
+from collections import deque
+
+SIZES = (320, 416, 512, 640)
+
+
+class ResolutionController:
+    """Picks the smallest detector input size that keeps plates readable.
+
+    YOLO scales a frame's long side to ``imgsz``, so a plate ``h`` pixels
+    tall in the frame is ``h * imgsz / long_side`` pixels tall to the
+    detector. The controller keeps the heights of the last ``window``
+    plates seen on one camera (as a fraction of the long side) and uses the
+    smallest of ``sizes`` at which the ``quantile``-th percentile plate is
+    still ``min_plate_height * margin`` pixels tall. Boxes still come back
+    in full-frame coordinates, so crops for OCR keep full resolution.
+
+    Until ``min_samples`` plates have been seen the largest size is used.
+    Every ``probe_every``-th frame also runs at the largest size, so plates
+    too small to be found at the current size can pull it back up.
+    """
+
+    def __init__(self, sizes=SIZES, min_plate_height=24, quantile=10, window=200,
+                 min_samples=20, margin=1.2, probe_every=150):
+        self.sizes = sorted(sizes)
+        self.min_plate_height = min_plate_height
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.margin = margin
+        self.probe_every = probe_every
+        self.current = self.sizes[-1]
+        self.frames = 0
+        self.stats = {size: 0 for size in self.sizes}
+        self._heights = deque(maxlen=window)
+
+    def imgsz(self, shape):
+        """Input size for the next frame of this ``shape``."""
+        self.frames += 1
+        probe = self.probe_every and self.frames % self.probe_every == 0
+        size = self.sizes[-1] if probe else self.current
+        # No point upscaling a frame that is already smaller than the input
+        fits = [s for s in self.sizes if s >= math.ceil(max(shape[:2]) / 32) * 32]
+        size = min(size, fits[0]) if fits else size
+        self.stats[size] += 1
+        return size
+
+    def observe(self, boxes, shape):
+        """Record the plate boxes (full-frame xyxy) found in one frame."""
+        if not boxes:
+            return
+        long_side = max(shape[:2])
+        for _, y1, _, y2 in boxes:
+            self._heights.append((y2 - y1) / long_side)
+        if len(self._heights) >= self.min_samples:
+            self.current = self._pick()
+
+    def plate_height(self):
+        """The percentile plate height, as a fraction of the long side."""
+        if not self._heights:
+            return None
+        ordered = sorted(self._heights)
+        return ordered[int((len(ordered) - 1) * self.quantile / 100)]
+
+    def _pick(self):
+        needed = self.min_plate_height * self.margin
+        height = self.plate_height()
+        for size in self.sizes:
+            if height * size >= needed:
+                return size
+        return self.sizes[-1]
+
+    def format_stats(self):
+        used = ", ".join(f"{size}: {count}" for size, count in self.stats.items() if count)
+        return f"imgsz now {self.current}, frames per size {{{used}}}"
@@ -0,0 +1,149 @@
+"""On-disk cache of raw recognition results, keyed by image content.
+
+Rerunning ``detect_and_ocr_batch`` over the same images only to try new
+text post-processing repeats YOLO, Real-ESRGAN and PaddleOCR for nothing.
+``ResultCache`` keeps what those models produced for an image (plate
+boxes, fingerprints of the enhanced crops, raw OCR lines with their
+scores) in a SQLite file, keyed by the SHA-256 of the file's bytes and a
+version string naming the models and settings that produced it. Parsing
+runs again on every read, so changing it needs no cache invalidation;
+changing weights or settings changes the version and misses.
+
+The file is kept under ``max_bytes`` by dropping the least recently used
+entries.
+"""
+import hashlib
+import json
+import os
+from importlib import metadata
+import sqlite3
+import threading
+import time
+import zlib
+
+FORMAT = 1  # bump when the stored layout changes
+
+
+def digest(data):
+    """Content key of an encoded image."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprint(image):
+    """Short hash of an image's pixels and shape, to tell whether an
+    enhanced crop changed between runs without storing it."""
+    h = hashlib.blake2b(image.tobytes(), digest_size=8)
+    h.update(str(image.shape).encode())
+    return h.hexdigest()
+
+
+def file_signature(path):
+    """name:size:mtime of a weights file, or name:missing."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return f"{os.path.basename(str(path))}:missing"
+    return f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def package_version(name):
+    """Installed version of a package (its default models come with it)."""
+    try:
+        return f"{name}=={metadata.version(name)}"
+    except metadata.PackageNotFoundError:
+        return f"{name}:missing"
+
+
+def version(*parts):
+    """Version key from anything that changes what the models output."""
+    return hashlib.sha256("|".join([str(FORMAT), *map(str, parts)]).encode()).hexdigest()[:16]
+
+
+class ResultCache:
+    """SQLite-backed, size-bounded map of (image digest, version) -> JSON."""
+
+    def __init__(self, path="results_cache.db", max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " digest TEXT NOT NULL, version TEXT NOT NULL, data BLOB NOT NULL,"
+            " size INTEGER NOT NULL, used REAL NOT NULL, PRIMARY KEY (digest, version))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self._conn.commit()
+        self.size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get_many(self, digests, version):
+        """{digest: value} for the digests that are cached under ``version``."""
+        wanted = list(dict.fromkeys(digests))
+        found = {}
+        with self._lock:
+            # SQLite allows 999 parameters per statement on older builds
+            for start in range(0, len(wanted), 900):
+                chunk = wanted[start:start + 900]
+                rows = self._conn.execute(
+                    f"SELECT digest, data FROM results WHERE version = ? AND digest IN "
+                    f"({','.join('?' * len(chunk))})", (version, *chunk)).fetchall()
+                found.update((key, json.loads(zlib.decompress(data))) for key, data in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE results SET used = ? WHERE digest = ? AND version = ?",
+                                       [(now, key, version) for key in found])
+                self._conn.commit()
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(wanted) - len(found)
+        return found
+
+    def get(self, digest, version):
+        return self.get_many([digest], version).get(digest)
+
+    def put_many(self, items, version):
+        """Store {digest: JSON-serializable value} under ``version``."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            data = zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            rows.append((key, version, data, len(data), now))
+        with self._lock:
+            replaced = self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM results WHERE version = ? AND digest IN "
+                f"({','.join('?' * len(rows))})", (version, *items)).fetchone()[0]
+            self._conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", rows)
+            self.size += sum(row[3] for row in rows) - replaced
+            self.stats["stored"] += len(rows)
+            if self.size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def put(self, digest, version, value):
+        self.put_many({digest: value}, version)
+
+    def _evict(self):
+        """Drop least recently used entries down to 90% of max_bytes."""
+        target = self.max_bytes * 0.9
+        victims = []
+        for key, ver, size in self._conn.execute("SELECT digest, version, size FROM results ORDER BY used"):
+            if self.size <= target:
+                break
+            victims.append((key, ver))
+            self.size -= size
+        self._conn.executemany("DELETE FROM results WHERE digest = ? AND version = ?", victims)
+        self.stats["evicted"] += len(victims)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def format_stats(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        rate = self.stats["hits"] / lookups * 100 if lookups else 0.0
+        return (f"hits={self.stats['hits']}, misses={self.stats['misses']} ({rate:.0f}% hit), "
+                f"stored={self.stats['stored']}, evicted={self.stats['evicted']}, "
+                f"size={self.size / 1024 / 1024:.1f} MiB")
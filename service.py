@@ -0,0 +1,281 @@
+"""Plate recognition as an asyncio service, with a small HTTP front end.
+
+Many clients share one loaded model set. ``RecognitionService.recognize``
+decodes the uploaded image on a thread pool and queues it; a single
+batcher task collects whatever arrived within ``max_wait`` seconds (up to
+``max_batch`` images) and runs ``main1.recognize_images`` on them as one
+batch on the model thread. The queue holds at most ``max_pending`` images:
+past that new requests are refused straight away instead of piling up,
+and a request that isn't answered within ``timeout`` seconds gets
+``asyncio.TimeoutError`` (and is skipped if it hasn't started yet).
+
+    python service.py --port 8080 --warmup
+    curl --data-binary @Images/img3-.jpg -H "Content-Type: image/jpeg" http://127.0.0.1:8080/recognize
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import metrics
+
+MAX_BODY = 10 * 1024 * 1024
+
+
+class ServiceBusy(Exception):
+    """Too many images are already waiting."""
+
+
+class BadImage(ValueError):
+    """The upload isn't an image OpenCV can decode."""
+
+
+def decode_image(data, fit=None):
+    """JPEG/PNG bytes -> BGR image, optionally passed through ``fit``."""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise BadImage("Unable to decode image")
+    return fit(image) if fit is not None else image
+
+
+class RecognitionService:
+    """Micro-batching front end for a batch recognizer.
+
+    ``recognize_batch(images)`` takes a list of BGR images and returns one
+    result per image (``main1.recognize_images`` by default). It always
+    runs on one dedicated thread, so the models are never used from two
+    threads at once.
+    """
+
+    def __init__(self, recognize_batch=None, fit=None, max_batch=8, max_wait=0.005,
+                 max_pending=64, timeout=10.0, decode_workers=2):
+        if recognize_batch is None:
+            import main1
+            recognize_batch, fit = main1.recognize_images, fit or main1.fit_image
+        self.recognize_batch = recognize_batch
+        self.fit = fit
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.stats = {"requests": 0, "batches": 0, "images": 0, "busy": 0, "timeouts": 0, "errors": 0}
+        self._decoder = ThreadPoolExecutor(decode_workers, thread_name_prefix="service-decode")
+        self._model = ThreadPoolExecutor(1, thread_name_prefix="service-model")
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.max_pending)
+        metrics.QUEUE_DEPTH.set_function(lambda: {"service": self._queue.qsize()})
+        self._task = asyncio.get_running_loop().create_task(self._batcher())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._decoder.shutdown(wait=False)
+        self._model.shutdown(wait=True)
+
+    async def recognize(self, image_bytes, timeout=None):
+        """Recognize the plates in one encoded image.
+
+        Raises BadImage, ServiceBusy or asyncio.TimeoutError.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        self.stats["requests"] += 1
+        try:
+            image = await loop.run_in_executor(self._decoder, decode_image, image_bytes, self.fit)
+        except BadImage:
+            metrics.SERVICE_REQUESTS.labels(result="bad_image").inc()
+            raise
+        future = loop.create_future()
+        try:
+            self._queue.put_nowait((image, future))
+        except asyncio.QueueFull:
+            self.stats["busy"] += 1
+            metrics.SERVICE_REQUESTS.labels(result="busy").inc()
+            raise ServiceBusy(f"{self.max_pending} image(s) already waiting") from None
+        metrics.FRAMES.inc()
+        try:
+            # wait_for cancels the future on timeout; the batcher skips it
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            metrics.SERVICE_REQUESTS.labels(result="timeout").inc()
+            raise
+        except Exception:
+            metrics.SERVICE_REQUESTS.labels(result="error").inc()
+            raise
+        metrics.SERVICE_REQUESTS.labels(result="ok").inc()
+        return {"width": image.shape[1], "height": image.shape[0], "plates": result}
+
+    async def _collect(self):
+        """The first waiting image plus whatever else arrives within max_wait."""
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Requests that timed out while queued aren't worth running
+        return [(image, future) for image, future in batch if not future.done()]
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self.stats["batches"] += 1
+            self.stats["images"] += len(batch)
+            metrics.SERVICE_BATCH.observe(len(batch))
+            try:
+                results = list(await loop.run_in_executor(self._model, self.recognize_batch,
+                                                          [image for image, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"recognizer returned {len(results)} result(s) "
+                                       f"for {len(batch)} image(s)")
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ Batch error: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def format_stats(self):
+        batches = self.stats["batches"]
+        per_batch = self.stats["images"] / batches if batches else 0.0
+        return (f"{self.stats['requests']} request(s), {batches} batch(es), {per_batch:.1f} image(s) per batch, "
+                f"busy={self.stats['busy']}, timeouts={self.stats['timeouts']}, errors={self.stats['errors']}")
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+async def _respond(writer, status, payload, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = [f"HTTP/1.1 {status} {REASONS[status]}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            "Connection: close", *headers]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _handle(service, reader, writer):
+    """One request per connection: POST /recognize with the image as the
+    body, or GET /health."""
+    try:
+        request = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(request) < 2:
+            return
+        method, path = request[0], request[1].split("?")[0]
+
+        if path == "/health":
+            await _respond(writer, 200, {"status": "ok", "pending": service._queue.qsize(),
+                                         "stats": service.stats})
+            return
+        if path != "/recognize":
+            await _respond(writer, 404, {"error": "not found"})
+            return
+        if method != "POST":
+            await _respond(writer, 405, {"error": "use POST"}, ["Allow: POST"])
+            return
+        if "content-length" not in headers:
+            await _respond(writer, 411, {"error": "Content-Length required"})
+            return
+        length = int(headers["content-length"])
+        if length > MAX_BODY:
+            await _respond(writer, 413, {"error": f"image larger than {MAX_BODY} bytes"})
+            return
+
+        start = time.perf_counter()
+        data = await reader.readexactly(length)
+        try:
+            result = await service.recognize(data)
+        except BadImage as e:
+            await _respond(writer, 400, {"error": str(e)})
+        except ServiceBusy as e:
+            await _respond(writer, 503, {"error": str(e)}, ["Retry-After: 1"])
+        except asyncio.TimeoutError:
+            await _respond(writer, 504, {"error": "recognition timed out"})
+        except Exception as e:
+            await _respond(writer, 500, {"error": str(e)})
+        else:
+            result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            await _respond(writer, 200, result)
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
+        print(f"⚠️ Bad request: {e}")
+    finally:
+        writer.close()
+
+
+async def serve(service, host="127.0.0.1", port=8080):
+    """Run the HTTP front end until cancelled."""
+    await service.start()
+    server = await asyncio.start_server(lambda r, w: _handle(service, r, w), host, port)
+    print(f"✅ Recognition service on http://{host}:{port}/recognize")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve plate recognition over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=8, help="images per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="how long to wait for more images before running a batch")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="images allowed to wait; further requests get 503")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds per request")
+    parser.add_argument("--no-enhance", action="store_true", help="skip plate enhancement")
+    parser.add_argument("--warmup", action="store_true", help="load the models before accepting requests")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    args = parser.parse_args()
+
+    import main1
+
+    metrics.start(args.metrics_port)
+    if args.warmup:
+        main1.models.warmup(background=False)
+    service = RecognitionService(lambda images: main1.recognize_images(images, not args.no_enhance),
+                                 fit=main1.fit_image, max_batch=args.max_batch,
+                                 max_wait=args.max_wait_ms / 1000, max_pending=args.max_pending,
+                                 timeout=args.timeout)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    print(f"📊 Service: {service.format_stats()}")
@@ -0,0 +1,184 @@
+"""Real-ESRGAN over many plate crops in one forward pass.
+
+``RealESRGANer.enhance`` runs the RRDBNet once per crop and tiles every
+crop at a fixed size, so a frame or image batch with several blurry plates
+pays the per-call overhead several times. ``BatchUpsampler`` pads each
+crop exactly as ``RealESRGANer.pre_process`` would (reflected right and
+bottom by ``pre_pad``, then to a multiple of the mod scale), fills crops
+of similar size out to a common size, stacks them into one batch, runs
+the network once and cuts each 4x output back to its own crop. The
+``pre_pad`` margin keeps the fill away from the pixels that are kept. How many
+crops go into a pass, and the tile size for crops too big to run whole,
+follow from the crop sizes and the memory currently free on the device.
+"""
+import math
+import os
+import threading
+
+import cv2
+import numpy as np
+
+SCALE = 4
+ALIGN = 16  # crops are padded up to a multiple of this, so nearby sizes share a pass
+TILE_PAD = 10
+# Rough peak activation memory of RRDBNet x4 (float32) per input pixel,
+# dominated by the 64-channel feature maps after the two 2x upsamplings
+BYTES_PER_PIXEL = 16 * 1024
+
+
+def available_memory(device=None):
+    """Free bytes on ``device`` (CUDA) or in system RAM."""
+    if device is not None and getattr(device, "type", "cpu") == "cuda":
+        import torch
+        return torch.cuda.mem_get_info(device)[0]
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        try:
+            return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (AttributeError, ValueError, OSError):
+            return 2 << 30
+
+
+def padded_size(shape):
+    h, w = shape[:2]
+    return -(-h // ALIGN) * ALIGN, -(-w // ALIGN) * ALIGN
+
+
+def mod_scale(scale):
+    """Divisor RealESRGANer pads inputs to for x2 and x1 models."""
+    return {2: 2, 1: 4}.get(scale)
+
+
+def pre_pad_shape(shape, pre_pad=0, mod=None):
+    """(h, w) of a crop after RealESRGANer's pre_pad and mod padding."""
+    h, w = shape[0] + pre_pad, shape[1] + pre_pad
+    if mod:
+        h, w = h + -h % mod, w + -w % mod
+    return h, w
+
+
+def pad_crop(crop, h, w, pre_pad=0, mod=None):
+    """Pad a crop the way RealESRGANer.pre_process does, then replicate its
+    edge out to h x w for the batch."""
+    if pre_pad:
+        crop = cv2.copyMakeBorder(crop, 0, pre_pad, 0, pre_pad, cv2.BORDER_REFLECT_101)
+    if mod:
+        crop = cv2.copyMakeBorder(crop, 0, -crop.shape[0] % mod, 0, -crop.shape[1] % mod,
+                                  cv2.BORDER_REFLECT_101)
+    return cv2.copyMakeBorder(crop, 0, h - crop.shape[0], 0, w - crop.shape[1], cv2.BORDER_REPLICATE)
+
+
+def auto_tile(max_pixels):
+    """Largest tile (multiple of ALIGN) whose padded square fits in
+    ``max_pixels``."""
+    side = int(math.sqrt(max_pixels)) - 2 * TILE_PAD
+    return max(ALIGN, side // ALIGN * ALIGN)
+
+
+def plan_batches(shapes, max_pixels, max_batch=16):
+    """Split crops into forward passes: [(padded (h, w), [crop index], tile)].
+
+    Crops with the same padded size share a pass of at most ``max_batch``
+    crops and ``max_pixels`` input pixels. A crop too big for
+    ``max_pixels`` on its own runs alone with ``tile`` set; ``tile`` is
+    None otherwise.
+    """
+    groups = {}
+    for i, shape in enumerate(shapes):
+        groups.setdefault(padded_size(shape), []).append(i)
+    passes = []
+    for (h, w), indices in sorted(groups.items()):
+        per_pass = min(max_batch, max_pixels // (h * w))
+        if per_pass < 1:
+            tile = auto_tile(max_pixels)
+            passes.extend(((h, w), [i], tile) for i in indices)
+            continue
+        for start in range(0, len(indices), per_pass):
+            passes.append(((h, w), indices[start:start + per_pass], None))
+    return passes
+
+
+class BatchUpsampler:
+    """Batched front end for the registry's RealESRGANer.
+
+    ``registry.upsampler`` is only touched on the first call, so Real-ESRGAN
+    still loads lazily. At most ``memory_fraction`` of the free memory is
+    planned for one pass. Calls are serialized: one pass already uses every
+    core (or the GPU).
+    """
+
+    def __init__(self, registry, memory_fraction=0.25, max_batch=16):
+        self.registry = registry
+        self.memory_fraction = memory_fraction
+        self.max_batch = max_batch
+        self.stats = {"crops": 0, "passes": 0, "tiled": 0}
+        self._lock = threading.Lock()
+
+    def max_pixels(self):
+        upsampler = self.registry.upsampler
+        free = available_memory(getattr(upsampler, "device", None))
+        return max(ALIGN * ALIGN, int(free * self.memory_fraction / BYTES_PER_PIXEL))
+
+    def enhance(self, crop):
+        """4x one BGR crop."""
+        return self.enhance_batch([crop])[0]
+
+    def enhance_batch(self, crops):
+        """4x every BGR crop; returns the outputs in input order."""
+        if not crops:
+            return []
+        outputs = [None] * len(crops)
+        with self._lock:
+            upsampler = self.registry.upsampler
+            pre_pad, mod = getattr(upsampler, "pre_pad", 0), mod_scale(upsampler.scale)
+            shapes = [pre_pad_shape(c.shape, pre_pad, mod) for c in crops]
+            for (h, w), indices, tile in plan_batches(shapes, self.max_pixels(), self.max_batch):
+                if tile is not None:
+                    outputs[indices[0]] = self._tiled(crops[indices[0]], tile)
+                    self.stats["tiled"] += 1
+                else:
+                    for i, output in zip(indices, self._forward([crops[i] for i in indices], h, w)):
+                        outputs[i] = output
+                self.stats["passes"] += 1
+            self.stats["crops"] += len(crops)
+        return outputs
+
+    def _forward(self, crops, h, w):
+        upsampler = self.registry.upsampler
+        pre_pad, mod = getattr(upsampler, "pre_pad", 0), mod_scale(upsampler.scale)
+        output = self._infer(np.stack([pad_crop(c, h, w, pre_pad, mod) for c in crops]))
+        # Padding only ever goes right and bottom, so each crop's output starts at (0, 0)
+        return [np.ascontiguousarray(out[:c.shape[0] * SCALE, :c.shape[1] * SCALE])
+                for out, c in zip(output, crops)]
+
+    def _infer(self, batch):
+        """RRDBNet over a BGR uint8 NHWC batch; returns BGR uint8 NHWC."""
+        import torch
+
+        upsampler = self.registry.upsampler
+        # BGR uint8 NHWC -> RGB float NCHW in [0, 1], as RealESRGANer does per image
+        tensor = torch.from_numpy(np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2)))
+        tensor = tensor.to(upsampler.device).float().div_(255.0)
+        if getattr(upsampler, "half", False):
+            tensor = tensor.half()
+        with torch.no_grad():
+            output = upsampler.model(tensor)
+        output = (output.float().clamp_(0, 1).cpu().numpy() * 255.0).round().astype(np.uint8)
+        return output.transpose(0, 2, 3, 1)[..., ::-1]
+
+    def _tiled(self, crop, tile):
+        upsampler = self.registry.upsampler
+        previous, upsampler.tile_size = upsampler.tile_size, tile
+        try:
+            output, _ = upsampler.enhance(crop, outscale=SCALE)
+        finally:
+            upsampler.tile_size = previous
+        return output
+
+    def format_stats(self):
+        passes = self.stats["passes"]
+        per_pass = self.stats["crops"] / passes if passes else 0.0
+        return (f"{self.stats['crops']} crop(s) in {passes} pass(es), {per_pass:.1f} per pass, "
+                f"tiled={self.stats['tiled']}")
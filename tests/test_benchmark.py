@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmark import build_workload, compare, score_accuracy
+
+PREDICTIONS = [("a.jpg", "هص ٩٧٤١"), ("b.jpg", "هص ٩٧٤٠"), ("c.jpg", None)]
+
+
+def test_accuracy_is_not_measured_without_enough_labels():
+    truth = {"a.jpg": "هص ٩٧٤١"}
+    assert score_accuracy(PREDICTIONS, truth, min_labelled=20) == {"labelled_images": 1, "measured": False}
+    assert score_accuracy(PREDICTIONS, {}) == {"labelled_images": 0, "measured": False}
+
+
+def test_accuracy_over_labelled_images():
+    truth = {"a.jpg": "هص ٩٧٤١", "b.jpg": "هص ٩٧٤١"}
+    accuracy = score_accuracy(PREDICTIONS, truth, min_labelled=2)
+    assert accuracy["measured"] and accuracy["labelled_images"] == 2
+    assert accuracy["plate_accuracy"] == 0.5
+    assert accuracy["char_accuracy"] == round(1 - 1 / 12, 4)
+
+
+def test_compare_ignores_unmeasured_accuracy():
+    baseline = {"accuracy": {"labelled_images": 30, "measured": True, "plate_accuracy": 0.9}}
+    current = {"accuracy": {"labelled_images": 1, "measured": False}}
+    assert compare(current, baseline, 0.15) == []
+    current = {"accuracy": {"labelled_images": 30, "measured": True, "plate_accuracy": 0.8}}
+    assert compare(current, baseline, 0.15) == ["plate_accuracy: 0.900 -> 0.800"]
+
+
+def test_workload_loads_and_fits_like_main1():
+    calls = []
+
+    def load_image(path):
+        calls.append(("load", path))
+        return None if path == "missing.jpg" else np.full((40, 60, 3), 128, np.uint8)
+
+    def fit_image(image):
+        calls.append(("fit", image.shape))
+        return image[:20, :30]
+
+    recognizer = SimpleNamespace(load_image=load_image, fit_image=fit_image)
+    workload = build_workload(recognizer, ["a/x.jpg", "missing.jpg"], replay=1, seed=7)
+    assert [name for name, _ in workload] == ["x.jpg", "missing.jpg", "replay0:x.jpg", "replay0:missing.jpg"]
+    images = [loader() for _, loader in workload]
+    assert images[0].shape == (40, 60, 3) and images[1] is None and images[3] is None
+    # Variants are augmented, then fitted
+    assert images[2].shape == (20, 30, 3)
+    assert calls == [("load", "a/x.jpg"), ("load", "missing.jpg"),
+                     ("load", "a/x.jpg"), ("fit", (40, 60, 3)), ("load", "missing.jpg")]
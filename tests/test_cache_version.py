@@ -0,0 +1,39 @@
+"""Every setting that changes what recognize_raw returns changes the version."""
+import pytest
+
+pytest.importorskip("PIL")  # main1 imports it at module level
+
+import main1
+import models
+
+
+@pytest.mark.parametrize("name, value", [
+    ("DETECT_CONF", 0.4),
+    ("DETECT_IMGSZ", 960),
+    ("FIT_SIZE", (720, 1280)),
+    ("UPSCALE_CONTRAST", 40),
+    ("UPSCALE_SHARPNESS", 150),
+    ("RECOGNIZER", "chars"),
+])
+def test_setting_changes_version(monkeypatch, name, value):
+    before = main1.cache_version(True)
+    monkeypatch.setattr(main1, name, value)
+    assert main1.cache_version(True) != before
+
+
+@pytest.mark.parametrize("settings, key, value", [
+    (models.OCR_SETTINGS, "lang", "en"),
+    (models.OCR_SETTINGS, "det_db_thresh", 0.5),
+    (models.ESRGAN_SETTINGS, "pre_pad", 0),
+])
+def test_model_settings_change_version(monkeypatch, settings, key, value):
+    before = main1.cache_version(True)
+    monkeypatch.setitem(settings, key, value)
+    assert main1.cache_version(True) != before
+
+
+def test_enhance_and_tile_change_version(monkeypatch):
+    assert main1.cache_version(True) != main1.cache_version(False)
+    before = main1.cache_version(True)
+    monkeypatch.setattr(main1.models, "tile", 400)
+    assert main1.cache_version(True) != before
@@ -0,0 +1,51 @@
+import pytest
+
+from consensus import PlateConsensus, vote
+
+
+def test_unanimous_reads():
+    assert vote([("١٢٣", [0.9, 0.9, 0.9])] * 3) == ("١٢٣", pytest.approx(0.9))
+
+
+def test_majority_fixes_one_position():
+    reads = [("١٢٣", [0.9, 0.9, 0.9]), ("١٧٣", [0.9, 0.4, 0.9]), ("١٢٣", [0.9, 0.9, 0.9])]
+    text, confidence = vote(reads)
+    # The disputed position only has 1.8 of 3 reads' worth of score
+    assert text == "١٢٣" and confidence == pytest.approx(0.6)
+
+
+def test_dropped_character_is_aligned_not_shifted():
+    reads = [("١٢٣", [0.9] * 3), ("١٣", [0.9, 0.9]), ("١٢٣", [0.9] * 3)]
+    text, confidence = vote(reads)
+    assert text == "١٢٣"
+    assert confidence == pytest.approx(0.6)  # ٢ got 1.8 of 3 votes; length 2 of 3
+
+
+def test_votes_are_weighted_by_score():
+    text, confidence = vote([("ب", [0.3]), ("ب", [0.3]), ("ا", [0.95])])
+    assert text == "ا" and confidence == pytest.approx(0.95 / 3)
+
+
+def test_missing_reads():
+    assert vote([]) == ("", 0.0)
+    assert vote([(None, []), ("", [])]) == ("", 1.0)
+    assert vote([(None, []), ("ا", [0.8])]) == ("ا", pytest.approx(0.8))
+
+
+def test_plate_consensus_stops_when_confident():
+    consensus = PlateConsensus(min_reads=2, max_reads=5, threshold=0.8)
+    assert consensus.result() is None
+    consensus.add("هص", "٩٧٤١", [0.95, 0.9], [0.9, 0.95, 0.9, 0.9])
+    assert not consensus.is_confident() and not consensus.done()  # one read is not enough
+    consensus.add("هص", "٩٧٤١", [0.9, 0.95], [0.95, 0.9, 0.9, 0.85])
+    letters, digits, confidence = consensus.result()
+    assert (letters, digits) == ("هص", "٩٧٤١") and confidence == pytest.approx(0.875)
+    assert consensus.is_confident() and consensus.done()
+
+
+def test_plate_consensus_gives_up_after_max_reads():
+    consensus = PlateConsensus(min_reads=2, max_reads=3, threshold=0.8)
+    for digits in ("١٢٣", "٤٥٦", "٧٨٩"):
+        consensus.add("ا", digits, [0.9], [0.9] * 3)
+        assert consensus.done() == (len(consensus) == 3)
+    assert not consensus.is_confident()
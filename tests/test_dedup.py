@@ -0,0 +1,60 @@
+from dedup import DedupCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_repeat_within_window_is_absorbed():
+    clock = Clock()
+    cache = DedupCache(ttl=30.0, clock=clock)
+    assert not cache.seen("gate", "سعد", "١٢٣")
+    clock.now = 10.0
+    assert cache.seen("gate", "سعد", "١٢٣")
+    # Other cameras and other plates are independent
+    assert not cache.seen("exit", "سعد", "١٢٣")
+    assert not cache.seen("gate", "سعد", "١٢٤")
+
+
+def test_window_slides_and_expires():
+    clock = Clock()
+    cache = DedupCache(ttl=30.0, clock=clock)
+    cache.seen("gate", "سعد", "١٢٣")
+    clock.now = 25.0
+    assert cache.seen("gate", "سعد", "١٢٣")
+    clock.now = 50.0  # 25 s after the last read
+    assert cache.seen("gate", "سعد", "١٢٣")
+    clock.now = 81.0
+    assert not cache.seen("gate", "سعد", "١٢٣")
+
+
+def test_forget_lets_the_next_read_through():
+    cache = DedupCache(ttl=30.0, clock=Clock())
+    cache.seen("gate", "سعد", "١٢٣")
+    cache.forget("gate", "سعد", "١٢٣")
+    assert not cache.seen("gate", "سعد", "١٢٣")
+
+
+def test_lru_bound_and_disabled():
+    cache = DedupCache(ttl=30.0, max_entries=2, clock=Clock())
+    for digits in ("١", "٥", "٩"):
+        cache.seen("gate", "سعد", digits)
+    assert len(cache) == 2 and cache.evicted == 1
+    assert not cache.seen("gate", "سعد", "١")
+    off = DedupCache(ttl=0)
+    assert not off.seen("gate", "سعد", "١") and not off.seen("gate", "سعد", "١")
+
+
+def test_confusable_plates_are_different_cars():
+    cache = DedupCache(ttl=30.0, clock=Clock())
+    assert DedupCache.key("c", "بنت", "١٢٣") != DedupCache.key("c", "ينث", "١٢٣")
+    assert not cache.seen("gate", "بنت", "١٢٣")
+    assert not cache.seen("gate", "ينث", "١٢٣")
+    assert not cache.seen("gate", "بنت", "١٣٣")
+    # Cleaning still applies: spaces and diacritics are the same plate
+    assert cache.seen("gate", "بَ ن ت", "١٢٣")
+    assert cache.hits == 1
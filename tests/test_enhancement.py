@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+
+from enhancement import EnhancementEngine
+
+
+def plate(text):
+    img = np.full((80, 240, 3), 200, np.uint8)
+    cv2.putText(img, text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (20, 20, 20), 4)
+    return img
+
+
+def noisy(img, seed):
+    noise = np.random.default_rng(seed).normal(0, 6, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def engine_and_calls():
+    calls = []
+
+    def super_resolve(crop):
+        calls.append(crop)
+        return crop.copy()
+
+    return EnhancementEngine(super_resolve, ocr_fn=lambda crop: None, budget_ms=None), calls
+
+
+def test_near_identical_crops_of_a_track_reuse_super_resolution():
+    engine, calls = engine_and_calls()
+    reuse = []
+    first, _, _ = engine.recognize(noisy(plate("ABC 1234"), 1), reuse)
+    # The next frame: same plate, different sensor noise
+    second, _, _ = engine.recognize(noisy(plate("ABC 1234"), 2), reuse)
+    assert len(calls) == 1 and engine.stats["cache_hits"] == 1
+    assert second is first
+
+
+def test_different_crops_are_super_resolved_again():
+    engine, calls = engine_and_calls()
+    reuse = []
+    engine.recognize(plate("ABC 1234"), reuse)
+    engine.recognize(plate("ABC 1734"), reuse)          # another character
+    engine.recognize(plate("ABC 1234")[:, 1:], reuse)   # a box one pixel narrower
+    assert len(calls) == 3 and engine.stats["cache_hits"] == 0
+
+
+def test_nothing_is_reused_across_tracks():
+    engine, calls = engine_and_calls()
+    # One confusable character apart: less than camera noise in a thumbnail
+    engine.recognize(plate("ABC 1234"), [])
+    engine.recognize(plate("ABG 1234"), [])
+    engine.recognize(plate("ABG 1234"))
+    engine.recognize(plate("ABG 1234"))
+    assert len(calls) == 4 and engine.stats["cache_hits"] == 0
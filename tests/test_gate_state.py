@@ -0,0 +1,124 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from gate_state import LOGIN, LOGOUT, SQL_LOGIN, SQL_LOGOUT, GateState, to_timestamp
+from persistence import BatchWriter, Database
+
+
+class Writer:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, sql, params):
+        self.rows.append((sql, params))
+
+
+@pytest.fixture
+def db():
+    db = Database.sqlite()
+    db.execute("CREATE TABLE vehicles (vehicle_id INTEGER PRIMARY KEY, plate_id INT)")
+    db.execute("CREATE TABLE vehicle_logs (log_id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_id INT, "
+               "check_in TEXT, check_out TEXT, status TEXT)")
+    return db
+
+
+def gate(db, **kwargs):
+    kwargs.setdefault("debounce", 10)
+    kwargs.setdefault("min_dwell", 60)
+    return GateState(db, Writer(), **kwargs)
+
+
+def test_in_then_out(db):
+    state = gate(db)
+    assert state.read(1, now=1000.0) == LOGIN and state.is_inside(1)
+    assert state.read(1, now=1100.0) == LOGOUT and not state.is_inside(1)
+    assert [sql for sql, _ in state.writer.rows] == [SQL_LOGIN, SQL_LOGOUT]
+    stamp = datetime.fromtimestamp(1100.0).strftime('%Y-%m-%d %H:%M:%S')
+    assert state.writer.rows[1][1] == (stamp, 1)
+
+
+def test_reads_at_the_barrier_are_debounced(db):
+    state = gate(db)
+    assert state.read(1, now=1000.0) == LOGIN
+    # Each read restarts the window, so a car standing at the gate never flips
+    for now in (1005.0, 1012.0, 1019.0):
+        assert state.read(1, now=now) is None
+    assert state.stats["debounced"] == 3
+    assert state.read(1, now=1100.0) == LOGOUT
+
+
+def test_no_logout_before_min_dwell(db):
+    state = gate(db, debounce=0)
+    assert state.read(1, now=1000.0) == LOGIN
+    assert state.read(1, now=1030.0) is None and state.is_inside(1)
+    assert state.stats["dwell"] == 1
+    assert state.read(1, now=1060.0) == LOGOUT
+
+
+def test_vehicles_are_independent(db):
+    state = gate(db)
+    assert state.read(1, now=1000.0) == LOGIN
+    assert state.read(2, now=1001.0) == LOGIN
+    assert state.read(1, now=1100.0) == LOGOUT
+    assert not state.is_inside(1) and state.is_inside(2)
+
+
+def test_loads_the_newest_log_of_each_vehicle(db):
+    db.execute("INSERT INTO vehicles (vehicle_id, plate_id) VALUES (1, 10), (2, 20), (3, 30)")
+    rows = [(1, "2025-01-01 08:00:00", "logout"), (1, "2025-01-02 08:00:00", "login"),
+            (2, "2025-01-01 09:00:00", "login"), (2, "2025-01-01 09:00:00", "logout"),
+            (3, None, "login")]
+    for row in rows:
+        db.execute("INSERT INTO vehicle_logs (vehicle_id, check_in, status) VALUES (%s, %s, %s)", row)
+    state = gate(db)
+    assert state.vehicle_id(10) == 1 and state.vehicle_id(40) is None
+    assert state.is_inside(1) and not state.is_inside(2) and state.is_inside(3)
+    now = to_timestamp("2025-01-02 08:00:30")
+    assert state.read(1, now=now) is None  # logged in 30 s ago
+    assert state.read(3, now=now) == LOGOUT  # no check-in time counts as old
+    state.add_vehicle(40, 4)
+    assert state.vehicle_id(40) == 4
+
+
+def test_concurrent_reads_log_in_once(db):
+    state = gate(db)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(state.read(1, now=1000.0)))
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(LOGIN) == 1 and results.count(None) == 15
+    assert len(state.writer.rows) == 1
+
+
+def test_to_timestamp():
+    value = datetime(2025, 4, 18, 14, 6, 24)
+    assert to_timestamp(value) == value.timestamp()
+    assert to_timestamp("2025-04-18 14:06:24.123") == value.timestamp()
+    assert to_timestamp(None) is None
+
+
+def test_gate_state_writes_behind_in_order(db):
+    db.execute("INSERT INTO vehicles (plate_id) VALUES (7)")
+    writer = BatchWriter(db, max_batch=50, max_delay=5.0)
+    now = [1_000_000.0]
+    state = GateState(db, writer, debounce=10, min_dwell=60, clock=lambda: now[0])
+    try:
+        # In, out and in again, all queued in one batch
+        assert state.read(1) == LOGIN
+        now[0] += 120
+        assert state.read(1) == LOGOUT
+        now[0] += 120
+        assert state.read(1) == LOGIN
+        writer.flush()
+        rows = db.fetchall("SELECT status, check_out IS NOT NULL FROM vehicle_logs ORDER BY log_id")
+        assert rows == [("logout", 1), ("login", 0)]
+        # A restart rebuilds the same state from the table
+        restarted = GateState(db, writer)
+        assert restarted.vehicle_id(7) == 1 and restarted.is_inside(1)
+    finally:
+        writer.close()
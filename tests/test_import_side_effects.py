@@ -0,0 +1,31 @@
+"""Worker processes import main1 only to run models; that must not connect
+to the database or start writer threads."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("PIL")  # main1 imports it at module level
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import threading
+import main1
+assert main1.db._pool is None, "database pool opened"
+assert main1._evidence is None and main1._db_writer is None and main1._gate is None
+assert not main1.plate_index.loaded
+extra = [t.name for t in threading.enumerate() if t is not threading.main_thread()]
+assert not extra, extra
+"""
+
+
+def test_importing_main1_opens_nothing(tmp_path):
+    path = tmp_path / "anpr.db"
+    env = dict(os.environ, ANPR_DB_URL=f"sqlite:///{path}")
+    result = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert not path.exists()
+    assert not (tmp_path / "images").exists()
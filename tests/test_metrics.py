@@ -0,0 +1,32 @@
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest
+
+import metrics
+
+
+def test_scrape_function_reads_values_at_scrape_time():
+    registry = CollectorRegistry()
+    depth = metrics.ScrapeFunction("test_queue_depth", "Items waiting", "queue", registry=registry)
+    assert "test_queue_depth{" not in generate_latest(registry).decode()
+    queues = {"ocr": 2}
+    depth.set_function(lambda: dict(queues))
+    queues["evidence"] = 5
+    text = generate_latest(registry).decode()
+    assert 'test_queue_depth{queue="ocr"} 2.0' in text
+    assert 'test_queue_depth{queue="evidence"} 5.0' in text
+
+
+def test_scrape_function_counter_and_failing_function():
+    registry = CollectorRegistry()
+    tiers = metrics.ScrapeFunction("test_tiers", "Calls by tier", "tier", kind="counter", registry=registry)
+    tiers.set_function(lambda: {"cheap": 3})
+    assert 'test_tiers_total{tier="cheap"} 3.0' in generate_latest(registry).decode()
+    tiers.set_function(lambda: 1 / 0)
+    assert "test_tiers_total{" not in generate_latest(registry).decode()
+
+
+def test_span_observes_the_stage():
+    count = lambda: REGISTRY.get_sample_value("anpr_stage_seconds_count", {"stage": "test"}) or 0
+    before = count()
+    with metrics.span("test"):
+        pass
+    assert count() == before + 1
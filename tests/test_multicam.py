@@ -0,0 +1,42 @@
+"""MultiCameraServer.stop must not return while tracks are still being OCR'd."""
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")  # realtime imports it at module level
+
+import realtime
+from multicam import MultiCameraServer
+from tracker import Track
+
+FRAME = np.zeros((48, 64, 3), np.uint8)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    def recognize_track(track):
+        time.sleep(0.1)
+        return "سعد", str(track.track_id), FRAME, FRAME
+    monkeypatch.setattr(realtime, "recognize_track", recognize_track)
+    results = []
+    # No such file: the reader finishes at once and the detector just flushes
+    server = MultiCameraServer([("lane1", "missing.mp4")], persist=False, on_result=results.append)
+    server.results = results
+    for i in range(10):
+        server.ocr_queue.put(("lane1", Track(i, (0, 0, 10, 10), 0)))
+    return server
+
+
+def test_stop_waits_for_every_queued_track(server):
+    server.start().stop()
+    assert not server.is_alive()
+    assert sorted(int(r["digits"]) for r in server.results) == list(range(10))
+
+
+def test_stop_with_deadline_drops_the_rest(server):
+    server.start()
+    server.stop(drain_timeout=0.1)
+    assert not server.is_alive()
+    assert 0 < len(server.results) < 10
+    assert len(server.results) + server.ocr_queue.dropped == 10
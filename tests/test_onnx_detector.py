@@ -0,0 +1,96 @@
+"""Box decoding of OnnxDetector, without onnxruntime: the session is faked."""
+import numpy as np
+
+from onnx_detector import OnnxDetector, letterbox, nms
+
+
+def detector(conf=0.25, iou=0.7, max_det=300, session=None):
+    model = OnnxDetector.__new__(OnnxDetector)
+    model.names = {0: "plate", 1: "car"}
+    model.conf, model.iou, model.max_det = conf, iou, max_det
+    model.session, model.input_name = session, "images"
+    model.batched, model.fixed_size, model.imgsz = True, True, 640
+    return model
+
+
+def anchors(*rows):
+    """(4 + classes, anchors) model output from (cx, cy, w, h, score0, score1) rows."""
+    return np.array(rows, dtype=np.float32).T
+
+
+def test_letterbox_geometry():
+    image = np.zeros((200, 400, 3), np.uint8)
+    image[:, :, 2] = 255  # red in BGR
+    tensor, gain, pad = letterbox(image, 640)
+    # 400 wide -> 640, so gain 1.6 and 200 high -> 320, centred vertically
+    assert tensor.shape == (3, 640, 640) and tensor.dtype == np.float32
+    assert gain == 1.6 and pad == (0, 160)
+    assert np.allclose(tensor[:, 160:480, :], [[[1.0]], [[0.0]], [[0.0]]])  # RGB order
+    assert np.allclose(tensor[:, :160, :], 114 / 255.0)
+    assert np.allclose(tensor[:, 480:, :], 114 / 255.0)
+
+
+def test_nms_keeps_best_of_overlaps():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30], [0, 0, 10, 5]], np.float32)
+    scores = np.array([0.8, 0.9, 0.5, 0.7], np.float32)
+    # box 1 vs 0: IoU 81/119 = 0.68; box 1 vs 3: 36/114 = 0.32; box 0 vs 3: 0.5
+    assert nms(boxes, scores, 0.6).tolist() == [1, 3, 2]
+    assert nms(boxes, scores, 0.3).tolist() == [1, 2]
+    assert nms(boxes, scores, 0.7).tolist() == [1, 0, 3, 2]
+
+
+def test_postprocess_undoes_letterbox():
+    # 200x400 image at 640: gain 1.6, pad (0, 160). Plate at (100, 50)-(200, 100)
+    # in the image is centred at (240, 280) and 160x80 in the letterboxed input
+    output = anchors((240, 280, 160, 80, 0.9, 0.1),
+                     (242, 281, 160, 80, 0.6, 0.0),   # duplicate of the first
+                     (240, 280, 160, 80, 0.0, 0.5),   # same place, other class: kept
+                     (600, 300, 200, 100, 0.1, 0.2))  # below conf
+    results = detector()._postprocess(output, 1.6, (0, 160), (200, 400), 640)
+    boxes = results.boxes
+    assert boxes.cls.tolist() == [0.0, 1.0]
+    assert np.allclose(boxes.conf, [0.9, 0.5])
+    assert np.allclose(boxes.xyxy, [[100, 50, 200, 100], [100, 50, 200, 100]])
+    assert results.orig_shape == (200, 400) and results.names[0] == "plate"
+    assert [len(box.cls) for box in boxes] == [1, 1]
+
+
+def test_postprocess_clips_to_image_and_caps_detections():
+    output = anchors((20, 170, 80, 40, 0.9, 0.0),     # spills past the left/top edge
+                     (400, 300, 40, 40, 0.8, 0.0))
+    boxes = detector(max_det=1)._postprocess(output, 1.6, (0, 160), (200, 400), 640).boxes
+    assert len(boxes) == 1
+    # (-20, 150)-(60, 190) -> (-12.5, -6.25)-(37.5, 18.75) -> clipped at 0
+    assert np.allclose(boxes.xyxy, [[0, 0, 37.5, 18.75]])
+
+
+def test_conf_can_be_set_per_call():
+    output = anchors((240, 280, 160, 80, 0.3, 0.0), (400, 300, 40, 40, 0.6, 0.0))
+    model = detector()
+    assert len(model._postprocess(output, 1.6, (0, 160), (200, 400), 640).boxes) == 2
+    assert len(model._postprocess(output, 1.6, (0, 160), (200, 400), 640, conf=0.5).boxes) == 1
+
+
+def test_postprocess_with_nothing_above_conf():
+    boxes = detector()._postprocess(anchors((240, 280, 160, 80, 0.1, 0.1)), 1.6, (0, 160),
+                                    (200, 400), 640).boxes
+    assert len(boxes) == 0 and boxes.xyxy.shape == (0, 4)
+
+
+class Session:
+    def __init__(self, output):
+        self.output = output
+        self.inputs = []
+
+    def run(self, names, feed):
+        self.inputs.append(feed["images"])
+        return [np.stack([self.output] * len(feed["images"]))]
+
+
+def test_call_decodes_every_image():
+    session = Session(anchors((240, 280, 160, 80, 0.9, 0.1)))
+    model = detector(session=session)
+    results = model([np.zeros((200, 400, 3), np.uint8), np.zeros((200, 400, 3), np.uint8)])
+    assert session.inputs[0].shape == (2, 3, 640, 640)
+    assert [r.boxes.xyxy.tolist() for r in results] == [[[100, 50, 200, 100]]] * 2
+    assert model([]) == []
@@ -0,0 +1,88 @@
+"""A read whose database write fails must not stay in the dedup window."""
+import sqlite3
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")  # main1/realtime import it at module level
+
+import main1
+import realtime
+from dedup import DedupCache
+from persistence import Database
+from plate_index import PlateIndex
+
+FRAME = np.zeros((48, 64, 3), np.uint8)
+
+
+class Evidence:
+    def save(self, frame, plate_img=None):
+        return "images/test.jpg"
+
+
+def fail(*args, **kwargs):
+    raise sqlite3.OperationalError("database is locked")
+
+
+@pytest.fixture
+def rt(monkeypatch):
+    db = Database.sqlite()
+    db.execute("CREATE TABLE plates (id INTEGER PRIMARY KEY, letters TEXT, numbers TEXT)")
+    db.execute("CREATE TABLE vehicles (id INTEGER PRIMARY KEY, plate_id INT, image_path TEXT, "
+               "detected_at TEXT)")
+    monkeypatch.setattr(realtime, "db", db)
+    monkeypatch.setattr(realtime, "plate_index", PlateIndex(db, table="plates", id_column="id"))
+    monkeypatch.setattr(realtime, "dedup", DedupCache(ttl=30.0))
+    monkeypatch.setattr(realtime, "evidence", Evidence())
+    monkeypatch.setattr(realtime, "_db_writer", None)
+    yield realtime
+    if realtime._db_writer is not None:
+        realtime._db_writer.close()
+
+
+@pytest.fixture
+def m1(monkeypatch):
+    db = Database.sqlite()
+    db.execute("CREATE TABLE plates (plate_id INTEGER PRIMARY KEY, letters TEXT, numbers TEXT)")
+    db.execute("CREATE TABLE vehicles (vehicle_id INTEGER PRIMARY KEY, plate_id INT, "
+               "vehicle_image TEXT, created_at TEXT)")
+    db.execute("CREATE TABLE vehicle_logs (log_id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_id INT, "
+               "check_in TEXT, check_out TEXT, status TEXT)")
+    db.execute("INSERT INTO plates (letters, numbers) VALUES (%s, %s)", ("سعد", "١٢٣"))
+    monkeypatch.setattr(main1, "db", db)
+    monkeypatch.setattr(main1, "plate_index", PlateIndex(db, table="plates", id_column="plate_id"))
+    monkeypatch.setattr(main1, "dedup", DedupCache(ttl=30.0))
+    monkeypatch.setattr(main1, "_evidence", Evidence())
+    monkeypatch.setattr(main1, "_db_writer", None)
+    monkeypatch.setattr(main1, "_gate", None)
+    yield main1
+    if main1._db_writer is not None:
+        main1._db_writer.close()
+
+
+def test_realtime_failed_insert_is_retried(rt, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(rt.db, "execute", fail)
+        assert rt.persist_plate("سعد", "١٢٣", FRAME) is False
+    # Not absorbed as a repeat: the next read registers the plate
+    assert rt.persist_plate("سعد", "١٢٣", FRAME) is True
+    assert rt.plate_index.lookup("سعد", "١٢٣") is not None
+    assert rt.dedup.hits == 0
+    # Now that it is persisted, a repeat is absorbed
+    assert rt.persist_plate("سعد", "١٢٣", FRAME) is True
+    assert rt.dedup.hits == 1
+
+
+def test_main1_failed_vehicle_insert_is_retried(m1, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(m1.db, "transaction", fail)
+        assert m1.save_plate_and_vehicle("سعد", "١٢٣", FRAME) is False
+    assert m1.dedup.hits == 0
+    assert m1.save_plate_and_vehicle("سعد", "١٢٣", FRAME) is True
+    m1.db_writer().flush()
+    assert m1.db.fetchall("SELECT vehicle_id, status FROM vehicle_logs") == [(1, "login")]
+
+
+def test_main1_unknown_plate_is_denied(m1):
+    assert m1.save_plate_and_vehicle("شعد", "١٢٣", FRAME) is True
+    assert m1.db.fetchall("SELECT * FROM vehicles") == []
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+
+import pytest
+
+from persistence import BatchWriter, Database, is_permanent
+
+SQL_LOG = "INSERT INTO logs (vehicle_id, status) VALUES (%s, %s)"
+
+
+@pytest.fixture
+def db():
+    db = Database.sqlite()
+    db.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_id INT NOT NULL, status TEXT)")
+    return db
+
+
+@pytest.fixture
+def writer(db):
+    writer = BatchWriter(db, max_batch=50, max_delay=0.05, backoff=0.01)
+    yield writer
+    writer.close()
+
+
+def test_pooled_connections_share_the_memory_database(db):
+    results = []
+
+    def insert(i):
+        results.append(db.execute(SQL_LOG, (i, "login")))
+
+    threads = [threading.Thread(target=insert, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == list(range(1, 9))
+    assert db.fetchone("SELECT COUNT(*) FROM logs") == (8,)
+
+
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as cursor:
+            cursor.execute(SQL_LOG, (1, "login"))
+            raise RuntimeError("boom")
+    assert db.fetchall("SELECT * FROM logs") == []
+
+
+def test_batch_writer_keeps_order(db, writer):
+    # Grouped per statement instead of per run, every row would end up "logout"
+    for vehicle_id in range(20):
+        writer.write(SQL_LOG, (vehicle_id, "login"))
+        writer.write("UPDATE logs SET status = 'logout' WHERE vehicle_id = %s", (vehicle_id,))
+        writer.write(SQL_LOG, (vehicle_id, "login"))
+    writer.flush()
+    assert writer.written == 60 and writer.failed == 0
+    rows = db.fetchall("SELECT vehicle_id, status FROM logs ORDER BY id")
+    assert rows == [(v, status) for v in range(20) for status in ("logout", "login")]
+
+
+def test_batch_writer_retries_a_transient_failure(db, writer, monkeypatch):
+    real = db.transaction
+    failures = [sqlite3.OperationalError("database is locked")] * 2
+
+    def flaky(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(db, "transaction", flaky)
+    for i in range(10):
+        writer.write(SQL_LOG, (i, "login"))
+    writer.flush()
+    assert not failures
+    assert writer.written == 10 and writer.failed == 0
+    assert db.fetchone("SELECT COUNT(*) FROM logs") == (10,)
+
+
+def test_batch_writer_drops_only_the_bad_row(db, writer):
+    for i in range(5):
+        writer.write(SQL_LOG, (None if i == 2 else i, "login"))
+    writer.flush()
+    assert writer.written == 4 and writer.failed == 1
+    assert [r[0] for r in db.fetchall("SELECT vehicle_id FROM logs ORDER BY id")] == [0, 1, 3, 4]
+
+
+def test_is_permanent():
+    assert is_permanent(sqlite3.IntegrityError("NOT NULL"))
+    assert not is_permanent(sqlite3.OperationalError("database is locked"))
+
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import BLOCK, DROP_OLDEST, STOP, BoundedQueue, Pipeline
+
+
+def test_drop_oldest_keeps_the_newest():
+    queue = BoundedQueue(2, DROP_OLDEST)
+    for i in range(5):
+        assert queue.put(i)
+    assert queue.dropped == 3
+    assert [queue.get(0), queue.get(0), queue.get(0)] == [3, 4, None]
+
+
+def test_block_waits_for_room():
+    queue = BoundedQueue(1, BLOCK)
+    queue.put(1)
+    assert queue.put(2, timeout=0.05) is False and queue.dropped == 1
+    threading.Timer(0.05, queue.get).start()
+    assert queue.put(3, timeout=2.0)
+    assert queue.get(0) == 3
+
+
+def test_stop_is_accepted_by_a_full_queue():
+    queue = BoundedQueue(1, BLOCK)
+    queue.put(1)
+    assert queue.put(STOP, timeout=0)
+    assert queue.get(0) == 1 and queue.get(0) is STOP
+
+
+def test_clear_counts_dropped_items():
+    queue = BoundedQueue(4, BLOCK)
+    for item in (1, 2, STOP):
+        queue.put(item)
+    assert queue.clear() == 2
+    assert queue.dropped == 2 and queue.qsize() == 0
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedQueue(1, "newest")
+
+
+def source(count):
+    items = iter(range(count))
+    return lambda: next(items, None)
+
+
+def slow(delay):
+    def step(item):
+        time.sleep(delay)
+        return item
+    return step
+
+
+def test_stop_drains_every_stage():
+    written = []
+    pipeline = (Pipeline()
+                .add_source("source", source(20))
+                .add_stage("slow", slow(0.01), 32, BLOCK, on_stop=lambda: "flushed")
+                .add_stage("sink", lambda item: written.append(item), 32, BLOCK)
+                .start())
+    pipeline.stop()
+    assert not pipeline.is_alive()
+    assert written == list(range(20)) + ["flushed"]
+
+
+def test_stop_with_deadline_drops_what_is_left():
+    written = []
+    stopped = []
+    pipeline = (Pipeline()
+                .add_source("source", source(30))
+                .add_stage("slow", slow(0.05), 32, BLOCK, on_stop=lambda: stopped.append(True))
+                .add_stage("sink", lambda item: written.append(item), 32, BLOCK)
+                .start())
+    time.sleep(0.02)
+    pipeline.stop(drain_timeout=0.1)
+    assert not pipeline.is_alive()
+    assert stopped == [True]
+    # What was done is in order; the rest was dropped, not lost in flight
+    assert written == list(range(len(written))) and len(written) < 30
+    assert sum(stage["dropped"] for stage in pipeline.stats()) == 30 - len(written)
+
+
+def test_stage_errors_are_counted_and_skipped():
+    written = []
+
+    def fail_on_odd(item):
+        if item % 2:
+            raise RuntimeError("odd")
+        return item
+    pipeline = (Pipeline()
+                .add_source("source", source(6))
+                .add_stage("check", fail_on_odd, 8, BLOCK)
+                .add_stage("sink", lambda item: written.append(item), 8, BLOCK)
+                .start())
+    pipeline.stop()
+    assert written == [0, 2, 4]
+    assert pipeline.stats()[1]["errors"] == 3
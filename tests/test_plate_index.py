@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from persistence import Database
+from plate_index import PlateIndex, confusable_swap, within_one_edit
+
+
+@pytest.fixture
+def index():
+    db = Database.sqlite()
+    db.execute("CREATE TABLE plates (id INTEGER PRIMARY KEY, letters TEXT, numbers TEXT)")
+    for letters, numbers in [("ببب", "٢٧٤٥"), ("سعد", "١٢٣"), ("طلع", "٤٥٦")]:
+        db.execute("INSERT INTO plates (letters, numbers) VALUES (%s, %s)", (letters, numbers))
+    return PlateIndex(db, table="plates", id_column="id")
+
+
+def test_exact_lookup(index):
+    assert index.lookup("ببب", "٢٧٤٥") == 1
+    assert index.match("سعد", "١٢٣") == 2
+    assert index.lookup("سعد", "١٢٤") is None
+
+
+def test_match_is_exact_by_default(index):
+    assert index.match("شعد", "١٢٣") is None
+    assert index.match("شعد", "١٢٣", fuzzy=True) == 2
+
+
+def test_confusable_swaps_use_up_the_one_edit(index):
+    # Every character is in a confusable group of the registered plate's,
+    # but that is seven edits, not zero
+    assert index.match("ثىن", "٣٨٦٩", fuzzy=True) is None
+    # A confusable swap plus any other edit is two edits
+    assert index.match("شعد", "١٢٤", fuzzy=True) is None
+    assert index.match("شغد", "١٢٣", fuzzy=True) is None
+
+
+def test_one_plain_edit(index):
+    assert index.match("سعد", "١٢", fuzzy=True) == 2     # deletion
+    assert index.match("سعد", "١٢٣٩", fuzzy=True) == 2   # insertion
+    assert index.match("سعد", "١٢٩", fuzzy=True) == 2    # substitution
+    assert index.match("سعد", "١٩٩", fuzzy=True) is None
+
+
+def test_western_digits_are_not_an_edit(index):
+    assert index.match("سعد", "123", fuzzy=True) == 2
+    assert index.match("سعد", "129", fuzzy=True) == 2
+    assert index.match("سعد", "199", fuzzy=True) is None
+
+
+def test_ambiguous_fuzzy_match_is_refused(index):
+    index.ensure_loaded()
+    index.add(10, "سعد", "١٢٥")
+    assert index.match("سعد", "١٢٩", fuzzy=True) is None
+    # A confusable swap outranks a plain substitution
+    index.add(11, "سعد", "١٣٩")
+    assert index.match("سعد", "١٢٩", fuzzy=True) == 11
+
+
+def test_remove_and_incremental_refresh(index):
+    index.ensure_loaded()
+    index.remove(2)
+    assert index.match("سعد", "١٢٣", fuzzy=True) is None
+    index.db.execute("INSERT INTO plates (letters, numbers) VALUES (%s, %s)", ("نور", "٧٧"))
+    index.refresh()
+    assert index.lookup("نور", "٧٧") == 4
+
+
+def test_helpers():
+    assert within_one_edit("abc", "abd") and within_one_edit("abc", "ab")
+    assert not within_one_edit("abc", "ade")
+    assert confusable_swap("سعد", "شعد")
+    assert not confusable_swap("سعد", "لعد")
+    assert not confusable_swap("سعد", "شغد")
+
+
+def test_lookups_during_a_reload_never_miss():
+    db = Database.sqlite()
+    db.execute("CREATE TABLE plates (id INTEGER PRIMARY KEY, letters TEXT, numbers TEXT)")
+    with db.transaction() as cursor:
+        for i in range(3000):
+            cursor.execute("INSERT INTO plates (letters, numbers) VALUES (%s, %s)", ("سعد", str(i)))
+    index = PlateIndex(db)
+    index.ensure_loaded()
+    misses, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            if index.lookup("سعد", "1500") is None:
+                misses.append(1)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(5):
+            index.load()
+    finally:
+        done.set()
+        reader.join()
+    assert not misses
+
+
+def test_reload_keeps_plates_added_meanwhile(index, monkeypatch):
+    index.ensure_loaded()
+    select = index._select
+
+    def select_then_register(incremental):
+        rows = select(incremental)
+        index.add(99, "جديد", "٩٩")  # registered while the reload was reading
+        return rows
+    monkeypatch.setattr(index, "_select", select_then_register)
+    index.load()
+    assert index.lookup("جديد", "٩٩") == 99 and index.last_id == 99
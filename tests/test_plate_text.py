@@ -0,0 +1,63 @@
+import random
+
+from plate_text import (PlateParser, PlateText, _reference_parse, clean_text, is_valid_plate,
+                        remove_diacritics, split_and_filter_letters, to_arabic_digits)
+
+HEADER = [None, ("مصر EGYPT", 0.97)]
+
+
+def line(text, score=0.9):
+    return [None, (text, score)]
+
+
+def test_clean_text():
+    assert clean_text("م ص ر EGYPT") == ""
+    assert clean_text("مِصر أ ب ١٢") == "اب١٢"
+    assert clean_text("Egypt أ", strip_diacritics=False) == "أ"
+    assert remove_diacritics("أبجد") == "ابجد" and remove_diacritics("abc") == "abc"
+
+
+def test_helpers():
+    assert split_and_filter_letters("مصلابج") == "ابج"
+    assert to_arabic_digits("2024") == "٢٠٢٤"
+    assert is_valid_plate("اب", "١٢٣٤") and not is_valid_plate("", "١٢") and not is_valid_plate("ا", "١٢٣٤٥")
+
+
+def test_parse_splits_letters_and_digits():
+    parser = PlateParser()
+    assert parser.parse([HEADER, line("أ ب ج ١٢٣٤")]) == ("جبا", "١٢٣٤")
+    assert parser.parse([HEADER, line("ب ج"), line("ABC ٥٦")]) == ("جب", "٥٦")
+    assert parser.parse([]) == ("", "")
+    assert parser.parse([[None, None], [None]]) == ("", "")
+
+
+def test_translations():
+    parser = PlateParser({"ه": "٥", "ى": "ي"})
+    assert parser.parse([line("ى د ه ١")]) == ("دي", "٥١")
+
+
+def test_matches_the_reference_loop():
+    rng = random.Random(3)
+    parser = PlateParser({"ه": "٥"})
+    letters = "أبجدرسصطعفقلمنهوىإآ"
+    for _ in range(300):
+        lines = [HEADER] + [line(" ".join(rng.choice(letters + "٠١٢٣٤٥٦٧٨٩AZ") for _ in range(rng.randint(1, 8))))
+                            for _ in range(rng.randint(0, 3))]
+        assert parser.parse(lines) == _reference_parse(lines, {"ه": "٥"})
+
+
+def test_parse_batch_matches_parse():
+    parser = PlateParser()
+    batch = [[HEADER, line("أ ب ج ١٢٣٤")], [], [line("١٢٣٤٥")], [line("\x1fب\x1f ١")]]
+    assert parser.parse_batch(batch) == [PlateText("جبا", "١٢٣٤", True), PlateText("", "", False),
+                                         PlateText("", "١٢٣٤٥", False), PlateText("ب", "١", True)]
+    assert [tuple(p[:2]) for p in parser.parse_batch(batch)] == [parser.parse(lines) for lines in batch]
+
+
+def test_parse_scored_keeps_each_characters_line_score():
+    parser = PlateParser()
+    scored = parser.parse_scored([HEADER, line("ب ج", 0.8), line("د ١٢", 0.6)])
+    assert (scored.letters, scored.digits) == ("دجب", "١٢")
+    assert scored.letter_scores == [0.6, 0.8, 0.8]
+    assert scored.digit_scores == [0.6, 0.6]
+    assert parser.parse_scored([HEADER]) is None
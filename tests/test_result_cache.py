@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import result_cache
+from result_cache import ResultCache, fingerprint
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+
+def test_round_trip_per_version(cache):
+    value = {"plates": [{"box": [1, 2, 3, 4], "ocr_lines": [["هص ٩٧٤١", 0.97]]}]}
+    cache.put("a", "v1", value)
+    assert cache.get("a", "v1") == value
+    assert cache.get("a", "v2") is None
+    assert cache.get("b", "v1") is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 2
+
+
+def test_get_many_counts_each_digest_once(cache):
+    cache.put_many({"a": 1, "b": 2}, "v")
+    assert cache.get_many(["a", "b", "a", "c"], "v") == {"a": 1, "b": 2}
+    assert cache.stats["hits"] == 2 and cache.stats["misses"] == 1
+
+
+def test_replacing_keeps_the_size_right(cache):
+    cache.put("a", "v", "x" * 1000)
+    size = cache.size
+    cache.put("a", "v", "x" * 1000)
+    assert cache.size == size
+    assert cache.size == cache._conn.execute("SELECT SUM(size) FROM results").fetchone()[0]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    rng = np.random.default_rng(0)
+    values = {key: rng.integers(0, 10**9, 200).tolist() for key in "abcd"}  # ~1 KB compressed each
+    cache = ResultCache(str(tmp_path / "cache.db"), max_bytes=10**9)
+    entry = None
+    for key in "abc":
+        cache.put(key, "v", values[key])
+        entry = entry or cache.size
+    cache.max_bytes = int(entry * 3.5)
+    cache.get("a", "v")  # a is now more recent than b
+    cache.put("d", "v", values["d"])
+    assert cache.stats["evicted"] >= 1
+    assert cache.get("b", "v") is None
+    assert cache.get("a", "v") == values["a"] and cache.get("d", "v") == values["d"]
+    assert cache.size <= cache.max_bytes
+    cache.close()
+
+
+def test_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(path)
+    cache.put("a", "v", [1, 2])
+    size = cache.size
+    cache.close()
+    cache = ResultCache(path)
+    assert cache.get("a", "v") == [1, 2] and cache.size == size
+    cache.close()
+
+
+def test_fingerprint_and_version():
+    image = np.zeros((4, 6, 3), np.uint8)
+    assert fingerprint(image) == fingerprint(image.copy())
+    assert fingerprint(image) != fingerprint(image.reshape(6, 4, 3))
+    changed = image.copy()
+    changed[0, 0, 0] = 1
+    assert fingerprint(image) != fingerprint(changed)
+    assert result_cache.version("a", 1) == result_cache.version("a", 1)
+    assert result_cache.version("a", 1) != result_cache.version("a", 2)
+    assert result_cache.file_signature("no/such/weights.pt") == "weights.pt:missing"
+    assert result_cache.package_version("no-such-package-anpr") == "no-such-package-anpr:missing"
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from service import BadImage, RecognitionService, ServiceBusy
+
+
+def encoded(value, width=32):
+    ok, data = cv2.imencode(".png", np.full((16, width, 3), value, np.uint8))
+    assert ok
+    return data.tobytes()
+
+
+class FakeRecognizer:
+    """recognize_batch stand-in: one result per image (its width), and
+    records the size of every batch it was given."""
+
+    def __init__(self, gate=None, fail=None, drop=0):
+        self.batches = []
+        self.gate = gate
+        self.fail = fail
+        self.drop = drop
+
+    def __call__(self, images):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append([image.shape[1] for image in images])
+        if self.fail is not None:
+            raise self.fail
+        return [image.shape[1] for image in images][self.drop:]
+
+
+def run(service, body):
+    async def main():
+        await service.start()
+        try:
+            return await body(service)
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_a_batch():
+    recognizer = FakeRecognizer()
+    service = RecognitionService(recognizer, max_batch=4, max_wait=0.2)
+
+    async def body(service):
+        return await asyncio.gather(*(service.recognize(encoded(0, 10 + i)) for i in range(6)))
+
+    results = run(service, body)
+    assert [r["plates"] for r in results] == [10, 11, 12, 13, 14, 15]
+    assert [len(b) for b in recognizer.batches] == [4, 2]
+    assert service.stats["batches"] == 2 and service.stats["images"] == 6
+
+
+def test_full_queue_refuses_new_requests():
+    gate = threading.Event()
+    service = RecognitionService(FakeRecognizer(gate), max_batch=1, max_wait=0, max_pending=2)
+
+    async def body(service):
+        first = asyncio.ensure_future(service.recognize(encoded(0)))
+        await asyncio.sleep(0.1)  # the batcher took it and is blocked on the gate
+        waiting = [asyncio.ensure_future(service.recognize(encoded(0))) for _ in range(2)]
+        await asyncio.sleep(0.1)
+        with pytest.raises(ServiceBusy):
+            await service.recognize(encoded(0))
+        gate.set()
+        return await asyncio.gather(first, *waiting)
+
+    assert len(run(service, body)) == 3
+    assert service.stats["busy"] == 1
+
+
+def test_timed_out_requests_are_skipped():
+    gate = threading.Event()
+    recognizer = FakeRecognizer(gate)
+    service = RecognitionService(recognizer, max_batch=1, max_wait=0)
+
+    async def body(service):
+        first = asyncio.ensure_future(service.recognize(encoded(0, 10)))
+        await asyncio.sleep(0.1)
+        with pytest.raises(asyncio.TimeoutError):
+            await service.recognize(encoded(0, 20), timeout=0.05)
+        gate.set()
+        await first
+        return await service.recognize(encoded(0, 30))
+
+    assert run(service, body)["plates"] == 30
+    # The timed-out image never reached the recognizer
+    assert recognizer.batches == [[10], [30]]
+    assert service.stats["timeouts"] == 1
+
+
+def test_batch_errors_reach_every_waiter():
+    service = RecognitionService(FakeRecognizer(fail=RuntimeError("model crashed")),
+                                 max_batch=4, max_wait=0.2)
+
+    async def body(service):
+        return await asyncio.gather(*(service.recognize(encoded(0)) for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = run(service, body)
+    assert [str(e) for e in errors] == ["model crashed"] * 3
+    assert service.stats["errors"] == 1
+
+
+def test_short_results_fail_the_whole_batch():
+    service = RecognitionService(FakeRecognizer(drop=1), max_batch=4, max_wait=0.2)
+
+    async def body(service):
+        return await asyncio.gather(*(service.recognize(encoded(0)) for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = run(service, body)
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert "2 result(s) for 3 image(s)" in str(errors[0])
+
+
+def test_undecodable_upload():
+    service = RecognitionService(FakeRecognizer())
+
+    async def body(service):
+        with pytest.raises(BadImage):
+            await service.recognize(b"not an image")
+
+    run(service, body)
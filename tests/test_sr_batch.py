@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from sr_batch import SCALE, BatchUpsampler, auto_tile, pad_crop, plan_batches, pre_pad_shape
+
+
+def test_plan_batches_groups_by_padded_size():
+    shapes = [(30, 90), (100, 300), (25, 85), (32, 96)]
+    assert plan_batches(shapes, max_pixels=10**6) == [((32, 96), [0, 2, 3], None),
+                                                     ((112, 304), [1], None)]
+
+
+def test_plan_batches_splits_by_batch_and_pixels():
+    shapes = [(32, 96)] * 5
+    assert [p[1] for p in plan_batches(shapes, 10**6, max_batch=2)] == [[0, 1], [2, 3], [4]]
+    assert [p[1] for p in plan_batches(shapes, 32 * 96 * 3)] == [[0, 1, 2], [3, 4]]
+
+
+def test_plan_batches_tiles_oversized_crops():
+    max_pixels = 64 * 64
+    assert plan_batches([(100, 300), (16, 16)], max_pixels) == [((16, 16), [1], None),
+                                                               ((112, 304), [0], auto_tile(max_pixels))]
+
+
+def test_pad_crop_reflects_then_fills():
+    crop = np.arange(12, dtype=np.uint8).reshape(3, 4, 1).repeat(3, axis=2)
+    assert pre_pad_shape(crop.shape, 2) == (5, 6)
+    padded = pad_crop(crop, 8, 8, pre_pad=2)
+    assert padded.shape == (8, 8, 3)
+    assert np.array_equal(padded[:3, :4], crop)
+    assert np.array_equal(padded[3, :4], crop[1]) and np.array_equal(padded[4, :4], crop[0])  # reflected
+    assert np.array_equal(padded[5:8, :6], np.broadcast_to(padded[4, :6], (3, 6, 3)))  # replicated
+    assert pre_pad_shape((5, 7), 0, 4) == (8, 8)
+
+
+def blur(image):
+    """3x3 mean with zeros outside the image, like a conv with padding=1."""
+    h, w = image.shape[:2]
+    padded = np.pad(image.astype(np.float32), ((1, 1), (1, 1), (0, 0)))
+    return sum(padded[dy:dy + h, dx:dx + w] for dy in range(3) for dx in range(3)) / 9.0
+
+
+def network(image):
+    """Stand-in for RRDBNet: 2 px receptive field, then 4x nearest."""
+    output = np.clip(blur(blur(image)), 0, 255).round().astype(np.uint8)
+    return output.repeat(SCALE, axis=0).repeat(SCALE, axis=1)
+
+
+def per_crop(crop, pre_pad):
+    """What RealESRGANer.enhance does for one crop (x4, so no mod pad)."""
+    padded = np.pad(crop, ((0, pre_pad), (0, pre_pad), (0, 0)), mode="reflect")
+    return network(padded)[:crop.shape[0] * SCALE, :crop.shape[1] * SCALE]
+
+
+class StubUpsampler(BatchUpsampler):
+    def _infer(self, batch):
+        return np.stack([network(image) for image in batch])
+
+
+def test_batched_output_matches_per_crop():
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 256, shape, dtype=np.uint8) for shape in [(30, 100, 3), (25, 90, 3), (32, 96, 3)]]
+    upsampler = StubUpsampler(SimpleNamespace(upsampler=SimpleNamespace(pre_pad=10, scale=SCALE, device=None)))
+    outputs = upsampler.enhance_batch(crops)
+    assert upsampler.stats["passes"] == 1
+    for crop, output in zip(crops, outputs):
+        assert np.array_equal(output, per_crop(crop, 10))
@@ -0,0 +1,102 @@
+import time
+
+import numpy as np
+import pytest
+
+from tracker import PlateTracker, centroid_distance, iou, quality_score
+
+FRAME = np.zeros((480, 640, 3), np.uint8)
+
+
+def test_iou_and_distance():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (5, 0, 15, 10)) == pytest.approx(50 / 150)
+    assert iou((0, 0, 10, 10), (10, 0, 20, 10)) == 0.0
+    assert centroid_distance((0, 0, 30, 40), (30, 40, 60, 80)) == pytest.approx(1.0)
+    assert quality_score(25, 50) == 1.0 and quality_score(500, 500) == 4.0
+
+
+def test_one_track_per_moving_plate():
+    tracker = PlateTracker(max_missed=2)
+    for step in range(5):
+        assert tracker.update([(100 + 10 * step, 200, 200 + 10 * step, 240)], FRAME) == []
+    assert len(tracker.tracks) == 1
+    track = tracker.active_tracks()[0]
+    assert track.hits == 5 and track.box == (140, 200, 240, 240)
+
+
+def test_fast_plate_is_kept_by_centroid_distance():
+    tracker = PlateTracker(iou_threshold=0.3, max_distance=0.75)
+    tracker.update([(100, 200, 200, 240)], FRAME)
+    # No overlap, but the centre moved less than 0.75 of the box diagonal
+    tracker.update([(170, 210, 270, 250)], FRAME)
+    assert len(tracker.tracks) == 1
+    # Too far: a new track
+    tracker.update([(500, 400, 600, 440)], FRAME)
+    assert len(tracker.tracks) == 2
+
+
+def test_two_plates_two_tracks():
+    tracker = PlateTracker()
+    for step in range(3):
+        tracker.update([(50 + 5 * step, 100, 150 + 5 * step, 140),
+                        (400 - 5 * step, 300, 500 - 5 * step, 340)], FRAME)
+    assert sorted(t.hits for t in tracker.active_tracks()) == [3, 3]
+
+
+def test_track_ends_after_max_missed():
+    tracker = PlateTracker(max_missed=2, min_hits=2)
+    tracker.update([(100, 200, 200, 240)], FRAME, timestamp=10.0)
+    tracker.update([(102, 200, 202, 240)], FRAME, timestamp=10.1)
+    assert tracker.update([], FRAME) == []
+    assert tracker.update([], FRAME) == []
+    ended = tracker.update([], FRAME)
+    assert [t.hits for t in ended] == [2]
+    assert ended[0].started_at == 10.0 and ended[0].last_seen == 10.1
+    assert tracker.tracks == {}
+
+
+def test_single_frame_detections_are_dropped():
+    tracker = PlateTracker(max_missed=0, min_hits=2)
+    tracker.update([(100, 200, 200, 240)], FRAME)
+    assert tracker.update([], FRAME) == []
+    assert tracker.tracks == {}
+
+
+def test_keeps_the_sharpest_crops():
+    frame = np.zeros((100, 100, 3), np.uint8)
+    scores = iter([(10, 10), (80, 300), (40, 40), (60, 150)])
+    tracker = PlateTracker(quality_fn=lambda crop: next(scores), max_crops=2)
+    for _ in range(4):
+        tracker.update([(10, 10, 60, 30)], frame)
+    track = tracker.flush()[0]
+    assert [round(score, 2) for score, _, _ in track.crops] == [3.6, 2.7]
+    assert track.crops[0][1].shape == (20, 50, 3)
+
+
+def test_reads_are_ranked_by_weakest_character():
+    tracker = PlateTracker(max_reads=2)
+    reads = [("ا", "١", [0.9], [0.5]), ("ب", "٢", [0.8], [0.8]), ("ج", "٣", [0.95], [0.7])]
+    for read in reads:
+        tracker.update([(10, 10, 60, 30)], FRAME, reads=[read])
+    track = tracker.flush()[0]
+    assert [r[0] for r in track.reads] == ["ب", "ج"]
+
+
+def test_flush_ends_everything():
+    tracker = PlateTracker(min_hits=1)
+    tracker.update([(10, 10, 60, 30), (300, 300, 350, 320)], FRAME)
+    assert len(tracker.flush()) == 2 and tracker.active_tracks() == []
+
+
+def test_end_time_comes_from_the_frame_timestamps():
+    tracker = PlateTracker(max_missed=1, min_hits=1)
+    tracker.update([(100, 200, 200, 240)], FRAME, timestamp=10.0)
+    tracker.update([(300, 300, 350, 320)], FRAME, timestamp=10.1)
+    ended = tracker.update([], FRAME, timestamp=10.2)
+    assert [t.ended_at for t in ended] == [10.2]
+    assert [t.ended_at for t in tracker.flush()] == [10.2]
+    # Without timestamps, tracks end at the wall-clock time
+    tracker.update([(10, 10, 60, 30)], FRAME)
+    before = time.time()
+    assert tracker.flush()[0].ended_at >= before
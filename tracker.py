@@ -0,0 +1,173 @@
+import itertools
+import time
+
+
+def iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes."""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def centroid_distance(a, b):
+    """Distance between box centres, relative to the diagonal of box ``a``."""
+    ax, ay = (a[0] + a[2]) / 2.0, (a[1] + a[3]) / 2.0
+    bx, by = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    diag = max(1.0, ((a[2] - a[0]) ** 2 + (a[3] - a[1]) ** 2) ** 0.5)
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 / diag
+
+
+def quality_score(contrast, sharpness):
+    """Rank crops with the same contrast/sharpness thresholds that decide
+    whether enhance_plate_image needs Real-ESRGAN (50 and 100)."""
+    return min(contrast / 50.0, 2.0) + min(sharpness / 100.0, 2.0)
+
+
+class Track:
+    """A single plate followed across frames."""
+
+    def __init__(self, track_id, box, frame_index, timestamp=None):
+        self.track_id = track_id
+        self.box = box
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.started_at = time.time() if timestamp is None else timestamp
+        self.last_seen = self.started_at
+        self.ended_at = None
+        self.hits = 1
+        self.missed = 0
+        # (score, crop, frame), kept sorted best-first
+        self.crops = []
+        # character-box reads (letters, digits, letter_scores, digit_scores),
+        # best-first by their weakest character
+        self.reads = []
+        self.result = None
+
+    def add_crop(self, score, crop, frame, max_crops):
+        self.crops.append((score, crop, frame))
+        self.crops.sort(key=lambda c: c[0], reverse=True)
+        del self.crops[max_crops:]
+
+    def add_read(self, read, max_reads):
+        self.reads.append(read)
+        self.reads.sort(key=lambda r: min(r[2] + r[3], default=0.0), reverse=True)
+        del self.reads[max_reads:]
+
+    def __repr__(self):
+        return f"Track(id={self.track_id}, hits={self.hits}, box={self.box})"
+
+
+class PlateTracker:
+    """Greedy IoU tracker with a centroid-distance fallback for fast plates.
+
+    Call ``update`` once per frame with the plate boxes YOLO found. Each
+    track keeps only its ``max_crops`` sharpest crops, so OCR can run once
+    per vehicle when the track ends instead of on every frame.
+    """
+
+    def __init__(self, quality_fn=None, iou_threshold=0.3, max_distance=0.75,
+                 max_missed=10, max_crops=3, min_hits=2, max_reads=10):
+        self.quality_fn = quality_fn
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.max_crops = max_crops
+        self.min_hits = min_hits
+        self.max_reads = max_reads
+        self.tracks = {}
+        self.frame_index = 0
+        self._ids = itertools.count(1)
+        self._last_timestamp = None  # the latest ``timestamp`` given to update
+
+    def _match(self, boxes):
+        pairs = []
+        for track_id, track in self.tracks.items():
+            for i, box in enumerate(boxes):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((1.0 + overlap, track_id, i))
+                else:
+                    dist = centroid_distance(track.box, box)
+                    if dist <= self.max_distance:
+                        pairs.append((1.0 - dist, track_id, i))
+        pairs.sort(reverse=True)
+
+        matches = {}
+        used = set()
+        for _, track_id, i in pairs:
+            if track_id in matches or i in used:
+                continue
+            matches[track_id] = i
+            used.add(i)
+        return matches
+
+    def _score(self, crop):
+        if self.quality_fn is None or crop.size == 0:
+            return 0.0
+        return quality_score(*self.quality_fn(crop))
+
+    def update(self, boxes, frame, reads=None, timestamp=None):
+        """Advance one frame. Returns the tracks that ended on this frame.
+
+        ``reads`` optionally holds a character read (or None) per box.
+        ``timestamp`` is the frame's time (default: now), e.g. the position
+        in a recording.
+        """
+        self.frame_index += 1
+        self._last_timestamp = timestamp
+        now = time.time() if timestamp is None else timestamp
+        boxes = [tuple(map(int, b)) for b in boxes]
+        matches = self._match(boxes)
+
+        for track_id, i in matches.items():
+            track = self.tracks[track_id]
+            track.box = boxes[i]
+            track.last_frame = self.frame_index
+            track.last_seen = now
+            track.hits += 1
+            track.missed = 0
+            if reads is not None and reads[i] is not None:
+                track.add_read(reads[i], self.max_reads)
+
+        matched = set(matches.values())
+        for i, box in enumerate(boxes):
+            if i not in matched:
+                track = Track(next(self._ids), box, self.frame_index, now)
+                self.tracks[track.track_id] = track
+                if reads is not None and reads[i] is not None:
+                    track.add_read(reads[i], self.max_reads)
+
+        for track in self.tracks.values():
+            if track.last_frame == self.frame_index:
+                x1, y1, x2, y2 = track.box
+                crop = frame[max(0, y1):y2, max(0, x1):x2].copy()
+                track.add_crop(self._score(crop), crop, frame, self.max_crops)
+
+        ended = []
+        for track_id in list(self.tracks):
+            track = self.tracks[track_id]
+            if track.last_frame != self.frame_index:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    ended.append(self._end(track_id, now))
+        return [t for t in ended if t.hits >= self.min_hits]
+
+    def _end(self, track_id, now):
+        track = self.tracks.pop(track_id)
+        track.ended_at = now
+        return track
+
+    def flush(self):
+        """End every open track, e.g. when the stream finishes. They end at
+        the last frame's timestamp, or now if update wasn't given one."""
+        now = time.time() if self._last_timestamp is None else self._last_timestamp
+        ended = [self._end(track_id, now) for track_id in list(self.tracks)]
+        return [t for t in ended if t.hits >= self.min_hits]
+
+    def active_tracks(self):
+        return list(self.tracks.values())
@@ -0,0 +1,35 @@
+# Arabic character translations: YOLO character class names (and the
+# class names of the older letter/digit datasets) -> plate glyphs
+
+DIGITS = {
+    '0': '٠', '1': '١', '2': '٢', '3': '٣', '4': '٤',
+    '5': '٥', '6': '٦', '7': '٧', '8': '٨', '9': '٩',
+
+    'digit_0': '٠', 'digit_1': '١', 'digit_2': '٢', 'digit_3': '٣', 'digit_4': '٤',
+    'digit_5': '٥', 'digit_6': '٦', 'digit_7': '٧', 'digit_8': '٨', 'digit_9': '٩',
+}
+
+LETTERS = {
+    # ----------- English Transliterations -----------
+    '7aah': 'ح', 'Daad': 'ض', 'Een': 'ع', 'Heeh': 'ه',
+    'Kaaf': 'ك', 'Laam': 'ل', 'Meem': 'م', 'Noon': 'ن',
+    'Saad': 'ص', 'Seen': 'س', 'Taa': 'ط', 'Wow': 'و',
+    'Yeeh': 'ي', 'Zeen': 'ز', 'alef': 'أ', 'baa': 'ب',
+    'daal': 'د', 'geem': 'ج',
+    # data.yaml classes that had no entry
+    'F': 'ف', 'Q': 'ق', 'R': 'ر', 'a': 'أ',
+
+    # ----------- Short Transliteration Variants -----------
+    'aa': 'ع', 'g': 'ج', 's': 'س', 'ss': 'ص', 'b': 'ب',
+    'd': 'د', 't': 'ط', 'h': 'ه', 'k': 'ق', 'f': 'ف',
+    'n': 'ن', 'l': 'ل', 'm': 'م', 'w': 'و', 'y': 'ي', 'r': 'ر',
+
+    # ------------- From Letter Dataset -------------
+    'letter_ain': 'ع', 'letter_alef': 'أ', 'letter_baa': 'ب', 'letter_dal': 'د',
+    'letter_faa': 'ف', 'letter_haa': 'هـ', 'letter_jeem': 'ج', 'letter_kaf': 'ك',
+    'letter_lam': 'ل', 'letter_meem': 'م', 'letter_noon': 'ن', 'letter_qaf': 'ق',
+    'letter_raa': 'ر', 'letter_saad': 'ص', 'letter_seen': 'س', 'letter_taa2': 'ط',
+    'letter_waaw': 'و', 'letter_yaa': 'ي',
+}
+
+TRANSLATIONS = {**DIGITS, **LETTERS}
@@ -0,0 +1,133 @@
+import argparse
+import json
+import multiprocessing
+import os
+
+# Set by _init_worker inside each worker process
+_recognizer = None
+
+
+def _pin_threads(threads):
+    """Cap the thread pools of every library a worker uses.
+
+    The environment variables only take effect before torch/paddle/OpenCV
+    are imported, which is why workers use the spawn start method and this
+    runs before main1 is imported.
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                "NUMEXPR_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["ANPR_DEVICE"] = "cpu"
+    os.environ["ANPR_CPU_THREADS"] = str(threads)
+
+    import cv2
+    cv2.setNumThreads(threads)
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set in this process
+
+
+def _init_worker(threads):
+    """Load the models once per worker process."""
+    global _recognizer
+    _pin_threads(threads)
+    import main1
+    main1.models.warmup(background=False)
+    _recognizer = main1
+    print(f"✅ Worker {os.getpid()} ready ({threads} thread(s))")
+
+
+def _read_plate(job):
+    crop, enhance = job
+    try:
+        return _recognizer.read_plate(crop, enhance)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _recognize_path(job):
+    path, enhance = job
+    image = _recognizer.load_image(path)
+    if image is None:
+        return {"path": path, "plates": [], "error": "Unable to read image"}
+    try:
+        plates = _recognizer.recognize_images([image], enhance)[0]
+        return {"path": path, "plates": plates, "error": None}
+    except Exception as e:
+        return {"path": path, "plates": [], "error": str(e)}
+
+
+class PlateWorkerPool:
+    """CPU worker processes that each hold their own YOLO/PaddleOCR/Real-ESRGAN.
+
+    Jobs go through the pool's shared task queue and results come back in
+    submission order. Use ``workers * threads_per_worker`` close to the core
+    count; one thread per worker usually scales best for small plate crops.
+    """
+
+    def __init__(self, workers=None, threads_per_worker=1, chunksize=1):
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.workers = workers or max(1, (os.cpu_count() or 1) // self.threads_per_worker)
+        self.chunksize = chunksize
+        # spawn, so thread limits apply before any library is initialised
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(self.workers, initializer=_init_worker,
+                                  initargs=(self.threads_per_worker,))
+
+    def recognize_plates(self, crops, enhance=True):
+        """Enhance and OCR plate crops in parallel. Returns a list in input order."""
+        return self._pool.map(_read_plate, [(crop, enhance) for crop in crops], self.chunksize)
+
+    def recognize_paths(self, paths, enhance=True):
+        """Detect and read plates in image files. Yields results in input order."""
+        jobs = ((path, enhance) for path in paths)
+        yield from self._pool.imap(_recognize_path, jobs, self.chunksize)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # مهم لو بتستخدم Windows
+
+    parser = argparse.ArgumentParser(description="Recognize plates with a pool of CPU workers")
+    parser.add_argument("paths", nargs="+", help="image files or directories (e.g. Images)")
+    parser.add_argument("--workers", type=int, default=None, help="default: cores / threads")
+    parser.add_argument("--threads", type=int, default=1, help="threads per worker")
+    parser.add_argument("--chunksize", type=int, default=1)
+    parser.add_argument("--output", help="write one JSON result per line to this file")
+    parser.add_argument("--no-enhance", action="store_true")
+    args = parser.parse_args()
+
+    # main1 opens no models, DB connections or writer threads on import
+    from main1 import list_images
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        with PlateWorkerPool(args.workers, args.threads, args.chunksize) as pool:
+            for record in pool.recognize_paths(list_images(args.paths), not args.no_enhance):
+                line = json.dumps(record, ensure_ascii=False)
+                if out:
+                    out.write(line + "\n")
+                else:
+                    print(line)
+    finally:
+        if out:
+            out.close()